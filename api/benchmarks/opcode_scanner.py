@@ -0,0 +1,80 @@
+"""Benchmark the single-pass opcode scanner against a full evmdasm disassembly.
+
+    python -m api.benchmarks.opcode_scanner --size 24576 --contracts 20
+"""
+import argparse
+import random
+import time
+
+from evmdasm import EvmBytecode
+
+from api.utils.opcode_scanner import scan_bytecode
+
+# Rough opcode mix of solc output: lots of PUSH/DUP/SWAP/JUMP, a few calls
+_COMMON = [0x60, 0x61, 0x63, 0x80, 0x81, 0x82, 0x90, 0x91, 0x50, 0x56, 0x57, 0x5b, 0x14, 0x15, 0x16,
+           0x01, 0x03, 0x52, 0x51, 0x54, 0x55, 0x35, 0x1c, 0x1b, 0x20, 0xf1, 0xfa, 0xfd, 0xf3, 0x73, 0x7f]
+
+
+def synthetic_contract(size: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    code = bytearray()
+    while True:
+        op = rng.choice(_COMMON) if rng.random() < 0.9 else rng.randrange(256)
+        immediate = op - 0x5f if 0x60 <= op <= 0x7f else 0
+        if len(code) + 1 + immediate > size:
+            break
+        code.append(op)
+        code.extend(rng.randbytes(immediate))
+    # Pad with STOP so no PUSH is truncated
+    return bytes(code.ljust(size, b"\x00"))
+
+
+def _time(fn, contracts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for code in contracts:
+            fn(code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _evmdasm(code: bytes):
+    disasm = EvmBytecode(code.hex()).disassemble()
+    return [instr.name for instr in disasm]
+
+
+def run(size: int = 24_576, contracts: int = 20, repeat: int = 3) -> dict:
+    corpus = [synthetic_contract(size, seed) for seed in range(contracts)]
+
+    # Both decoders must agree on instruction boundaries
+    for code in corpus:
+        assert scan_bytecode(code)["instruction_count"] == len(_evmdasm(code))
+
+    scanner = _time(scan_bytecode, corpus, repeat)
+    reference = _time(_evmdasm, corpus, repeat)
+    total_mb = size * contracts / 1e6
+    return {
+        "contract_size": size,
+        "contracts": contracts,
+        "scanner_ms_per_contract": scanner / contracts * 1e3,
+        "evmdasm_ms_per_contract": reference / contracts * 1e3,
+        "scanner_mb_per_s": total_mb / scanner,
+        "evmdasm_mb_per_s": total_mb / reference,
+        "speedup": reference / scanner,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=24_576)
+    parser.add_argument("--contracts", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for key, value in run(args.size, args.contracts, args.repeat).items():
+        print(f"{key:>26}: {value:.2f}" if isinstance(value, float) else f"{key:>26}: {value}")
+
+
+if __name__ == "__main__":
+    main()
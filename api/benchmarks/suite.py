@@ -0,0 +1,148 @@
+"""Offline benchmark suite for the analysers, run against the JSON-RPC replay server.
+
+Each case reports wall time, throughput, peak Python memory (tracemalloc, in a
+second run so tracing doesn't skew the timing) and the RPC calls it made.
+Results can be saved as a baseline and later runs compared against it.
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from api.benchmarks.opcode_scanner import synthetic_contract
+from api.testing.rpc_replay import SyntheticToken, replay_process
+from api.utils.rpc import configure_web3, rpc_stats
+
+# Share of slowdown (time, memory or RPC calls) tolerated before a case counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def _contract_analysis(contracts: int = 50):
+    from api.utils.contract_analysis import run_contract_analysis
+
+    addresses = [f"0x{0xc0 << 152 | i:040x}" for i in range(contracts)]
+    code = {a: "0x" + synthetic_contract(24_576, seed=i).hex() for i, a in enumerate(addresses)}
+
+    def run():
+        for address in addresses:
+            run_contract_analysis(address, use_cache=False)
+        return contracts
+    return {"fixture": {"code": code, "block_number": 1}}, run, "contracts", None
+
+
+def _holders(log_count: int, holders: int, archived: bool = False):
+    def case():
+        from api.utils.holder_analysis import analyze_token_holders
+
+        token = SyntheticToken(
+            "0x" + "5e" * 20, log_count, holders=holders, first_block=1_000, last_block=1_000_000,
+        )
+        archive = tempfile.mkdtemp(prefix="wl-bench-") if archived else ""
+
+        def run():
+            os.environ["LOG_ARCHIVE_DIR"] = archive
+            analyze_token_holders(token.address, from_block=0, to_block=token.last_block)
+            return log_count
+
+        warmup = run if archived else None
+        return {"tokens": [token]}, run, "logs", warmup
+    return case
+
+
+def _save_holders(count: int):
+    def case():
+        from api.models import TokenComplianceProfile
+        from api.utils.holder_store import save_holders
+
+        token, _ = TokenComplianceProfile.objects.get_or_create(token_address="0x" + "5a" * 20)
+        holders = [(f"0x{0xd0 << 152 | i:040x}", i + 1) for i in range(count)]
+
+        def run():
+            return save_holders(token, holders)
+        return {}, run, "holders", None
+    return case
+
+
+def _transfer_graph(log_count: int, holders: int):
+    def case():
+        from api.utils.transfer_graph import TransferGraph, analyze_transfer_graph
+
+        rows = SyntheticToken("0x" + "6a" * 20, log_count, holders=holders).rows(0, log_count)
+
+        def run():
+            analyze_transfer_graph(TransferGraph.from_transfers(rows))
+            return log_count
+        return {}, run, "transfers", None
+    return case
+
+
+CASES = {
+    "contract_analysis": _contract_analysis,
+    "holders_small": _holders(1_000, 100),
+    "holders_100k": _holders(100_000, 20_000),
+    "holders_100k_archived": _holders(100_000, 20_000, archived=True),
+    "holders_5m": _holders(5_000_000, 500_000),
+    "save_holders_10k": _save_holders(10_000),
+    "transfer_graph_2m": _transfer_graph(2_000_000, 200_000),
+}
+# holders_5m takes minutes; run it explicitly
+DEFAULT_CASES = [name for name in CASES if name != "holders_5m"]
+
+
+def run_case(name: str, memory: bool = True, latency: float = 0.0) -> dict:
+    # Each case builds (replay server options, timed callable, unit, optional warm-up)
+    server, run, unit, warmup = CASES[name]()
+    previous_archive = os.environ.get("LOG_ARCHIVE_DIR")
+
+    try:
+        with replay_process(latency=latency, **server) as url:
+            configure_web3([url], rate=0)
+            if warmup:
+                warmup()
+                configure_web3([url], rate=0)
+
+            start = time.perf_counter()
+            items = run()
+            seconds = time.perf_counter() - start
+            calls = sum(endpoint["calls"] for endpoint in rpc_stats())
+
+            peak = None
+            if memory:
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+    finally:
+        if previous_archive is None:
+            os.environ.pop("LOG_ARCHIVE_DIR", None)
+        else:
+            os.environ["LOG_ARCHIVE_DIR"] = previous_archive
+
+    return {
+        "seconds": round(seconds, 4),
+        "items": items,
+        "unit": unit,
+        "throughput": round(items / seconds, 1) if seconds else None,
+        "peak_mb": round(peak / 1e6, 2) if peak is not None else None,
+        "rpc_calls": calls,
+    }
+
+
+def run_suite(names=None, memory: bool = True, latency: float = 0.0) -> dict:
+    return {name: run_case(name, memory=memory, latency=latency) for name in names or DEFAULT_CASES}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Regressions of `results` against `baseline`, as human-readable lines."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("seconds", "peak_mb", "rpc_calls"):
+            now, before = result.get(metric), base.get(metric)
+            if now is None or not before:
+                continue
+            if now > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before} -> {now} (+{(now / before - 1) * 100:.0f}%)")
+    return regressions
@@ -0,0 +1,109 @@
+"""Benchmark Transfer-log aggregation: per-log checksumming vs streaming raw-byte decode.
+
+    python -m api.benchmarks.transfer_decode --logs 200000 --holders 20000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from api.utils.transfer_logs import TRANSFER_TOPIC, apply_transfer_logs
+
+# Logs per fetched range, as delivered by the log fetcher
+CHUNK = 5_000
+
+
+def synthetic_logs(count: int, holders: int, seed: int) -> list:
+    """Transfer logs shaped like web3's get_logs output."""
+    rng = random.Random(seed)
+    addresses = [rng.randbytes(20) for _ in range(holders)]
+    topic = HexBytes(TRANSFER_TOPIC)
+    logs = []
+    for i in range(count):
+        sender, recipient = rng.choice(addresses), rng.choice(addresses)
+        logs.append(AttributeDict({
+            "address": "0x" + "77" * 20,
+            "blockNumber": i // 10,
+            "logIndex": i % 10,
+            "topics": [topic, HexBytes(b"\0" * 12 + sender), HexBytes(b"\0" * 12 + recipient)],
+            "data": HexBytes(rng.randrange(1, 10 ** 24).to_bytes(32, "big")),
+        }))
+    return logs
+
+
+def _legacy(chunks):
+    # The previous pipeline: collect everything, checksum both sides of every log
+    all_logs = []
+    for chunk in chunks:
+        all_logs.extend(chunk)
+    balances = defaultdict(int)
+    for log in all_logs:
+        sender = Web3.to_checksum_address("0x" + log["topics"][1].hex()[-40:])
+        recipient = Web3.to_checksum_address("0x" + log["topics"][2].hex()[-40:])
+        amount = int(log["data"].hex(), 16)
+        balances[sender] -= amount
+        balances[recipient] += amount
+    return balances
+
+
+def _streaming(chunks):
+    balances = defaultdict(int)
+    for chunk in chunks:
+        apply_transfer_logs(balances, chunk)
+    return balances
+
+
+def _measure(fn, logs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(logs[i:i + CHUNK] for i in range(0, len(logs), CHUNK))
+        best = min(best, time.perf_counter() - start)
+
+    # Peak of the aggregation state only; the input logs are allocated beforehand
+    tracemalloc.start()
+    fn(logs[i:i + CHUNK] for i in range(0, len(logs), CHUNK))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(logs: int = 200_000, holders: int = 20_000, repeat: int = 3) -> dict:
+    corpus = synthetic_logs(logs, holders, seed=0)
+
+    # Both pipelines must produce the same balances
+    legacy = _legacy([corpus])
+    streaming = _streaming([corpus])
+    assert {k.lower(): v for k, v in legacy.items()} == {"0x" + k.hex(): v for k, v in streaming.items()}
+
+    legacy_s, legacy_peak = _measure(_legacy, corpus, repeat)
+    streaming_s, streaming_peak = _measure(_streaming, corpus, repeat)
+    return {
+        "logs": logs,
+        "holders": holders,
+        "legacy_us_per_log": legacy_s / logs * 1e6,
+        "streaming_us_per_log": streaming_s / logs * 1e6,
+        "legacy_peak_mb": legacy_peak / 1e6,
+        "streaming_peak_mb": streaming_peak / 1e6,
+        "speedup": legacy_s / streaming_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=200_000)
+    parser.add_argument("--holders", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for key, value in run(args.logs, args.holders, args.repeat).items():
+        print(f"{key:>22}: {value:.2f}" if isinstance(value, float) else f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
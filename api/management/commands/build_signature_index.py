@@ -0,0 +1,44 @@
+import re
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.signature_index import DEFAULT_INDEX_PATH, build_signature_index, selector_for
+
+
+def _parse_line(line: str):
+    """Accept `0xa9059cbb transfer(address,uint256)`, a CSV pair, or a bare signature."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    parts = re.split(r"[\s,]+", line, maxsplit=1)
+    if len(parts) == 2 and "(" not in parts[0]:
+        return int(parts[0].removeprefix("0x"), 16), parts[1].strip()
+    return selector_for(line), line
+
+
+class Command(BaseCommand):
+    help = "Build the memory-mapped 4-byte signature index from text dumps"
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="+", help="Signature files, one entry per line")
+        parser.add_argument("--output", default=str(DEFAULT_INDEX_PATH))
+
+    def handle(self, *args, **options):
+        entries = []
+        for source in options["sources"]:
+            path = Path(source)
+            if not path.exists():
+                raise CommandError(f"{path} not found")
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        entry = _parse_line(line)
+                    except ValueError:
+                        self.stderr.write(f"{path}:{number}: skipping malformed line")
+                        continue
+                    if entry:
+                        entries.append(entry)
+
+        count = build_signature_index(entries, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} signatures to {options['output']}"))
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import TokenComplianceProfile
+from api.utils.clustering import MAX_DEGREE, MAX_FUNDING_FANOUT
+from api.utils.entities import MAX_ENTITY_SIZE, TOP_ENTITIES, refresh_entities, resolve_entities
+from api.utils.holder_store import unmerge_holders
+from api.utils.rpc import get_web3
+
+
+class Command(BaseCommand):
+    help = "Cluster holder addresses into entities from archived Transfers and merge their holders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tokens", nargs="*", help="Token addresses (default: every registered token)")
+        parser.add_argument("--max-funding-fanout", type=int, default=MAX_FUNDING_FANOUT,
+                            help="Ignore funders of more addresses than this (exchanges, airdrops)")
+        parser.add_argument("--max-degree", type=int, default=MAX_DEGREE,
+                            help="Addresses with more counterparties than this link nothing (pools, routers)")
+        parser.add_argument("--max-entity-size", type=int, default=MAX_ENTITY_SIZE,
+                            help="Report, but don't merge, clusters with more addresses than this")
+        parser.add_argument("--exclude", nargs="*", default=[],
+                            help="Addresses that never link others (pools, routers, bridges)")
+        parser.add_argument("--deployers", action="store_true",
+                            help="Also link contracts to their deployers (RPC calls, needs an archive node)")
+        parser.add_argument("--offline", action="store_true",
+                            help="Don't check the largest holders for code (no RPC; contracts are not excluded)")
+        parser.add_argument("--undo", nargs="+", metavar="ADDRESS",
+                            help="Instead of clustering, move these addresses back to their previous holders")
+        parser.add_argument("--top", type=int, default=TOP_ENTITIES)
+
+    def handle(self, *args, **options):
+        if options["deployers"] and options["offline"]:
+            raise CommandError("--deployers needs RPC access; drop --offline")
+        tokens = TokenComplianceProfile.objects.all()
+        if options["tokens"]:
+            tokens = tokens.filter(token_address__in=[a.lower() for a in options["tokens"]])
+        tokens = list(tokens)
+        missing = {a.lower() for a in options["tokens"]} - {t.token_address for t in tokens}
+        if missing:
+            raise CommandError(f"Not registered: {', '.join(sorted(missing))}")
+
+        if options["undo"]:
+            moved = unmerge_holders(options["undo"])
+            refresh_entities(tokens, options["top"])
+            self.stdout.write(self.style.SUCCESS(f"{moved} addresses moved back to their previous holders"))
+            return
+
+        start = time.perf_counter()
+        summary = resolve_entities(
+            tokens,
+            w3=None if options["offline"] else get_web3(),
+            exclude=[a.lower() for a in options["exclude"]],
+            link_deployers=options["deployers"],
+            max_fanout=options["max_funding_fanout"],
+            max_degree=options["max_degree"],
+            max_size=options["max_entity_size"],
+            top_n=options["top"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['transfers']} transfers, {summary['addresses']} addresses: "
+            f"{summary['contracts']} contracts, {summary['clusters']} clusters "
+            f"({summary['clustered_addresses']} addresses, {summary['oversized_clusters']} oversized skipped), "
+            f"{summary['deployers']} deployers, {summary['holders_merged']} holders merged, "
+            f"in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import TokenComplianceProfile
+from api.utils.export import EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream profiles, analysis history or holder links as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(EXPORTS))
+        parser.add_argument("--format", dest="fmt", choices=list(FORMATS), default="ndjson")
+        parser.add_argument("--token", help="Only rows for this token address")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        token = None
+        if options["token"]:
+            token = TokenComplianceProfile.objects.filter(token_address=options["token"].lower()).first()
+            if not token:
+                raise CommandError(f"Not registered: {options['token']}")
+
+        chunks = stream_export(options["kind"], options["fmt"], token)
+        if options["output"]:
+            with open(options["output"], "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.rescore import RESCORE_BATCH_SIZE, rescore_tokens
+from api.utils.scoring import POLICIES, SCORING_POLICY_VERSION
+
+
+class Command(BaseCommand):
+    help = "Recompute every token's risk score and recommendation from stored analyses (no RPC calls)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policy", default=SCORING_POLICY_VERSION, help=f"Scoring policy version ({', '.join(POLICIES)})"
+        )
+        parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["policy"] not in POLICIES:
+            raise CommandError(f"Unknown policy {options['policy']} (available: {', '.join(POLICIES)})")
+
+        start = time.perf_counter()
+        summary = rescore_tokens(options["policy"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Policy {summary['version']}: rescored {summary['scanned']} tokens, "
+            f"{summary['updated']} changed, in {time.perf_counter() - start:.2f}s"
+        ))
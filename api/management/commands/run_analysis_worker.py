@@ -0,0 +1,43 @@
+import os
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+
+from api.utils.jobs import JOB_POLL_INTERVAL, requeue_stale_jobs, work
+
+
+class Command(BaseCommand):
+    help = "Run queued contract and holder analyses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Jobs run concurrently by this process")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        stop = threading.Event()
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} abandoned jobs")
+
+        threads = [
+            threading.Thread(target=work, args=(f"{name}:{i}", stop, options["once"]), daemon=True)
+            for i in range(max(1, options["workers"]))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Worker {name} running {len(threads)} job slots")
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(JOB_POLL_INTERVAL)
+                if not options["once"]:
+                    requeue_stale_jobs()
+        except KeyboardInterrupt:
+            # Let running jobs finish; nothing new is claimed
+            self.stdout.write("Stopping after running jobs finish...")
+            stop.set()
+            for thread in threads:
+                thread.join()
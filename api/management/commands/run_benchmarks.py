@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from api.benchmarks.suite import CASES, DEFAULT_CASES, DEFAULT_TOLERANCE, compare, run_suite
+
+
+class Command(BaseCommand):
+    help = "Run the offline analyser benchmarks against the JSON-RPC replay server"
+
+    def add_arguments(self, parser):
+        parser.add_argument("cases", nargs="*", help=f"Cases to run (default: {', '.join(DEFAULT_CASES)})")
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every RPC request")
+        parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+        parser.add_argument("--baseline", help="JSON results to compare against; fails on regressions")
+        parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+        parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    def handle(self, *args, **options):
+        unknown = [name for name in options["cases"] if name not in CASES]
+        if unknown:
+            raise CommandError(f"Unknown cases: {', '.join(unknown)} (available: {', '.join(CASES)})")
+
+        # Benchmarks write holders; keep them out of the real database
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            results = run_suite(options["cases"], memory=not options["no_memory"], latency=options["latency"])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        for name, result in results.items():
+            peak = f"{result['peak_mb']:>8} MB" if result["peak_mb"] is not None else "       - MB"
+            self.stdout.write(
+                f"{name:<24} {result['seconds']:>9.3f} s  {result['throughput']:>12} {result['unit']}/s"
+                f"  {peak}  {result['rpc_calls']:>6} rpc calls"
+            )
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                regressions = compare(results, json.load(f), options["tolerance"])
+            if regressions:
+                raise CommandError("Benchmark regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
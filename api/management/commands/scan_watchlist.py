@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import TokenComplianceProfile
+from api.utils.holder_analysis import WATCHLIST_ADDRESSES_PER_QUERY, analyze_watchlist
+from api.utils.jobs import schedule_graph_refreshes
+
+
+class Command(BaseCommand):
+    help = "Refresh holder ledgers of registered tokens with shared address-list log scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("addresses", nargs="*", help="Token addresses (default: every registered token)")
+        parser.add_argument("--to-block", type=int)
+        parser.add_argument("--top-n", type=int, default=10)
+        parser.add_argument("--addresses-per-query", type=int, default=WATCHLIST_ADDRESSES_PER_QUERY)
+
+    def handle(self, *args, **options):
+        tokens = TokenComplianceProfile.objects.all()
+        if options["addresses"]:
+            wanted = {a.lower() for a in options["addresses"]}
+            tokens = tokens.filter(token_address__in=wanted)
+            missing = wanted - set(tokens.values_list("token_address", flat=True))
+            if missing:
+                raise CommandError(f"Not registered: {', '.join(sorted(missing))}")
+
+        tokens = list(tokens)
+        results = analyze_watchlist(
+            tokens,
+            to_block=options["to_block"],
+            top_n=options["top_n"],
+            addresses_per_query=options["addresses_per_query"],
+        )
+        for address, result in results.items():
+            status = "failed ranges" if result["failed_ranges"] else "ok"
+            self.stdout.write(
+                f"{address}  block {result['last_processed_block']}  "
+                f"centralization {result['centralization_score']}  {status}"
+            )
+        graph_jobs = schedule_graph_refreshes(tokens)
+        self.stdout.write(self.style.SUCCESS(f"Scanned {len(results)} tokens, queued {graph_jobs} graph jobs"))
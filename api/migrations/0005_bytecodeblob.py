@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:06
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+from eth_utils import keccak
+
+
+def move_bytecode_to_blobs(apps, schema_editor):
+    BytecodeBlob = apps.get_model('api', 'BytecodeBlob')
+    ContractAnalysisResult = apps.get_model('api', 'ContractAnalysisResult')
+
+    seen = set()
+    analyses = ContractAnalysisResult.objects.exclude(bytecode__isnull=True).exclude(bytecode='')
+    for analysis in analyses.only('id', 'bytecode').iterator(chunk_size=500):
+        code = bytes.fromhex(analysis.bytecode.removeprefix('0x'))
+        code_hash = keccak(code).hex()
+        if code_hash not in seen:
+            BytecodeBlob.objects.get_or_create(
+                code_hash=code_hash,
+                defaults={'data': zlib.compress(code, 9), 'size': len(code)},
+            )
+            seen.add(code_hash)
+        ContractAnalysisResult.objects.filter(id=analysis.id).update(bytecode_blob_id=code_hash)
+
+
+def restore_bytecode(apps, schema_editor):
+    ContractAnalysisResult = apps.get_model('api', 'ContractAnalysisResult')
+
+    analyses = ContractAnalysisResult.objects.exclude(bytecode_blob__isnull=True).select_related('bytecode_blob')
+    for analysis in analyses.iterator(chunk_size=500):
+        ContractAnalysisResult.objects.filter(id=analysis.id).update(
+            bytecode=zlib.decompress(analysis.bytecode_blob.data).hex(),
+            bytecode_hash=analysis.bytecode_blob_id,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_holder_holderaddress_holdertokenlink'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BytecodeBlob',
+            fields=[
+                ('code_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contractanalysisresult',
+            name='bytecode_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='analyses', to='api.bytecodeblob'),
+        ),
+        migrations.RunPython(move_bytecode_to_blobs, restore_bytecode),
+        migrations.RemoveField(
+            model_name='contractanalysisresult',
+            name='bytecode',
+        ),
+        migrations.RemoveField(
+            model_name='contractanalysisresult',
+            name='bytecode_hash',
+        ),
+    ]
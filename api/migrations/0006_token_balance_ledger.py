@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:10
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_bytecodeblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenLedgerCheckpoint',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_checkpoint', serialize=False, to='api.tokencomplianceprofile')),
+                ('start_block', models.BigIntegerField()),
+                ('last_processed_block', models.BigIntegerField()),
+                ('complete', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenBalance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('address', models.CharField(max_length=42)),
+                ('balance', models.DecimalField(decimal_places=0, max_digits=80)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='api.tokencomplianceprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', '-balance'], name='token_balance_desc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('token', 'address'), name='unique_token_balance')],
+            },
+        ),
+    ]
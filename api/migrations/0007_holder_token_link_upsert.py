@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:17
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_links(apps, schema_editor):
+    # get_or_create could race; keep the newest link per (address, token)
+    HolderTokenLink = apps.get_model("api", "HolderTokenLink")
+    duplicated = (
+        HolderTokenLink.objects.values("holder_address", "token")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+    )
+    for pair in duplicated:
+        links = HolderTokenLink.objects.filter(
+            holder_address=pair["holder_address"], token=pair["token"]
+        ).order_by("-created_at")
+        HolderTokenLink.objects.filter(id__in=[link.id for link in links[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_token_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holdertokenlink',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(drop_duplicate_links, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='holdertokenlink',
+            constraint=models.UniqueConstraint(fields=('holder_address', 'token'), name='unique_holder_token_link'),
+        ),
+    ]
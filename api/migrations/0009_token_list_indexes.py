@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_analysis_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tokencomplianceprofile',
+            index=models.Index(fields=['-created_at', '-id'], name='token_profile_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokencomplianceprofile',
+            index=models.Index(fields=['recommendation', '-created_at', '-id'], name='token_profile_rec_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokencomplianceprofile',
+            index=models.Index(fields=['risk_score'], name='token_profile_risk_score_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Lower
+
+
+def lowercase_token_addresses(apps, schema_editor):
+    # Exact lookups need one stored form; a mixed-case row whose lowercase twin
+    # already exists is left for a manual merge
+    TokenComplianceProfile = apps.get_model("api", "TokenComplianceProfile")
+    existing = set(TokenComplianceProfile.objects.values_list("token_address", flat=True))
+    for profile in TokenComplianceProfile.objects.exclude(token_address=Lower("token_address")):
+        if profile.token_address.lower() not in existing:
+            TokenComplianceProfile.objects.filter(id=profile.id).update(token_address=profile.token_address.lower())
+            existing.add(profile.token_address.lower())
+
+
+def backfill_latest_analyses(apps, schema_editor):
+    TokenComplianceProfile = apps.get_model("api", "TokenComplianceProfile")
+    ContractAnalysisResult = apps.get_model("api", "ContractAnalysisResult")
+    HolderAnalysisResult = apps.get_model("api", "HolderAnalysisResult")
+    TokenComplianceProfile.objects.update(
+        latest_contract_analysis=Subquery(
+            ContractAnalysisResult.objects.filter(token=OuterRef("pk")).order_by("-analyzed_at").values("id")[:1]
+        ),
+        latest_holder_analysis=Subquery(
+            HolderAnalysisResult.objects.filter(token=OuterRef("pk")).order_by("-created_at").values("id")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_token_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokencomplianceprofile',
+            name='latest_contract_analysis',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.contractanalysisresult'),
+        ),
+        migrations.AddField(
+            model_name='tokencomplianceprofile',
+            name='latest_holder_analysis',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.holderanalysisresult'),
+        ),
+        migrations.AddIndex(
+            model_name='contractanalysisresult',
+            index=models.Index(fields=['token', '-analyzed_at'], name='contract_analysis_token_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='holderanalysisresult',
+            index=models.Index(fields=['token', '-created_at'], name='holder_analysis_token_idx'),
+        ),
+        migrations.RunPython(lowercase_token_addresses, migrations.RunPython.noop),
+        migrations.RunPython(backfill_latest_analyses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_analysis_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokencomplianceprofile',
+            name='scoring_version',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+    ]
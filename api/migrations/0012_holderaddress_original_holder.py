@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_scoring_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holderaddress',
+            name='original_holder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.holder'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_holderaddress_original_holder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisjob',
+            name='module',
+            field=models.CharField(choices=[('contract', 'Contract'), ('holders', 'Holders'), ('graph', 'Transfer graph')], max_length=32),
+        ),
+    ]
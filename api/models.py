@@ -1,7 +1,7 @@
 import uuid
 from django.db import models
 from uuid import uuid4
-import hashlib
+import zlib
 
 class TokenComplianceProfile(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -10,6 +10,8 @@ class TokenComplianceProfile(models.Model):
     symbol = models.CharField(max_length=32, null=True, blank=True)
     decimals = models.IntegerField(null=True, blank=True)
     risk_score = models.FloatField(default=0.0)
+    # Scoring policy (api.utils.scoring) that produced risk_score and recommendation
+    scoring_version = models.CharField(max_length=16, null=True, blank=True)
     recommendation = models.CharField(
         max_length=32,
         choices=[
@@ -22,12 +24,43 @@ class TokenComplianceProfile(models.Model):
     )
     flags = models.JSONField(default=list, blank=True)
     modules = models.JSONField(default=dict, blank=True)
+    # Newest analyses, so reads don't sort the history
+    latest_contract_analysis = models.ForeignKey(
+        "ContractAnalysisResult", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    latest_holder_analysis = models.ForeignKey(
+        "HolderAnalysisResult", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the token list, optionally per recommendation
+            models.Index(fields=["-created_at", "-id"], name="token_profile_created_idx"),
+            models.Index(fields=["recommendation", "-created_at", "-id"], name="token_profile_rec_created_idx"),
+            models.Index(fields=["risk_score"], name="token_profile_risk_score_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Stored lowercase so lookups are exact matches on the unique index
+        self.token_address = self.token_address.lower()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.symbol or 'Token'} @ {self.token_address[:8]}..."
 
+class BytecodeBlob(models.Model):
+    # keccak256 of the raw code (same value as EXTCODEHASH)
+    code_hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()  # zlib-compressed raw bytecode
+    size = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def bytecode(self) -> bytes:
+        return zlib.decompress(self.data)
+
 class ContractAnalysisResult(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
     token = models.ForeignKey(
@@ -38,13 +71,21 @@ class ContractAnalysisResult(models.Model):
     score = models.FloatField()
     flags = models.JSONField(default=list)
     evidence = models.JSONField(default=list)
-    bytecode = models.TextField(blank=True, null=True)
-    bytecode_hash = models.CharField(max_length=64, blank=True, null=True)
+    bytecode_blob = models.ForeignKey(
+        BytecodeBlob,
+        on_delete=models.PROTECT,
+        related_name="analyses",
+        null=True,
+        blank=True,
+    )
     engine_version = models.CharField(max_length=16, default="0.1-beta")
     analyzed_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-analyzed_at"]
+        indexes = [
+            models.Index(fields=["token", "-analyzed_at"], name="contract_analysis_token_idx"),
+        ]
 
 class HolderAnalysisResult(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -54,6 +95,11 @@ class HolderAnalysisResult(models.Model):
     anomalies = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["token", "-created_at"], name="holder_analysis_token_idx"),
+        ]
+
 
 class Holder(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -64,6 +110,10 @@ class Holder(models.Model):
 class HolderAddress(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     holder = models.ForeignKey(Holder, on_delete=models.CASCADE, related_name="addresses")
+    # Set when entity resolution moves the address to another holder, so the merge can be undone
+    original_holder = models.ForeignKey(
+        Holder, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
     address = models.CharField(max_length=42, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -73,4 +123,85 @@ class HolderTokenLink(models.Model):
     holder_address = models.ForeignKey(HolderAddress, on_delete=models.CASCADE, related_name="tokens")
     token = models.ForeignKey("TokenComplianceProfile", on_delete=models.CASCADE, related_name="holder_links")
     balance = models.DecimalField(max_digits=80, decimal_places=0)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["holder_address", "token"], name="unique_holder_token_link"),
+        ]
+
+
+# Running per-address balances, updated incrementally from Transfer logs
+class TokenBalance(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    token = models.ForeignKey("TokenComplianceProfile", on_delete=models.CASCADE, related_name="balances")
+    address = models.CharField(max_length=42)  # lowercase hex
+    balance = models.DecimalField(max_digits=80, decimal_places=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["token", "address"], name="unique_token_balance"),
+        ]
+        indexes = [
+            models.Index(fields=["token", "-balance"], name="token_balance_desc_idx"),
+        ]
+
+
+class TokenLedgerCheckpoint(models.Model):
+    token = models.OneToOneField(
+        "TokenComplianceProfile",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ledger_checkpoint",
+    )
+    start_block = models.BigIntegerField()
+    last_processed_block = models.BigIntegerField()
+    # True when the ledger starts at the token's deployment, so balances are exact
+    complete = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+
+# Analyses queued by the API and run by `manage.py run_analysis_worker`
+class AnalysisJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    ACTIVE = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    token = models.ForeignKey("TokenComplianceProfile", on_delete=models.CASCADE, related_name="analysis_jobs")
+    module = models.CharField(
+        max_length=32, choices=[("contract", "Contract"), ("holders", "Holders"), ("graph", "Transfer graph")]
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=[(QUEUED, "Queued"), (RUNNING, "Running"), (SUCCEEDED, "Succeeded"), (FAILED, "Failed")],
+        default=QUEUED,
+    )
+    params = models.JSONField(default=dict, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=128, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Single flight: one queued or running job per token and module
+            models.UniqueConstraint(
+                fields=["token", "module"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="single_active_analysis_job",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="analysis_job_queue_idx"),
+        ]
@@ -0,0 +1,397 @@
+"""Local JSON-RPC stand-in that replays fixtures, for tests and benchmarks.
+
+A fixture is a dict (or JSON file) of recorded chain state:
+
+    block_number  int, returned by eth_blockNumber
+    code          {address: hex}; eth_getCode
+    deployments   {address: block}; eth_getCode before it returns "0x"
+    deployers     {address: deployer}; the creation transaction in the deployment
+                  block (eth_getBlockByNumber) and its receipt
+    calls         {"address:0xcalldata": hex}; eth_call, also inside Multicall3 aggregate3
+    storage       {"address:0xslot": hex}; eth_getStorageAt
+    logs          [raw eth_getLogs entries], sorted by block
+
+Large Transfer histories don't need to be recorded: `SyntheticToken` generates
+a deterministic one on demand. The server can add latency and inject HTTP or
+JSON-RPC errors, and caps eth_getLogs like hosted providers do.
+
+    with ReplayServer(fixture, tokens=[SyntheticToken(...)], latency=0.01) as server:
+        configure_web3([server.url])
+
+For timing, `replay_process(...)` runs the same server in a child process so
+it doesn't compete with the code under test for the GIL.
+"""
+import bisect
+import json
+import multiprocessing
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from eth_abi import decode, encode
+
+from api.utils.log_archive import TRANSFER_DTYPE
+from api.utils.multicall import AGGREGATE3_SELECTOR, MULTICALL3_ADDRESS
+from api.utils.transfer_logs import TRANSFER_TOPIC
+
+ZERO_WORD = "0x" + "00" * 32
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finaliser: a cheap, well-spread hash of the log index
+    with np.errstate(over="ignore"):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+class SyntheticToken:
+    """A token with `log_count` Transfers spread evenly over [first_block, last_block].
+
+    Log i moves a pseudo-random amount between two of `holders` addresses; any
+    range of it can be generated without materialising the rest.
+    """
+
+    def __init__(self, address: str, log_count: int, holders: int = 1_000,
+                 first_block: int = 1_000, last_block: int = 100_000, seed: int = 0, max_amount: int = 10 ** 18):
+        self.address = address.lower()
+        self.max_amount = max_amount
+        self.log_count = log_count
+        self.holders = holders
+        self.first_block = first_block
+        self.last_block = last_block
+        self.seed = seed
+
+    def _block(self, i: np.ndarray) -> np.ndarray:
+        span = self.last_block - self.first_block + 1
+        return self.first_block + (i * span) // self.log_count
+
+    def index_range(self, from_block: int, to_block: int):
+        span = self.last_block - self.first_block + 1
+        # Smallest i with block(i) >= b is ceil((b - first) * count / span)
+        def first_index(block):
+            offset = max(0, block - self.first_block)
+            return min(self.log_count, -(-offset * self.log_count // span))
+        return first_index(from_block), first_index(to_block + 1)
+
+    def transfers(self, start: int, stop: int):
+        """(block, sender index, recipient index, amount) columns for logs [start, stop)."""
+        i = np.arange(start, stop, dtype=np.uint64)
+        keyed = i * np.uint64(4) + np.uint64(self.seed) * np.uint64(1 << 40)
+        senders = _mix(keyed) % np.uint64(self.holders)
+        recipients = _mix(keyed + np.uint64(1)) % np.uint64(self.holders)
+        amounts = _mix(keyed + np.uint64(2)) % np.uint64(self.max_amount) + np.uint64(1)
+        return self._block(i.astype(np.int64)), senders, recipients, amounts
+
+    def _raw_addresses(self, indices: np.ndarray) -> np.ndarray:
+        # holder_address as (n, 20) bytes: 0xb0, zeros, seed (4 bytes), index (4 bytes)
+        raw = np.zeros((len(indices), 20), dtype=np.uint8)
+        raw[:, 0] = 0xb0
+        raw[:, 12:16] = np.frombuffer(int(self.seed).to_bytes(4, "big"), np.uint8)
+        raw[:, 16:] = indices.astype(">u4").view(np.uint8).reshape(-1, 4)
+        return raw
+
+    def rows(self, start: int, stop: int) -> np.ndarray:
+        """Logs [start, stop) as log archive rows, without building log dicts."""
+        blocks, senders, recipients, amounts = self.transfers(start, stop)
+        rows = np.zeros(len(blocks), dtype=TRANSFER_DTYPE)
+        rows["block"] = blocks
+        rows["log_index"] = np.arange(start, stop)
+        rows["sender"] = self._raw_addresses(senders)
+        rows["recipient"] = self._raw_addresses(recipients)
+        rows["amount"][:, 24:] = amounts.astype(">u8").view(np.uint8).reshape(-1, 8)
+        return rows
+
+    def holder_address(self, index: int) -> str:
+        return f"0x{0xb0 << 152 | (self.seed << 32) | int(index):040x}"
+
+    def logs(self, from_block: int, to_block: int) -> list:
+        start, stop = self.index_range(from_block, to_block)
+        blocks, senders, recipients, amounts = self.transfers(start, stop)
+        pad = "0x" + "00" * 12
+        return [
+            {
+                "address": self.address,
+                "blockNumber": hex(int(block)),
+                "blockHash": f"0x{int(block):064x}",
+                "transactionHash": f"0x{self.seed:032x}{start + n:032x}",
+                "transactionIndex": "0x0",
+                "logIndex": hex(start + n),
+                "removed": False,
+                "topics": [
+                    TRANSFER_TOPIC,
+                    pad + self.holder_address(sender)[2:],
+                    pad + self.holder_address(recipient)[2:],
+                ],
+                "data": f"0x{int(amount):064x}",
+            }
+            for n, (block, sender, recipient, amount) in enumerate(zip(blocks, senders, recipients, amounts))
+        ]
+
+    def balances(self, from_block: int, to_block: int) -> dict:
+        """Reference {address: net balance change} over the range."""
+        start, stop = self.index_range(from_block, to_block)
+        _, senders, recipients, amounts = self.transfers(start, stop)
+        totals = Counter()
+        for sender, recipient, amount in zip(senders.tolist(), recipients.tolist(), amounts.tolist()):
+            totals[sender] -= amount
+            totals[recipient] += amount
+        return {self.holder_address(i): v for i, v in totals.items() if v}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server.replay
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status, payload = server.respond(body)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReplayServer:
+    """Serve a fixture on 127.0.0.1 from a background thread.
+
+    latency          seconds added to every HTTP request
+    http_error_rate  share of HTTP requests answered with 503
+    rpc_error_rate   share of calls answered with a JSON-RPC error
+    max_logs         eth_getLogs results above this are refused ("more than N results")
+    multicall3       False for a chain without Multicall3: calls to its address
+                     hit an empty account and return "0x", as on a real node
+    """
+
+    def __init__(self, fixture=None, tokens=(), latency: float = 0.0, http_error_rate: float = 0.0,
+                 rpc_error_rate: float = 0.0, max_logs: int = 10_000, seed: int = 0, multicall3: bool = True):
+        if isinstance(fixture, str):
+            with open(fixture) as f:
+                fixture = json.load(f)
+        fixture = fixture or {}
+        self.block_number = fixture.get("block_number", 0)
+        self.code = {k.lower(): v for k, v in fixture.get("code", {}).items()}
+        self.deployments = {k.lower(): v for k, v in fixture.get("deployments", {}).items()}
+        self.deployers = {k.lower(): v.lower() for k, v in fixture.get("deployers", {}).items()}
+        self.calls = {k.lower(): v for k, v in fixture.get("calls", {}).items()}
+        self.storage = {k.lower(): v for k, v in fixture.get("storage", {}).items()}
+        self.logs = sorted(fixture.get("logs", []), key=lambda log: int(log["blockNumber"], 16))
+        self._log_blocks = [int(log["blockNumber"], 16) for log in self.logs]
+        self.tokens = {token.address: token for token in tokens}
+        for token in tokens:
+            self.code.setdefault(token.address, "0x6080")
+            self.deployments.setdefault(token.address, token.first_block)
+            self.block_number = max(self.block_number, token.last_block + 100)
+
+        self.latency = latency
+        self.http_error_rate = http_error_rate
+        self.rpc_error_rate = rpc_error_rate
+        self.max_logs = max_logs
+        self.multicall3 = multicall3
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.methods = Counter()
+        self._httpd = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.replay = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _chance(self, rate: float) -> bool:
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def respond(self, body):
+        if self.latency:
+            threading.Event().wait(self.latency)
+        requests = body if isinstance(body, list) else [body]
+        with self.lock:
+            self.requests += 1
+            self.methods.update(r["method"] for r in requests)
+        if self._chance(self.http_error_rate):
+            return 503, {"error": "injected outage"}
+        responses = [self._call(r) for r in requests]
+        return 200, responses if isinstance(body, list) else responses[0]
+
+    def _call(self, request):
+        try:
+            if self._chance(self.rpc_error_rate):
+                raise RPCError(-32000, "injected error")
+            handler = getattr(self, "_" + request["method"], None)
+            if handler is None:
+                raise RPCError(-32601, f"method {request['method']} not available")
+            return {"jsonrpc": "2.0", "id": request["id"], "result": handler(*request.get("params", []))}
+        except RPCError as e:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": e.code, "message": e.message}}
+
+    def _eth_chainId(self):
+        return "0x1"
+
+    def _eth_blockNumber(self):
+        return hex(self.block_number)
+
+    def _block(self, tag) -> int:
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return self.block_number
+        return 0 if tag == "earliest" else int(tag, 16)
+
+    def _eth_getCode(self, address, block="latest"):
+        address = address.lower()
+        if self._block(block) < self.deployments.get(address, 0):
+            return "0x"
+        return self.code.get(address, "0x")
+
+    def _creation(self, contract: str) -> dict:
+        return {
+            "hash": "0x" + contract[2:].rjust(64, "0"),
+            "from": self.deployers[contract],
+            "to": None,
+            "blockNumber": hex(self.deployments.get(contract, 0)),
+        }
+
+    def _eth_getBlockByNumber(self, block, full=False):
+        number = self._block(block)
+        transactions = [
+            self._creation(contract) for contract in self.deployers
+            if self.deployments.get(contract, 0) == number
+        ]
+        return {
+            "number": hex(number),
+            "hash": "0x" + hex(number)[2:].rjust(64, "0"),
+            "transactions": transactions if full else [tx["hash"] for tx in transactions],
+        }
+
+    def _eth_getTransactionReceipt(self, tx_hash):
+        for contract in self.deployers:
+            creation = self._creation(contract)
+            if creation["hash"] == tx_hash.lower():
+                return {**creation, "transactionHash": creation["hash"], "contractAddress": contract, "status": "0x1"}
+        return None
+
+    def _eth_getStorageAt(self, address, slot, block="latest"):
+        return self.storage.get(f"{address.lower()}:{hex(int(slot, 16))}", ZERO_WORD)
+
+    def _eth_call(self, call, block="latest"):
+        to, data = call["to"].lower(), call.get("data") or call.get("input") or "0x"
+        if to == MULTICALL3_ADDRESS.lower() and not self.multicall3:
+            return "0x"
+        if to == MULTICALL3_ADDRESS.lower() and data[2:10] == AGGREGATE3_SELECTOR.hex():
+            (calls,) = decode(["(address,bool,bytes)[]"], bytes.fromhex(data[10:]))
+            results = []
+            for target, _, call_data in calls:
+                result = self.calls.get(f"{target.lower()}:0x{call_data.hex()}")
+                results.append((result is not None, bytes.fromhex(result[2:]) if result else b""))
+            return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+        result = self.calls.get(f"{to}:{data.lower()}")
+        if result is None:
+            raise RPCError(3, "execution reverted")
+        return result
+
+    def _eth_getLogs(self, criteria):
+        lo, hi = self._block(criteria.get("fromBlock")), self._block(criteria.get("toBlock"))
+        addresses = criteria.get("address") or []
+        addresses = {a.lower() for a in ([addresses] if isinstance(addresses, str) else addresses)}
+        topics = criteria.get("topics") or []
+        topic0 = topics[0].lower() if topics and isinstance(topics[0], str) else None
+
+        total = 0
+        ranges = []
+        for address, token in self.tokens.items():
+            if addresses and address not in addresses or topic0 not in (None, TRANSFER_TOPIC):
+                continue
+            start, stop = token.index_range(lo, hi)
+            ranges.append((token, start, stop))
+            total += stop - start
+        first = bisect.bisect_left(self._log_blocks, lo)
+        last = bisect.bisect_right(self._log_blocks, hi)
+        recorded = [
+            log for log in self.logs[first:last]
+            if (not addresses or log["address"].lower() in addresses)
+            and (topic0 is None or log["topics"][0].lower() == topic0)
+        ]
+        total += len(recorded)
+        if total > self.max_logs:
+            raise RPCError(-32005, f"query returned more than {self.max_logs} results")
+
+        out = recorded
+        for token, _, _ in ranges:
+            out += token.logs(lo, hi)
+        out.sort(key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)))
+        return out
+
+
+def _serve(kwargs: dict, urls):
+    server = ReplayServer(**kwargs).start()
+    urls.put(server.url)
+    threading.Event().wait()
+
+
+@contextmanager
+def replay_process(**kwargs):
+    """Run ReplayServer(**kwargs) in a child process; yields its URL."""
+    context = multiprocessing.get_context("fork")
+    urls = context.Queue()
+    process = context.Process(target=_serve, args=(kwargs, urls), daemon=True)
+    process.start()
+    try:
+        yield urls.get(timeout=30)
+    finally:
+        process.terminate()
+        process.join()
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def record_fixture(w3, addresses: list, from_block: int, to_block: int, calls: list = ()) -> dict:
+    """Capture what ReplayServer needs to replay `addresses` over a block range.
+
+    `calls` are `(address, calldata hex)` pairs to record as eth_call results.
+    """
+    provider = w3.provider
+    fixture = {"block_number": to_block, "code": {}, "calls": {}, "storage": {}, "logs": []}
+    for address in addresses:
+        fixture["code"][address.lower()] = provider.make_request("eth_getCode", [address, hex(to_block)])["result"]
+        response = provider.make_request("eth_getLogs", [{
+            "address": address, "fromBlock": hex(from_block), "toBlock": hex(to_block),
+        }])
+        fixture["logs"] += response.get("result", [])
+    for address, data in calls:
+        response = provider.make_request("eth_call", [{"to": address, "data": data}, hex(to_block)])
+        if "result" in response:
+            fixture["calls"][f"{address.lower()}:{data.lower()}"] = response["result"]
+    return fixture
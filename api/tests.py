@@ -1,3 +1,1204 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import numpy as np
+from eth_abi import encode
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from web3 import Web3
+
+from api.benchmarks.opcode_scanner import synthetic_contract
+from api.benchmarks.suite import compare, run_case
+from api.models import (
+    AnalysisJob, BytecodeBlob, ContractAnalysisResult, Holder, HolderAddress, HolderAnalysisResult, HolderTokenLink,
+    TokenBalance, TokenComplianceProfile, TokenLedgerCheckpoint,
+)
+from api.testing.rpc_replay import ZERO_WORD, ReplayServer, SyntheticToken
+from api.utils import contract_analysis, holder_analysis, jobs, log_fetcher
+from api.utils.analysis_cache import ANALYSIS_CACHE_ALIAS, evict_analysis, get_cached_analysis, store_analysis
+from api.utils.bytecode_store import store_bytecode, store_bytecodes
+from api.utils.clustering import UnionFind, cluster_addresses, clusters, raw_to_address
+from api.utils.contract import decode_text, fetch_token_metadata_many
+from api.utils.contract_analysis import (
+    ENGINE_VERSION, calculate_entropy, code_hash, entropy_profile, high_entropy_regions, run_contract_analysis,
+)
+from api.utils.distribution import distribution_stats
+from api.utils.entities import resolve_entities
+from api.utils.holder_analysis import _add_graph_findings, analyze_token_holders, analyze_watchlist
+from api.utils.holder_ledger import apply_deltas, ledger_holders
+from api.utils.holder_store import COPY_THRESHOLD, merge_holders, merged_addresses, save_holders, unmerge_holders
+from api.utils.jobs import _locked_token, claim_job, requeue_stale_jobs, schedule_graph_refreshes, submit_job, work
+from api.utils.log_archive import TRANSFER_DTYPE, covered_ranges, write_partition
+from api.utils import signature_index
+from api.utils.opcode_scanner import OPCODES, scan_bytecode
+from api.utils.profile_cache import cache_profile, get_cached_profile
+from api.utils.proxy import IMPLEMENTATION_SLOTS, minimal_proxy_target, resolve_implementations
+from api.utils.rescore import rescore_tokens
+from api.utils.rpc import RetryableResponse, TokenBucket, configure_web3, get_web3, rpc_stats
+from api.utils.scoring import get_policy, score_profile
+from api.utils.transfer_graph import TransferGraph, analyze_transfer_graph, short_cycles, strongly_connected_components
+from api.views import MAX_BULK_REGISTER
+
+TOKEN = "0x" + "42" * 20
+
+
+def _token(**kwargs):
+    # Small amounts keep balances exact on SQLite, whose decimals round at 15 digits
+    options = {"holders": 200, "first_block": 1_000, "last_block": 20_000, "max_amount": 10 ** 6}
+    options.update(kwargs)
+    return SyntheticToken(TOKEN, kwargs.pop("log_count", 3_000), **{k: v for k, v in options.items() if k != "log_count"})
+
+
+class ReplayTestCase(TestCase):
+    server_options = {}
+
+    def setUp(self):
+        self.archive = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"LOG_ARCHIVE_DIR": self.archive.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.archive.cleanup)
+        # No waiting between retries
+        patcher = mock.patch.object(log_fetcher, "backoff_delay", return_value=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serve(self, **options):
+        server = ReplayServer(**{**self.server_options, **options}).start()
+        self.addCleanup(server.stop)
+        configure_web3([server.url], rate=0, max_retries=2)
+        return server
+
+
+class ReplayServerTests(ReplayTestCase):
+    def test_replays_fixture(self):
+        fixture = {
+            "block_number": 500,
+            "code": {TOKEN: "0x6001"},
+            "deployments": {TOKEN: 100},
+            "calls": {f"{TOKEN}:0x313ce567": "0x" + "00" * 31 + "12"},
+        }
+        w3 = configure_web3([self.serve(fixture=fixture).url], rate=0)
+        self.assertEqual(w3.eth.block_number, 500)
+        self.assertEqual(w3.eth.get_code(w3.to_checksum_address(TOKEN)).hex(), "6001")
+        self.assertEqual(w3.eth.get_code(w3.to_checksum_address(TOKEN), block_identifier=99), b"")
+        self.assertEqual(w3.eth.call({"to": w3.to_checksum_address(TOKEN), "data": "0x313ce567"})[-1], 18)
+
+    def test_fixture_file_and_recorded_logs(self):
+        logs = _token(log_count=50).logs(0, 30_000)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"block_number": 30_000, "logs": logs}, f)
+        self.addCleanup(os.unlink, f.name)
+        w3 = configure_web3([self.serve(fixture=f.name).url], rate=0)
+        fetched = w3.eth.get_logs({"address": w3.to_checksum_address(TOKEN), "fromBlock": 0, "toBlock": 30_000})
+        self.assertEqual(len(fetched), 50)
+
+    def test_caps_log_queries(self):
+        w3 = configure_web3([self.serve(tokens=[_token()], max_logs=100).url], rate=0)
+        with self.assertRaisesRegex(Exception, "more than 100 results"):
+            w3.eth.get_logs({"address": w3.to_checksum_address(TOKEN), "fromBlock": 0, "toBlock": 20_000})
+
+    def test_injected_http_errors_fail_over(self):
+        flaky = self.serve(http_error_rate=1.0)
+        healthy = self.serve(fixture={"block_number": 7})
+        w3 = configure_web3([flaky.url, healthy.url], rate=0)
+        self.assertEqual(w3.eth.block_number, 7)
+        self.assertEqual(flaky.requests, 1)
+
+
+class RpcClientTests(ReplayTestCase):
+    def test_token_bucket_paces_after_the_burst(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        with mock.patch("api.utils.rpc.time.sleep") as sleep:
+            bucket.acquire(2)
+            sleep.assert_not_called()
+            bucket.acquire(3)
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.3, places=2)
+
+    def test_retries_then_gives_up(self):
+        server = self.serve(http_error_rate=1.0)
+        w3 = configure_web3([server.url], rate=0, max_retries=2)
+        with mock.patch("api.utils.rpc.time.sleep"), self.assertRaisesRegex(RetryableResponse, "HTTP 503"):
+            w3.eth.block_number
+        self.assertEqual(server.requests, 3)
+
+    def test_failing_endpoint_is_benched(self):
+        flaky = self.serve(http_error_rate=1.0)
+        healthy = self.serve(fixture={"block_number": 7})
+        w3 = configure_web3([flaky.url, healthy.url], rate=0)
+        for _ in range(5):
+            self.assertEqual(w3.eth.block_number, 7)
+        # Benched after three failures in a row, then tried last
+        self.assertEqual(flaky.requests, 3)
+        self.assertEqual([e["available"] for e in rpc_stats()], [False, True])
+
+    def test_stats_hide_provider_credentials(self):
+        server = self.serve(http_error_rate=1.0)
+        host = server.url.split("//")[1]
+        url = f"http://user:hunter2@{host}/v3/secret-project-id?apikey=secret-key"
+        w3 = configure_web3([url], rate=0, max_retries=0)
+        with self.assertRaises(RetryableResponse) as raised:
+            w3.eth.block_number
+        self.assertNotIn("secret", str(raised.exception))
+
+        client = APIClient()
+        self.assertEqual(client.get("/api/rpc/stats/").status_code, 403)
+        client.force_authenticate(User.objects.create(username="ops", is_staff=True))
+        response = client.get("/api/rpc/stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["endpoints"][0]["url"], f"http://{host}")
+        body = response.content.decode()
+        self.assertNotIn("secret", body)
+        self.assertNotIn("hunter2", body)
+
+
+class LogFetcherTests(ReplayTestCase):
+    def fetch(self, token, **kwargs):
+        chunks = []
+        w3 = configure_web3([self.server.url], rate=0)
+        report = log_fetcher.fetch_logs(
+            w3, w3.to_checksum_address(TOKEN), [], 0, 25_000,
+            on_chunk=lambda start, end, logs: chunks.append((start, end, len(logs))), **kwargs
+        )
+        return report, chunks
+
+    def test_splits_ranges_and_delivers_in_order(self):
+        self.server = self.serve(tokens=[_token()], max_logs=200)
+        report, chunks = self.fetch(_token())
+        self.assertEqual(report["covered_ranges"], [[0, 25_000]])
+        self.assertEqual(report["logs"], 3_000)
+        self.assertEqual([c[0] for c in chunks], sorted(c[0] for c in chunks))
+        self.assertTrue(all(a[1] + 1 == b[0] for a, b in zip(chunks, chunks[1:])))
+
+    def test_chunk_size_settles(self):
+        # 3000 logs capped at 200 per request: a few dozen requests, not hundreds
+        self.server = self.serve(tokens=[_token()], max_logs=200)
+        report, _ = self.fetch(_token())
+        self.assertLess(report["requests"], 60)
+
+    def test_retries_injected_errors(self):
+        self.server = self.serve(tokens=[_token()], rpc_error_rate=0.2)
+        report, _ = self.fetch(_token())
+        self.assertEqual(report["failed_ranges"], [])
+        self.assertEqual(report["logs"], 3_000)
+
+    def test_rate_limits_are_retried_not_split(self):
+        self.server = self.serve(tokens=[_token()])
+        throttled = ValueError({"code": -32005, "message": "project ID request rate exceeded"})
+        with mock.patch.object(log_fetcher, "_get_logs", side_effect=[throttled, throttled, []]) as get_logs:
+            report, chunks = self.fetch(_token(), chunk_size=30_000)
+        self.assertEqual(get_logs.call_count, 3)
+        self.assertEqual(chunks, [(0, 25_000, 0)])
+        self.assertEqual(report["failed_ranges"], [])
+
+    def test_classifies_provider_errors(self):
+        for message in ("project ID request rate exceeded", "daily request count exceeded",
+                        "429 Client Error: Too Many Requests"):
+            self.assertFalse(log_fetcher.is_too_many_results(ValueError(message)), message)
+            self.assertTrue(log_fetcher.is_rate_limited(ValueError(message)), message)
+        for message in ("query returned more than 10000 results",
+                        "Log response size exceeded. You can make eth_getLogs requests with up to a 2K block range"):
+            self.assertTrue(log_fetcher.is_too_many_results(ValueError(message)), message)
+
+    def test_persistent_errors_stop_at_a_gap(self):
+        self.server = self.serve(tokens=[_token()], rpc_error_rate=1.0)
+        report, chunks = self.fetch(_token())
+        self.assertEqual(report["covered_ranges"], [])
+        self.assertEqual(chunks, [])
+        self.assertTrue(report["failed_ranges"])
+
+
+class HolderAnalysisTests(ReplayTestCase):
+    def expected(self, token, to_block):
+        return {a: b for a, b in token.balances(0, to_block).items() if b > 0}
+
+    def test_window_matches_reference(self):
+        token = _token()
+        self.serve(tokens=[token])
+        result = analyze_token_holders(TOKEN, from_block=0, to_block=20_000, top_n=5)
+        expected = self.expected(token, 20_000)
+        self.assertEqual(result["total_holders"], len(expected))
+        self.assertEqual(result["total_supply_calculated"], sum(expected.values()))
+        self.assertEqual(result["top_holders"][0]["balance"], max(expected.values()))
+        self.assertEqual(result["covered_ranges"], [[0, 20_000]])
+        # Mints, burns and self-transfers aren't graph edges
+        moves = [log["topics"][1:] for log in token.logs(0, 20_000)]
+        edges = [(a, b) for a, b in moves if a != b and ZERO_WORD not in (a, b)]
+        self.assertEqual(result["transfer_graph"]["transfers"], len(edges))
+        self.assertTrue(set(result["transfer_graph"]["anomalies"]) <= set(result["anomalies"]))
+
+    def test_rerun_reads_the_archive(self):
+        token = _token()
+        server = self.serve(tokens=[token])
+        first = analyze_token_holders(TOKEN, from_block=0, to_block=15_000)
+        logs = server.methods["eth_getLogs"]
+        second = analyze_token_holders(TOKEN, from_block=0, to_block=15_000)
+        self.assertEqual(server.methods["eth_getLogs"], logs)
+        self.assertEqual(second["archived_logs"], len(token.logs(0, 15_000)))
+        self.assertEqual(first["total_supply_calculated"], second["total_supply_calculated"])
+
+    def test_ledger_is_incremental(self):
+        token = _token()
+        self.serve(tokens=[token])
+        TokenComplianceProfile.objects.create(token_address=TOKEN)
+
+        first = analyze_token_holders(TOKEN, to_block=10_000)
+        self.assertEqual(first["last_processed_block"], 10_000)
+        second = analyze_token_holders(TOKEN, to_block=20_000)
+        self.assertEqual(second["covered_ranges"], [[10_001, 20_000]])
+
+        expected = self.expected(token, 20_000)
+        self.assertEqual(second["total_holders"], len(expected))
+        self.assertEqual(second["total_supply_calculated"], sum(expected.values()))
+
+    def test_concurrent_first_runs_apply_once(self):
+        profile = TokenComplianceProfile.objects.create(token_address=TOKEN)
+        deltas = {_address(1): 5, _address(2): 7}
+        self.assertTrue(apply_deltas(profile, deltas, None, 0, 100, True))
+        # A second run computed from no ledger is turned away
+        self.assertFalse(apply_deltas(profile, deltas, None, 0, 100, True))
+
+        # The other run's ledger appears while this one is writing its own
+        other = TokenComplianceProfile.objects.create(token_address="0x" + "43" * 20)
+        bulk_create = TokenBalance.objects.bulk_create
+
+        def racing(rows, **kwargs):
+            TokenLedgerCheckpoint.objects.get_or_create(token=other, start_block=0, last_processed_block=100)
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(TokenBalance.objects, "bulk_create", side_effect=racing):
+            self.assertFalse(apply_deltas(other, deltas, None, 0, 100, True))
+        self.assertEqual(dict(ledger_holders(profile)), deltas)
+        self.assertEqual(dict(ledger_holders(other)), {})
+
+    def test_graph_pass_runs_as_its_own_job(self):
+        self.serve(tokens=[_token()])
+        profile = TokenComplianceProfile.objects.create(token_address=TOKEN)
+
+        def analyse(to_block):
+            result = analyze_token_holders(TOKEN, to_block=to_block)
+            profile.modules = {"holderAnalysis": result}
+            profile.save(update_fields=["modules"])
+            return result
+
+        with mock.patch.object(TransferGraph, "from_archive", wraps=TransferGraph.from_archive) as from_archive:
+            analyse(10_000)
+            self.assertEqual(from_archive.call_count, 0)
+            self.assertEqual(schedule_graph_refreshes([profile]), 1)
+            work("test", once=True)
+            self.assertEqual(from_archive.call_count, 1)
+            profile.refresh_from_db()
+            findings = profile.modules["holderAnalysis"]["transfer_graph"]
+            self.assertEqual(findings["covered_ranges"], [[1_000, 10_000]])
+
+            # Coverage unchanged: the stored findings are reused
+            submit_job(profile, "graph")
+            work("test", once=True)
+            self.assertEqual(from_archive.call_count, 1)
+
+            # Ledger runs carry the findings over until they are far enough past them
+            with mock.patch.object(holder_analysis, "GRAPH_REFRESH_BLOCKS", 10_000):
+                self.assertEqual(analyse(15_000)["transfer_graph"], findings)
+                self.assertEqual(schedule_graph_refreshes([profile]), 0)
+                analyse(20_000)
+                self.assertEqual(schedule_graph_refreshes([profile]), 1)
+            work("test", once=True)
+            self.assertEqual(from_archive.call_count, 2)
+        profile.refresh_from_db()
+        self.assertEqual(profile.modules["holderAnalysis"]["transfer_graph"]["covered_ranges"], [[1_000, 20_000]])
+
+    def test_graph_anomalies_need_a_gap_free_archive(self):
+        write_partition(TOKEN, 0, 99, _transfers(TransferGraphTests.EDGES))
+        write_partition(TOKEN, 200, 299, np.zeros(0, dtype=TRANSFER_DTYPE))
+        result = {"anomalies": []}
+        _add_graph_findings(result, TOKEN, 0, 299)
+        self.assertEqual(result["transfer_graph"]["covered_ranges"], [[0, 99], [200, 299]])
+        self.assertFalse(result["transfer_graph"]["complete"])
+        self.assertTrue(result["transfer_graph"]["anomalies"])
+        self.assertEqual(result["anomalies"], [])
+
+        write_partition(TOKEN, 100, 199, np.zeros(0, dtype=TRANSFER_DTYPE))
+        _add_graph_findings(result, TOKEN, 0, 299)
+        self.assertEqual(result["anomalies"], result["transfer_graph"]["anomalies"])
+
+
+class WatchlistTests(ReplayTestCase):
+    def test_reads_archived_prefix_and_fetches_the_rest(self):
+        other_address = "0x" + "43" * 20
+        token, other = _token(), SyntheticToken(other_address, 2_000, holders=100, last_block=20_000, seed=1,
+                                                max_amount=10 ** 6)
+        server = self.serve(tokens=[token, other])
+        analyze_token_holders(TOKEN, from_block=0, to_block=10_000)
+        profiles = [TokenComplianceProfile.objects.create(token_address=a) for a in (TOKEN, other_address)]
+
+        results = analyze_watchlist(profiles, to_block=15_000)
+        self.assertEqual(results[TOKEN]["archived_logs"], len(token.logs(0, 10_000)))
+        self.assertEqual(results[other_address]["archived_logs"], 0)
+        for synthetic in (token, other):
+            result = results[synthetic.address]
+            expected = {a: b for a, b in synthetic.balances(0, 15_000).items() if b > 0}
+            self.assertEqual(result["total_supply_calculated"], sum(expected.values()))
+            self.assertEqual(result["covered_ranges"], [[1_000, 15_000]])
+        # Only the new blocks went to the archive, next to what was there
+        self.assertEqual(covered_ranges(TOKEN), [[0, 15_000]])
+        self.assertEqual(covered_ranges(other_address), [[1_000, 15_000]])
+        self.assertLess(server.methods["eth_getLogs"], 10)
+
+
+class DistributionTests(TestCase):
+    def test_equal_holders(self):
+        stats = distribution_stats([5, 5, 5, 5])
+        self.assertEqual(stats["gini"], 0.0)
+        self.assertEqual(stats["nakamoto_coefficient"], 3)
+        self.assertEqual(stats["hhi"], 2500.0)
+        self.assertEqual(stats["top_1_percent_share"], 25.0)
+
+    def test_one_whale(self):
+        stats = distribution_stats([901] + [1] * 99 + [0] * 5)
+        self.assertEqual(stats["gini"], 0.891)
+        self.assertEqual(stats["nakamoto_coefficient"], 1)
+        self.assertEqual(stats["hhi"], 8119.0)
+        self.assertEqual(stats["top_1_percent_share"], 90.1)
+        self.assertEqual(stats["top_10_percent_share"], 91.0)
+
+    def test_uint256_balances(self):
+        stats = distribution_stats([3 * 10 ** 70, 10 ** 70])
+        self.assertEqual(stats["gini"], 0.25)
+        self.assertEqual(stats["hhi"], 6250.0)
+        self.assertEqual(distribution_stats([])["nakamoto_coefficient"], 0)
+
+
+class AnalysisJobTests(ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.token = TokenComplianceProfile.objects.create(token_address=TOKEN)
+
+    def test_holder_analysis_is_queued_and_coalesced(self):
+        token = _token()
+        self.serve(tokens=[token])
+        url = f"/api/api/token/{self.token.id}/analyses/holders/"
+        first = self.client.post(url, {}, format="json")
+        second = self.client.post(url, {"persist_all": True}, format="json")
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 202)
+        self.assertFalse(first.data["coalesced"])
+        self.assertTrue(second.data["coalesced"])
+        self.assertFalse(first.data["params_mismatch"])
+        # The queued job keeps its options; the caller is told persist_all wasn't applied
+        self.assertTrue(second.data["params_mismatch"])
+        self.assertEqual(second.data["job"]["params"], {"persist_all": False})
+        self.assertEqual(first.data["job"]["id"], second.data["job"]["id"])
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+
+        # The holder job queues the transfer-graph pass, which runs next
+        self.assertEqual(work("test", once=True), 2)
+        self.assertEqual(AnalysisJob.objects.get(module="graph").status, AnalysisJob.SUCCEEDED)
+        job = self.client.get(first.data["status_url"]).data
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["progress"]["logs_decoded"], 3_000)
+        self.assertEqual(job["progress"]["blocks_scanned"], job["progress"]["blocks_total"])
+        self.assertEqual(job["result"]["total_holders"], len([b for b in token.balances(0, 20_000).values() if b > 0]))
+        self.token.refresh_from_db()
+        self.assertIn("transfer_graph", self.token.modules["holderAnalysis"])
+
+        # Finished jobs don't absorb new requests
+        third = self.client.post(url, {}, format="json")
+        self.assertFalse(third.data["coalesced"])
+
+    def test_contract_analysis_job(self):
+        self.serve(fixture={"block_number": 1, "code": {TOKEN: "0x" + synthetic_contract(4_000, seed=3).hex()}})
+        response = self.client.post(f"/api/token/{self.token.id}/analyse/contract/")
+        self.assertEqual(response.status_code, 202)
+        work("test", once=True)
+
+        job = AnalysisJob.objects.get(id=response.data["job"]["id"])
+        self.assertEqual(job.status, "succeeded", job.error)
+        self.assertEqual(ContractAnalysisResult.objects.filter(token=self.token).count(), 1)
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.risk_score, job.result["score"])
+
+    def test_failed_job_records_error(self):
+        self.serve(http_error_rate=1.0)
+        job, _ = submit_job(self.token, "contract")
+        work("test", once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(job.error)
+
+    def test_claims_are_exclusive_and_stale_jobs_requeued(self):
+        job, _ = submit_job(self.token, "holders")
+        self.assertEqual(claim_job("a").id, job.id)
+        self.assertIsNone(claim_job("b"))
+
+        AnalysisJob.objects.filter(id=job.id).update(heartbeat_at=job.created_at - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(claim_job("b").attempts, 2)
+
+    def test_heartbeat_without_progress(self):
+        job, _ = submit_job(self.token, "contract")
+        job = claim_job("test")
+
+        def silent(token, params, progress):
+            time.sleep(0.2)
+            return {}
+
+        with mock.patch.dict(jobs.RUNNERS, {"contract": silent}), \
+                mock.patch.object(jobs, "JOB_HEARTBEAT_INTERVAL", 0.02), \
+                mock.patch.object(jobs, "_beat") as beat:
+            jobs.run_job(job)
+        self.assertGreater(beat.call_count, 1)
+        beat.assert_called_with(job)
+
+    def test_unknown_job(self):
+        response = self.client.get(f"/api/jobs/{uuid.uuid4()}/")
+        self.assertEqual(response.status_code, 404)
+
+
+class TokenProfileCacheTests(TestCase):
+    def setUp(self):
+        caches["profiles"].clear()
+        self.client = APIClient()
+        self.token = TokenComplianceProfile.objects.create(token_address=TOKEN, symbol="TKN")
+        self.url = f"/api/token/{TOKEN.upper().replace('0X', '0x')}/"
+
+    def test_polls_are_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(first.content)["symbol"], "TKN")
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_conditional_get(self):
+        first = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_updates_invalidate(self):
+        first = self.client.get(self.url)
+        with _locked_token(self.token.id) as token:
+            token.modules["holderAnalysis"] = {"centralization_score": 12.5}
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+        self.assertEqual(json.loads(response.content)["modules"]["holderAnalysis"]["centralization_score"], 12.5)
+
+    def test_stale_render_is_not_cached(self):
+        # A request reads the profile, an update commits and invalidates, then the request caches its read
+        entry, generation = get_cached_profile(TOKEN)
+        self.assertIsNone(entry)
+        stale = TokenComplianceProfile.objects.get(id=self.token.id)
+        with _locked_token(self.token.id) as token:
+            token.modules["holderAnalysis"] = {"centralization_score": 12.5}
+        cache_profile(stale, generation)
+
+        response = self.client.get(self.url)
+        self.assertEqual(json.loads(response.content)["modules"]["holderAnalysis"]["centralization_score"], 12.5)
+
+    def test_unknown_token(self):
+        self.assertEqual(self.client.get(f"/api/token/0x{'00' * 20}/").status_code, 404)
+
+
+class TokenListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        TokenComplianceProfile.objects.bulk_create([
+            TokenComplianceProfile(
+                token_address=f"0x{i:040x}",
+                risk_score=i,
+                recommendation="go" if i % 2 else "no_go",
+                modules={"large": "x" * 1000},
+            )
+            for i in range(25)
+        ])
+        # Ties on created_at are broken by id
+        TokenComplianceProfile.objects.filter(risk_score__lt=10).update(created_at=timezone.now())
+
+    def pages(self, query=""):
+        tokens, cursor, pages = [], None, 0
+        while True:
+            url = f"/api/token/?limit=7{query}" + (f"&cursor={cursor}" if cursor else "")
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            tokens += response.data["tokens"]
+            pages += 1
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                return tokens, pages
+
+    def test_pages_cover_every_token_once(self):
+        tokens, pages = self.pages()
+        self.assertEqual(pages, 4)
+        self.assertEqual(len({t["id"] for t in tokens}), 25)
+        self.assertNotIn("modules", tokens[0])
+
+    def test_filters(self):
+        tokens, _ = self.pages("&recommendation=go&min_score=5&max_score=15")
+        self.assertEqual(sorted(t["risk_score"] for t in tokens), [5, 7, 9, 11, 13, 15])
+
+    def test_json_columns_are_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/token/?limit=5")
+        self.assertNotIn("modules", queries[0]["sql"])
+        self.assertNotIn("OFFSET", queries[0]["sql"].upper())
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get("/api/token/?cursor=nope").status_code, 400)
+        self.assertEqual(self.client.get("/api/token/?recommendation=maybe").status_code, 400)
+        self.assertEqual(self.client.get("/api/token/?min_score=high").status_code, 400)
+
+
+def query_plan(queryset) -> str:
+    # Tiny test tables make sequential scans cheapest on PostgreSQL; rule them
+    # out so the plan shows whether a usable index exists
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.token = TokenComplianceProfile.objects.create(token_address=TOKEN.upper().replace("0X", "0x"))
+
+    def assertUsesIndex(self, queryset, name=None):
+        plan = query_plan(queryset)
+        self.assertIn("INDEX", plan.upper(), plan)
+        self.assertNotIn("Seq Scan", plan)
+        if name:
+            self.assertIn(name, plan)
+
+    def test_addresses_are_stored_lowercase(self):
+        self.assertEqual(TokenComplianceProfile.objects.get(id=self.token.id).token_address, TOKEN)
+
+    def test_profile_lookup_uses_unique_index(self):
+        self.assertUsesIndex(TokenComplianceProfile.objects.filter(token_address=TOKEN))
+
+    def test_contract_history_uses_composite_index(self):
+        self.assertUsesIndex(
+            ContractAnalysisResult.objects.filter(token=self.token).order_by("-analyzed_at"),
+            "contract_analysis_token_idx",
+        )
+
+    def test_holder_history_uses_composite_index(self):
+        self.assertUsesIndex(
+            HolderAnalysisResult.objects.filter(token=self.token).order_by("-created_at"),
+            "holder_analysis_token_idx",
+        )
+
+    def test_token_list_uses_keyset_index(self):
+        self.assertUsesIndex(
+            TokenComplianceProfile.objects.filter(recommendation="go").order_by("-created_at", "-id"),
+            "token_profile_rec_created_idx",
+        )
+
+    def test_latest_analysis_pointer(self):
+        ContractAnalysisResult.objects.create(token=self.token, score=50)
+        with _locked_token(self.token.id) as token:
+            token.latest_contract_analysis = ContractAnalysisResult.objects.create(token=self.token, score=90)
+        response = APIClient().get(f"/api/token/{self.token.id}/analyses/contract/")
+        self.assertEqual(response.data["latest"], response.data["analyses"][0]["id"])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.token = TokenComplianceProfile.objects.create(token_address=TOKEN, flags=["proxy_detected"])
+        other = TokenComplianceProfile.objects.create(token_address="0x" + "11" * 20)
+        save_holders(self.token, [(f"0x{i:040x}", 10 ** 9 + i) for i in range(1, 1_201)])
+        save_holders(other, [("0x" + "22" * 20, 5)])
+        ContractAnalysisResult.objects.create(token=self.token, score=42, evidence=[{"opcode": "DELEGATECALL"}])
+
+    def read(self, url):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_holder_links(self):
+        rows = [json.loads(line) for line in self.read("/api/export/holder_links/").splitlines()]
+        self.assertEqual(len(rows), 1_201)
+        balances = {row["balance"] for row in rows if row["token_address"] == TOKEN}
+        self.assertEqual(max(balances), 10 ** 9 + 1_200)
+
+        rows = self.read(f"/api/export/holder_links/?token={TOKEN.upper().replace('0X', '0x')}").splitlines()
+        self.assertEqual(len(rows), 1_200)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.read("/api/export/contract_analyses/?output=csv"))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["token_address"], TOKEN)
+        self.assertEqual(json.loads(rows[0]["evidence"]), [{"opcode": "DELEGATECALL"}])
+
+        rows = list(csv.DictReader(io.StringIO(self.read("/api/export/tokens/?output=csv"))))
+        self.assertEqual(len(rows), 2)
+
+    def test_rejects_unknown_exports(self):
+        self.assertEqual(APIClient().get("/api/export/secrets/").status_code, 400)
+        self.assertEqual(APIClient().get("/api/export/tokens/?output=xml").status_code, 400)
+        self.assertEqual(APIClient().get(f"/api/export/tokens/?token=0x{'33' * 20}").status_code, 404)
+
+    def test_command_writes_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as f:
+            call_command("export_data", "tokens", "--token", TOKEN, "-o", f.name)
+            rows = [json.loads(line) for line in open(f.name)]
+        self.assertEqual([row["flags"] for row in rows], [["proxy_detected"]])
+
+
+class ScoringTests(TestCase):
+    def test_policy_1_matches_original_rules(self):
+        policy = get_policy("1")
+        for count in range(8):
+            score, recommendation = score_profile(["flag"] * count, policy=policy)
+            self.assertEqual(score, max(0, 100 - count * 15))
+            self.assertEqual(recommendation, "enhanced_due_diligence" if score < 70 else "go")
+
+    def test_holder_anomalies_and_metrics(self):
+        holders = {"anomalies": ["majority_owned_by_one_wallet"], "distribution": {"hhi": 9_000, "gini": 0.5}}
+        self.assertEqual(score_profile(["proxy_detected"], holders, get_policy("2")), (55.0, "enhanced_due_diligence"))
+        self.assertEqual(score_profile(["obfuscated_code"] * 3, holders, get_policy("2"))[1], "no_go")
+
+    def test_bulk_rescore(self):
+        holders = {"anomalies": ["whale_owned"], "distribution": {"hhi": 3_000}}
+        TokenComplianceProfile.objects.bulk_create([
+            TokenComplianceProfile(
+                token_address=f"0x{i:040x}",
+                flags=["proxy_detected"] * (i % 4),
+                modules={"holderAnalysis": holders} if i % 2 else {},
+            )
+            for i in range(50)
+        ])
+        with mock.patch("api.utils.rpc.get_web3", side_effect=AssertionError("no RPC")):
+            summary = rescore_tokens("2", batch_size=16)
+        self.assertEqual((summary["scanned"], summary["updated"]), (50, 50))
+
+        for token in TokenComplianceProfile.objects.all():
+            expected = score_profile(token.flags, token.modules.get("holderAnalysis"), get_policy("2"))
+            self.assertEqual((token.risk_score, token.recommendation, token.scoring_version), (*expected, "2"))
+
+        self.assertEqual(rescore_tokens("2")["updated"], 0)
+        self.assertEqual(rescore_tokens("1")["updated"], 50)
+
+
+class SaveHoldersTests(TestCase):
+    def test_upserts_and_prunes(self):
+        token = TokenComplianceProfile.objects.create(token_address=TOKEN)
+        holders = [(f"0x{i:040x}", i) for i in range(1, 51)]
+        self.assertEqual(save_holders(token, holders), 50)
+
+        updated = [(address, balance * 2) for address, balance in holders[:30]]
+        save_holders(token, updated, prune=True)
+        links = HolderTokenLink.objects.filter(token=token)
+        self.assertEqual(links.count(), 30)
+        self.assertEqual(int(links.get(holder_address__address__iexact=holders[0][0]).balance), 2)
+
+    @skipUnless(connection.vendor == "postgresql", "COPY loads need PostgreSQL")
+    def test_copy_loads_repeat_in_one_transaction(self):
+        token = TokenComplianceProfile.objects.create(token_address=TOKEN)
+        # Enough addresses for two merge calls of COPY_THRESHOLD pairs each
+        holders = [(_address(i), i) for i in range(1, COPY_THRESHOLD * 4 + 1)]
+        pairs = [[_address(i), _address(i + 1)] for i in range(1, COPY_THRESHOLD * 4, 2)]
+        with transaction.atomic():
+            save_holders(token, holders)
+            save_holders(token, [(address, balance * 2) for address, balance in holders])
+            self.assertEqual(merge_holders(pairs[:COPY_THRESHOLD]), COPY_THRESHOLD)
+            self.assertEqual(merge_holders(pairs[COPY_THRESHOLD:]), COPY_THRESHOLD)
+        self.assertEqual(int(HolderTokenLink.objects.get(holder_address__address__iexact=_address(7)).balance), 14)
+
+
+def _address(i: int) -> str:
+    return f"0x{i:040x}"
+
+
+def _transfers(edges) -> np.ndarray:
+    """TRANSFER_DTYPE rows for (sender, recipient) pairs of _address numbers, one per block."""
+    rows = np.zeros(len(edges), dtype=TRANSFER_DTYPE)
+    rows["block"] = np.arange(len(edges))
+    for row, (sender, recipient) in zip(rows, edges):
+        row["sender"] = np.frombuffer(bytes.fromhex(_address(sender)[2:]), np.uint8)
+        row["recipient"] = np.frombuffer(bytes.fromhex(_address(recipient)[2:]), np.uint8)
+    return rows
+
+
+# 10 funds 11 and 12; exchange 20 funds 21-25; 31 and 32 sweep into 30;
+# 41 and 42 are funded by different addresses
+CLUSTER_EDGES = [
+    (0, 10), (10, 11), (10, 12), (11, 12),
+    (0, 20), *[(20, i) for i in range(21, 26)],
+    (0, 31), (0, 32), (31, 30), (31, 30), (32, 30), (32, 30), (30, 33),
+    (0, 40), (40, 41), (43, 42), (41, 42),
+]
+
+
+class ClusteringTests(TestCase):
+    def groups(self, **kwargs):
+        addresses, labels = cluster_addresses(_transfers(CLUSTER_EDGES), **kwargs)
+        return sorted(sorted(int(a, 16) for a in cluster) for cluster in clusters(addresses, labels))
+
+    def test_union_find(self):
+        uf = UnionFind(6)
+        uf.union([0, 2, 4], [1, 3, 5])
+        uf.union([3], [1])
+        self.assertEqual(uf.find().tolist(), [0, 0, 0, 0, 4, 4])
+
+    def test_heuristics(self):
+        self.assertEqual(self.groups(max_fanout=3), [[10, 11, 12], [30, 31, 32]])
+        # Within the fanout limit the exchange's customers merge too
+        self.assertIn([20, 21, 22, 23, 24, 25], self.groups(max_fanout=5))
+        self.assertEqual(self.groups(max_fanout=3, exclude=[_address(10)]), [[30, 31, 32]])
+        self.assertIn([50, 51], self.groups(max_fanout=3, deployers={_address(50): _address(51)}))
+        # A collector that also receives from a non-sweeper collects for nobody
+        addresses, labels = cluster_addresses(_transfers(CLUSTER_EDGES + [(44, 30)]), max_fanout=3)
+        self.assertNotIn(_address(30), [a for cluster in clusters(addresses, labels) for a in cluster])
+
+    def test_pool_links_nobody(self):
+        # Pool 90 funds buyers 91-93; wallets 94-97 each sell into it twice
+        edges = [
+            (0, 90), (90, 91), (90, 92), (90, 93),
+            *[(80 + i, 94 + i) for i in range(4)], *[(94 + i, 90) for i in range(4) for _ in range(2)],
+        ]
+        addresses, labels = cluster_addresses(_transfers(edges))
+        self.assertEqual(len(clusters(addresses, labels)[0]), 8)
+        for options in ({"contracts": [_address(90)]}, {"max_degree": 6}):
+            addresses, labels = cluster_addresses(_transfers(edges), **options)
+            self.assertEqual(clusters(addresses, labels), [], options)
+
+    def test_merge_holders(self):
+        token = TokenComplianceProfile.objects.create(token_address=TOKEN)
+        save_holders(token, [(_address(i), 1) for i in (11, 12, 13)])
+        self.assertEqual(merge_holders([[_address(10), _address(11), _address(12)]]), 1)
+        self.assertEqual(merge_holders([[_address(11), _address(12)]]), 0)
+
+        holders = dict(HolderAddress.objects.values_list("address", "holder_id"))
+        self.assertEqual(holders[Web3.to_checksum_address(_address(11))],
+                         holders[Web3.to_checksum_address(_address(12))])
+        # Only the asked-for addresses are looked up, and only merged ones are returned
+        self.assertEqual(merged_addresses([_address(11), _address(13)]),
+                         {_address(11): holders[Web3.to_checksum_address(_address(11))]})
+        # The emptied holder is kept so the merge can be undone
+        self.assertEqual(Holder.objects.count(), 3)
+        self.assertEqual(unmerge_holders([_address(11), _address(12)]), 1)
+        self.assertEqual(HolderAddress.objects.values("holder_id").distinct().count(), 3)
+
+        self.assertEqual(merge_holders([[_address(11), _address(12), _address(13)]], max_group=2), 0)
+
+
+class TransferGraphTests(TestCase):
+    # 1 <-> 2; ring 3 -> 4 -> 5 -> 3; hub 100 funds 101-130, which all forward to 200
+    EDGES = [
+        (0, 1), (1, 2), (2, 1), (3, 4), (4, 5), (5, 3), (6, 7),
+        *[(100, i) for i in range(101, 131)], *[(i, 200) for i in range(101, 131)],
+    ]
+
+    def graph(self, edges=EDGES):
+        return TransferGraph.from_transfers(_transfers(edges))
+
+    def test_csr_layout(self):
+        graph = self.graph([(1, 2), (1, 3), (1, 2), (3, 1), (0, 3), (2, 2)])
+        self.assertEqual([int(a, 16) for a in map(raw_to_address, graph.addresses)], [0, 1, 2, 3])
+        self.assertEqual(graph.indptr.tolist(), [0, 0, 2, 2, 3])
+        self.assertEqual(graph.indices.tolist(), [2, 3, 1])
+        self.assertEqual(graph.counts.tolist(), [2, 1, 1])
+
+    def test_cycles_and_components(self):
+        graph = self.graph()
+        cycles = short_cycles(graph)
+        self.assertEqual((cycles["two"], cycles["three"]), (1, 1))
+        self.assertEqual(int(cycles["edges"].sum()), 5)
+
+        labels = strongly_connected_components(graph)
+        members = [graph.addresses[labels == label] for label in np.unique(labels[labels >= 0])]
+        self.assertEqual(
+            sorted(sorted(int(raw_to_address(a), 16) for a in group) for group in members), [[1, 2], [3, 4, 5]]
+        )
+
+    def test_findings(self):
+        findings = analyze_transfer_graph(self.graph())
+        self.assertEqual(findings["anomalies"], ["circular_transfers", "sybil_distribution", "closed_trading_ring"])
+        self.assertEqual(findings["sybil_hubs"][0]["addresses"], 30)
+        self.assertEqual(findings["rings"][0]["size"], 3)
+        self.assertEqual(analyze_transfer_graph(self.graph([(1, 2), (2, 3)]))["anomalies"], [])
+
+
+class EntityResolutionTests(ReplayTestCase):
+    def test_resolves_entities_with_deployers(self):
+        self.serve(fixture={
+            "block_number": 1_000,
+            "code": {TOKEN: "0x6080"},
+            "deployments": {TOKEN: 100},
+            "deployers": {TOKEN: _address(60)},
+        })
+        # A wallet-level holder analysis: no single wallet owns a majority
+        token = TokenComplianceProfile.objects.create(token_address=TOKEN, modules={"holderAnalysis": {
+            "top_holders": [{"address": _address(i), "balance": 1} for i in range(5)],
+            "anomalies": ["low_distribution", "circular_transfers"],
+        }})
+        write_partition(TOKEN, 0, 999, _transfers(CLUSTER_EDGES))
+        balances = {_address(11): 100, _address(12): 100, _address(13): 50, TOKEN: 30, _address(60): 20}
+        TokenBalance.objects.bulk_create(TokenBalance(token=token, address=a, balance=b) for a, b in balances.items())
+        save_holders(token, balances.items())
+
+        summary = resolve_entities([token], w3=get_web3(), max_fanout=3)
+        self.assertEqual(summary["deployers"], 1)
+        self.assertEqual(summary["holders_merged"], 2)
+
+        entities = TokenComplianceProfile.objects.get(id=token.id).modules["holderEntities"]
+        self.assertEqual((entities["total_entities"], entities["total_holders"]), (3, 5))
+        self.assertEqual([e["balance"] for e in entities["top_entities"]], [200, 50, 50])
+        self.assertEqual(entities["top_entities"][0]["address_count"], 2)
+
+        # The holder analysis now counts entities: 11 and 12 together own two thirds
+        token.refresh_from_db()
+        analysis = token.modules["holderAnalysis"]
+        self.assertEqual(analysis["distribution"], entities["distribution"])
+        self.assertEqual(analysis["anomalies"],
+                         ["whale_owned", "low_distribution", "majority_owned_by_one_wallet", "circular_transfers"])
+        self.assertEqual(token.risk_score, 40.0)
+
+        call_command("cluster_holders", "--undo", _address(11), _address(12), stdout=io.StringIO())
+        token.refresh_from_db()
+        self.assertEqual(token.modules["holderEntities"]["total_entities"], 4)
+        self.assertNotIn("majority_owned_by_one_wallet", token.modules["holderAnalysis"]["anomalies"])
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_small_case_runs_offline(self):
+        result = run_case("holders_small", memory=False)
+        self.assertEqual(result["items"], 1_000)
+        self.assertGreater(result["rpc_calls"], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"holders_small": {"seconds": 1.0, "peak_mb": 10.0, "rpc_calls": 10}}
+        results = {"holders_small": {"seconds": 1.1, "peak_mb": 20.0, "rpc_calls": 10}}
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("peak_mb", regressions[0])
+
+
+class OpcodeScannerTests(TestCase):
+    def test_push_immediates_are_skipped(self):
+        # PUSH2 0x5bf4 (bytes that read as JUMPDEST DELEGATECALL), JUMPDEST, PUSH1 0xf0, CALLER, STOP
+        code = bytes.fromhex("615bf45b60f03300")
+        scan = scan_bytecode(code, head_size=3)
+        self.assertEqual(scan["instruction_count"], 5)
+        self.assertEqual(scan["histogram"][OPCODES["JUMPDEST"]], 1)
+        self.assertEqual(scan["histogram"][OPCODES["DELEGATECALL"]], 0)
+        self.assertEqual(scan["flags"], set())
+        self.assertEqual(scan["first_offsets"][OPCODES["JUMPDEST"]], 3)
+        self.assertEqual(scan["head"], bytes([0x61, 0x5b, 0x60]))
+
+    def test_flags_and_truncated_push(self):
+        # DELEGATECALL, then a PUSH32 running past the end of the code
+        scan = scan_bytecode(bytes.fromhex("f47f0102"))
+        self.assertEqual(scan["flags"], {OPCODES["DELEGATECALL"]})
+        self.assertEqual(scan["instruction_count"], 2)
+
+
+class SelectorTests(TestCase):
+    def test_dispatcher_patterns(self):
+        code = bytes.fromhex(
+            "63a9059cbb14"      # PUSH4 transfer EQ
+            "63095ea7b38114"    # PUSH4 approve DUP2 EQ
+            "806223b8721461012357"  # DUP1 PUSH3 (leading zero dropped) EQ PUSH2 dest JUMPI
+            "8060121461004557"      # DUP1 PUSH1 EQ PUSH2 dest JUMPI
+            "6340c10f1956"      # PUSH4 then JUMP: not a comparison
+        )
+        self.assertEqual(scan_bytecode(code)["selectors"], [0xa9059cbb, 0x095ea7b3, 0x0023b872, 0x00000012])
+
+    def test_short_constant_comparisons_are_not_selectors(self):
+        code = bytes.fromhex(
+            "1560011400"        # ISZERO PUSH1 0x01 EQ
+            "6000811400"        # PUSH1 0x00 DUP2 EQ
+            "6020185000"        # PUSH1 0x20 XOR
+            "8060021456"        # DUP1 PUSH1 EQ, then JUMP rather than PUSH2 dest JUMPI
+        )
+        self.assertEqual(scan_bytecode(code)["selectors"], [])
+
+    def test_signature_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "signatures.idx")
+            entries = [(0xa9059cbb, "transfer(address,uint256)"), (0x00000001, "a()"), (0x00000001, "b()")]
+            entries += [(i << 8, f"f{i}()") for i in range(1, 500)]
+            self.assertEqual(signature_index.build_signature_index(entries, path), 502)
+
+            index = signature_index.SignatureIndex(path)
+            self.assertEqual(index.lookup(0x00000001), ["a()", "b()"])
+            self.assertEqual(index.lookup(0xa9059cbb), ["transfer(address,uint256)"])
+            self.assertEqual(index.lookup(250 << 8), ["f250()"])
+            self.assertEqual(index.lookup(0xdeadbeef), [])
+            index.close()
+
+    def test_missing_index_falls_back_once(self):
+        missing = os.path.join(tempfile.gettempdir(), f"missing-{uuid.uuid4()}.idx")
+        with mock.patch.dict(os.environ, {"SIGNATURE_INDEX_PATH": missing}), \
+                mock.patch.object(signature_index, "_index", None), \
+                mock.patch.object(signature_index, "_missing_path", None), \
+                mock.patch.object(signature_index.Path, "exists", autospec=True, return_value=False) as exists:
+            self.assertEqual(signature_index.resolve_selector(0xa9059cbb), ["transfer(address,uint256)"])
+            self.assertEqual(signature_index.resolve_selector(0xdeadbeef), [])
+            self.assertEqual(exists.call_count, 1)
+
+
+class EntropyTests(TestCase):
+    def test_entropy(self):
+        self.assertEqual(calculate_entropy(b""), 0.0)
+        self.assertEqual(calculate_entropy(b"\x00" * 100), 0.0)
+        self.assertEqual(calculate_entropy(bytes(range(256)) * 4), 8.0)
+        self.assertEqual(calculate_entropy(b"ab" * 50), 1.0)
+
+    def test_profile_matches_direct_windows(self):
+        data = bytes(np.random.default_rng(0).integers(0, 256, 3_000, dtype=np.uint8)) + b"\x00" * 2_000
+        offsets, entropies = entropy_profile(data, window=1024, step=256)
+        self.assertEqual(offsets.tolist(), list(range(0, 5_000 - 1024 + 1, 256)))
+        for offset, value in zip(offsets.tolist(), entropies.tolist()):
+            self.assertAlmostEqual(value, calculate_entropy(data[offset:offset + 1024]), places=2)
+        self.assertEqual(len(entropy_profile(b"x" * 1000)[0]), 0)
+        with self.assertRaises(ValueError):
+            entropy_profile(data, window=1000, step=256)
+
+    def test_high_entropy_regions(self):
+        noise = bytes(np.random.default_rng(1).integers(0, 256, 2_048, dtype=np.uint8))
+        data = b"\x00" * 2_048 + noise + b"\x00" * 2_048
+        # Windows overlapping the noise by more than ~3/4 pass the threshold, merged into one range
+        self.assertEqual(high_entropy_regions(data), [[2_048, 4_096]])
+        self.assertEqual(high_entropy_regions(b"\x00" * 4_096), [])
+
+
+class AnalysisCacheTests(ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        caches[ANALYSIS_CACHE_ALIAS].clear()
+        self.code = synthetic_contract(2_000, seed=5)
+
+    def test_hit_miss_and_eviction(self):
+        key = code_hash(self.code)
+        self.assertIsNone(get_cached_analysis(key, ENGINE_VERSION))
+        store_analysis(key, ENGINE_VERSION, {"score": 1})
+        self.assertEqual(get_cached_analysis(key, ENGINE_VERSION), {"score": 1})
+        self.assertIsNone(get_cached_analysis(code_hash(b"other"), ENGINE_VERSION))
+
+        evict_analysis(key)
+        self.assertIsNone(get_cached_analysis(key, ENGINE_VERSION))
+
+    def test_engine_version_bump_recomputes(self):
+        analyze_bytecode = contract_analysis.analyze_bytecode
+        with mock.patch.object(contract_analysis, "analyze_bytecode", wraps=analyze_bytecode) as analyze:
+            first = run_contract_analysis(TOKEN, bytecode=self.code)
+            self.assertEqual(run_contract_analysis(TOKEN, bytecode=self.code), first)
+            self.assertEqual(analyze.call_count, 1)
+
+            with mock.patch.object(contract_analysis, "ENGINE_VERSION", "next"):
+                run_contract_analysis(TOKEN, bytecode=self.code)
+            self.assertEqual(analyze.call_count, 2)
+        # The stale entry was replaced, so the current engine misses too
+        self.assertIsNone(get_cached_analysis(code_hash(self.code), ENGINE_VERSION))
+
+    def test_contract_job_fetches_code_once(self):
+        server = self.serve(fixture={"block_number": 1, "code": {TOKEN: "0x" + self.code.hex()}})
+        submit_job(TokenComplianceProfile.objects.create(token_address=TOKEN), "contract")
+        work("test", once=True)
+        self.assertEqual(AnalysisJob.objects.get().status, AnalysisJob.SUCCEEDED)
+        self.assertEqual(server.methods["eth_getCode"], 1)
+
+
+class ContractAnalysisBatchTests(TestCase):
+    URL = "/api/token/analyse/contract/"
+
+    def post(self, body):
+        with mock.patch("api.views.run_batch_contract_analysis", return_value={"results": {}, "errors": {}}):
+            return APIClient().post(self.URL, body, format="json")
+
+    def test_ids_are_normalised(self):
+        token = TokenComplianceProfile.objects.create(token_address=TOKEN)
+        missing = uuid.uuid4()
+        response = self.post({"token_ids": [str(token.id).upper(), token.id.hex, missing.hex]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["not_found"], [str(missing)])
+
+    def test_invalid_ids_are_rejected(self):
+        response = self.post({"token_ids": ["not-a-uuid", 7]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["token_ids"], ["not-a-uuid", 7])
+
+
+class BytecodeStoreTests(TestCase):
+    def test_stores_each_code_once(self):
+        code = synthetic_contract(4_096, seed=1)
+        key = store_bytecode(code)
+        self.assertEqual(key, code_hash(code))
+        self.assertEqual(store_bytecode(code), key)
+        self.assertEqual(BytecodeBlob.objects.count(), 1)
+
+        blob = BytecodeBlob.objects.get(code_hash=key)
+        self.assertEqual((blob.bytecode, blob.size), (code, len(code)))
+        self.assertLess(len(blob.data), len(code))
+
+    def test_bulk_store_skips_known_hashes(self):
+        codes = {code_hash(c): c for c in (synthetic_contract(1_024, seed=i) for i in range(3))}
+        store_bytecode(next(iter(codes.values())))
+        with CaptureQueriesContext(connection) as queries:
+            store_bytecodes(codes)
+        inserts = [q["sql"] for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(BytecodeBlob.objects.count(), 3)
+        self.assertEqual({b.code_hash: b.bytecode for b in BytecodeBlob.objects.all()}, codes)
+
+
+class ProxyResolutionTests(ReplayTestCase):
+    def test_minimal_proxy_bytes(self):
+        target = "ab" * 20
+        clone = bytes.fromhex(f"363d3d373d3d3d363d73{target}5af43d82803e903d91602b57fd5bf3")
+        push0 = bytes.fromhex(f"365f5f375f5f365f73{target}5af43d5f5f3e5f3d91602a57fd5bf3")
+        self.assertEqual(minimal_proxy_target(clone), "0x" + target)
+        self.assertEqual(minimal_proxy_target(push0), "0x" + target)
+        self.assertIsNone(minimal_proxy_target(clone + b"\x00"))
+
+    def test_storage_slots_and_beacon(self):
+        slots = dict(IMPLEMENTATION_SLOTS)
+        names = ["eip1967", "eip1822", "beacon", "none", "wide"]
+        proxies = {name: _address(0x100 + i) for i, name in enumerate(names)}
+        beacon, word = _address(0x200), "0x" + "00" * 12 + "{}"
+        self.serve(fixture={
+            "storage": {
+                f"{proxies['eip1967']}:{hex(slots['eip1967'])}": word.format("11" * 20),
+                f"{proxies['eip1822']}:{hex(slots['eip1822'])}": word.format("22" * 20),
+                f"{proxies['beacon']}:{hex(slots['eip1967_beacon'])}": word.format(beacon[2:]),
+                # Not an address: the slot is used for something else
+                f"{proxies['wide']}:{hex(slots['eip1967'])}": "0x" + "ff" * 32,
+            },
+            "calls": {f"{beacon}:0x5c60da1b": word.format("33" * 20)},
+        })
+
+        resolved = resolve_implementations({address: b"\x60\x80" for address in proxies.values()})
+        self.assertEqual(resolved[proxies["eip1967"]], {"standard": "eip1967", "implementation": "0x" + "11" * 20})
+        self.assertEqual(resolved[proxies["eip1822"]], {"standard": "eip1822", "implementation": "0x" + "22" * 20})
+        self.assertEqual(
+            resolved[proxies["beacon"]],
+            {"standard": "eip1967_beacon", "implementation": "0x" + "33" * 20, "beacon": beacon},
+        )
+        self.assertNotIn(proxies["none"], resolved)
+        self.assertNotIn(proxies["wide"], resolved)
+
+    def test_upgrades_are_detected_from_the_recorded_analysis(self):
+        token = TokenComplianceProfile.objects.create(token_address=TOKEN)
+        slot = hex(dict(IMPLEMENTATION_SLOTS)["eip1967"])
+
+        def analyse(implementation):
+            self.serve(fixture={
+                "block_number": 1,
+                "code": {TOKEN: "0x6080f4", implementation: "0x" + synthetic_contract(1_024, seed=2).hex()},
+                "storage": {f"{TOKEN}:{slot}": "0x" + "00" * 12 + implementation[2:]},
+            })
+            submit_job(token, "contract")
+            work("test", once=True)
+            token.refresh_from_db()
+            return token.modules["contractAnalysis"]["implementation"]
+
+        first, second = _address(0x411), _address(0x412)
+        self.assertNotIn("previous_implementation", analyse(first))
+        self.assertNotIn("previous_implementation", analyse(first))
+        # Nothing survives in the cache (restart, eviction, another worker); the database remembers
+        caches[ANALYSIS_CACHE_ALIAS].clear()
+        upgraded = analyse(second)
+        self.assertEqual((upgraded["implementation"], upgraded["previous_implementation"]), (second, first))
+
+
+class TokenMetadataTests(ReplayTestCase):
+    def fixture(self):
+        mkr = _address(0x300)
+        return mkr, {"calls": {
+            f"{TOKEN}:0x06fdde03": "0x" + encode(["string"], ["Token"]).hex(),
+            f"{TOKEN}:0x95d89b41": "0x" + encode(["string"], ["TKN"]).hex(),
+            f"{TOKEN}:0x313ce567": "0x" + encode(["uint8"], [18]).hex(),
+            # bytes32 name and symbol, as MKR returns them
+            f"{mkr}:0x06fdde03": "0x" + b"Maker".ljust(32, b"\x00").hex(),
+            f"{mkr}:0x95d89b41": "0x" + b"MKR".ljust(32, b"\x00").hex(),
+            f"{mkr}:0x313ce567": "0x" + encode(["uint8"], [18]).hex(),
+        }}
+
+    def check(self, **server_options):
+        mkr, fixture = self.fixture()
+        server = self.serve(fixture=fixture, **server_options)
+        not_a_token = _address(0x301)
+        metadata, errors = fetch_token_metadata_many([TOKEN, mkr, not_a_token])
+        self.assertEqual(metadata[TOKEN], {"name": "Token", "symbol": "TKN", "decimals": 18})
+        self.assertEqual(metadata[mkr], {"name": "Maker", "symbol": "MKR", "decimals": 18})
+        self.assertEqual(list(errors), [not_a_token])
+        return server
+
+    def test_aggregate3(self):
+        server = self.check()
+        self.assertEqual(server.methods["eth_call"], 1)
+
+    def test_chain_without_multicall3(self):
+        server = self.check(multicall3=False)
+        self.assertEqual(server.methods["eth_call"], 1 + 9)
+
+    def test_decode_text(self):
+        self.assertEqual(decode_text(b"DAI".ljust(32, b"\x00")), "DAI")
+        self.assertIsNone(decode_text(b"\x00" * 32))
+        self.assertIsNone(decode_text(b""))
+        self.assertIsNone(decode_text(b"\x01" * 40))
+
+
+class TokenBulkRegisterTests(ReplayTestCase):
+    URL = "/api/token/bulk/"
+
+    def post(self, addresses):
+        return APIClient().post(self.URL, {"addresses": addresses}, format="json")
+
+    def test_splits_created_existing_and_errors(self):
+        lettered = "0x" + "ab" * 20
+        self.serve(fixture={"calls": {
+            f"{address}:{selector}": "0x" + encode([kind], [value]).hex()
+            for address in (TOKEN, lettered)
+            for selector, kind, value in (("0x06fdde03", "string", "Token"), ("0x95d89b41", "string", "TKN"),
+                                          ("0x313ce567", "uint8", 18))
+        }})
+        registered = _address(0x302)
+        TokenComplianceProfile.objects.create(token_address=registered)
+        not_a_token = _address(0x301)
+
+        # Duplicates and mixed-case spellings of one address register it once
+        response = self.post([Web3.to_checksum_address(lettered), TOKEN, lettered, not_a_token, registered, TOKEN])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], [lettered, TOKEN])
+        self.assertEqual(response.data["existing"], [registered])
+        self.assertEqual(list(response.data["errors"]), [not_a_token])
+        self.assertEqual(TokenComplianceProfile.objects.get(token_address=lettered).symbol, "TKN")
+
+        response = self.post([TOKEN, lettered.upper().replace("0X", "0x")])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["existing"]), ([], sorted([TOKEN, lettered])))
+
+    def test_rejects_bad_requests_before_any_rpc(self):
+        with mock.patch("api.views.fetch_token_metadata_many", side_effect=AssertionError("no RPC")):
+            self.assertEqual(self.post([]).status_code, 400)
+            self.assertEqual(self.post(TOKEN).status_code, 400)
+
+            response = self.post([TOKEN, "0x1234", 7])
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data["addresses"], ["0x1234", 7])
 
-# Create your tests here.
+            response = self.post([_address(i) for i in range(MAX_BULK_REGISTER + 1)])
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(TokenComplianceProfile.objects.exists())
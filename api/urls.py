@@ -1,10 +1,20 @@
 from django.urls import path
-from .views import TokenProfileView, ContractAnalysisView, ContractAnalysisListView, TokenListView, HolderAnalysisView
+from .views import (
+    TokenProfileView, ContractAnalysisView, ContractAnalysisBatchView, ContractAnalysisListView,
+    TokenListView, TokenBulkRegisterView, HolderAnalysisView, HolderWatchlistView,
+    RpcStatsView, AnalysisJobView, ExportView,
+)
 
 urlpatterns = [
+    path('token/bulk/', TokenBulkRegisterView.as_view(), name='token-bulk-register'),
     path('token/<str:address>/', TokenProfileView.as_view(), name='token-profile'),
     path('token/', TokenListView.as_view(), name='token-list'),
+    path('token/analyse/contract/', ContractAnalysisBatchView.as_view(), name='contract-analysis-batch'),
     path('token/<uuid:token_id>/analyse/contract/', ContractAnalysisView.as_view(), name='contract-analysis'),
     path('token/<uuid:token_id>/analyses/contract/', ContractAnalysisListView.as_view(), name='contract-analysis-list'),
+    path('token/analyse/holders/', HolderWatchlistView.as_view(), name='holder-watchlist-scan'),
     path('api/token/<uuid:token_id>/analyses/holders/', HolderAnalysisView.as_view()),
+    path('jobs/<uuid:job_id>/', AnalysisJobView.as_view(), name='analysis-job'),
+    path('export/<str:kind>/', ExportView.as_view(), name='export'),
+    path('rpc/stats/', RpcStatsView.as_view(), name='rpc-stats'),
 ]
\ No newline at end of file
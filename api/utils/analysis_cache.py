@@ -0,0 +1,35 @@
+from django.core.cache import caches
+
+# Cache alias configured in settings.CACHES (bounded, so old entries are evicted)
+ANALYSIS_CACHE_ALIAS = "analysis"
+KEY_PREFIX = "contract-analysis"
+
+
+def _cache():
+    return caches[ANALYSIS_CACHE_ALIAS]
+
+
+def _key(code_hash: str) -> str:
+    return f"{KEY_PREFIX}:{code_hash}"
+
+
+def get_cached_analysis(code_hash: str, engine_version: str):
+    """Return the stored analysis for this bytecode hash, or None.
+
+    Entries written by another engine version are treated as stale and evicted.
+    """
+    entry = _cache().get(_key(code_hash))
+    if entry is None:
+        return None
+    if entry.get("engine_version") != engine_version:
+        _cache().delete(_key(code_hash))
+        return None
+    return entry["result"]
+
+
+def store_analysis(code_hash: str, engine_version: str, result: dict):
+    _cache().set(_key(code_hash), {"engine_version": engine_version, "result": result})
+
+
+def evict_analysis(code_hash: str):
+    _cache().delete(_key(code_hash))
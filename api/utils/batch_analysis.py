@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from decouple import config
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import ContractAnalysisResult, TokenComplianceProfile
+from .bytecode_store import store_bytecodes
+from .contract import get_bytecodes_for_addresses
+from .contract_analysis import ENGINE_VERSION, analyze_many, code_hash
+from .profile_cache import invalidate_profiles
+from .proxy import resolve_proxies
+from .rescore import apply_score
+
+MAX_BATCH_TOKENS = 1_000
+# Below this many distinct contracts the pool's IPC costs more than it saves
+POOL_THRESHOLD = 4
+
+POOL_WORKERS = config("ANALYSIS_POOL_WORKERS", default=os.cpu_count() or 1, cast=int)
+
+_pool = None
+
+
+def _get_pool():
+    # Created once per process and reused, so requests don't pay worker startup
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+    return _pool
+
+
+def apply_contract_summary(token: TokenComplianceProfile, result: dict):
+    token.flags = result["flags"]
+    token.modules["contractAnalysis"] = result
+    apply_score(token)
+
+
+def _pool_map(fn, items: list):
+    if len(items) < POOL_THRESHOLD:
+        return map(fn, items)
+    chunksize = max(1, len(items) // (POOL_WORKERS * 4))
+    return _get_pool().map(fn, items, chunksize=chunksize)
+
+
+def run_batch_contract_analysis(tokens: list) -> dict:
+    """Analyse many tokens: batched bytecode fetch, pooled analysis, bulk writes.
+
+    Returns {"results": {token_id: result}, "errors": {token_address: message}}.
+    """
+    addresses = [token.token_address for token in tokens]
+    codes, errors = get_bytecodes_for_addresses(addresses)
+
+    hashes = {address: code_hash(code) for address, code in codes.items()}
+    analyses = analyze_many({hashes[address]: code for address, code in codes.items()}, mapper=_pool_map)
+    results_by_address = resolve_proxies(
+        {address: analyses[key] for address, key in hashes.items()}, codes, mapper=_pool_map
+    )
+
+    now = timezone.now()
+    records = []
+    updated = []
+    results = {}
+    for token in tokens:
+        key = hashes.get(token.token_address)
+        if key is None:
+            continue
+        result = results_by_address[token.token_address]
+        record = ContractAnalysisResult(
+            token=token,
+            score=result["score"],
+            flags=result["flags"],
+            evidence=result["evidence"],
+            bytecode_blob_id=key,
+            engine_version=ENGINE_VERSION,
+        )
+        records.append(record)
+        apply_contract_summary(token, result)
+        token.latest_contract_analysis = record
+        # bulk_update bypasses auto_now
+        token.updated_at = now
+        updated.append(token)
+        results[str(token.id)] = result
+
+    with transaction.atomic():
+        store_bytecodes({hashes[address]: code for address, code in codes.items()})
+        ContractAnalysisResult.objects.bulk_create(records, batch_size=500)
+        TokenComplianceProfile.objects.bulk_update(
+            updated,
+            [
+                "risk_score", "flags", "recommendation", "scoring_version", "modules",
+                "latest_contract_analysis", "updated_at",
+            ],
+            batch_size=500,
+        )
+    invalidate_profiles(token.token_address for token in updated)
+
+    return {"results": results, "errors": errors}
@@ -0,0 +1,35 @@
+import zlib
+
+from api.models import BytecodeBlob
+from .contract_analysis import code_hash
+
+
+def _blob_for(code: bytes, key: str) -> BytecodeBlob:
+    return BytecodeBlob(code_hash=key, data=zlib.compress(code, 9), size=len(code))
+
+
+def store_bytecode(code: bytes) -> str:
+    """Store `code` once under its canonical hash and return that hash."""
+    key = code_hash(code)
+    if not bytecode_seen(key):
+        BytecodeBlob.objects.bulk_create([_blob_for(code, key)], ignore_conflicts=True)
+    return key
+
+
+def store_bytecodes(codes: dict):
+    """Bulk variant of store_bytecode for {code_hash: code}.
+
+    Only hashes missing from the table are compressed and inserted.
+    """
+    existing = set(
+        BytecodeBlob.objects.filter(code_hash__in=list(codes)).values_list("code_hash", flat=True)
+    )
+    BytecodeBlob.objects.bulk_create(
+        [_blob_for(code, key) for key, code in codes.items() if key not in existing],
+        batch_size=200,
+        ignore_conflicts=True,
+    )
+
+
+def bytecode_seen(key: str) -> bool:
+    return BytecodeBlob.objects.filter(code_hash=key).exists()
@@ -0,0 +1,198 @@
+"""Entity clustering over the archived Transfer graph.
+
+Addresses are interned to dense integer ids (np.unique over raw 20-byte
+values) and merged with an array-backed union-find, so tens of millions of
+edges fit in a few flat NumPy arrays. Heuristics, each a vectorized pass
+over the edge arrays:
+
+    common funding  addresses whose first incoming transfer came from the same
+                    sender join that sender; senders that fund more than
+                    MAX_FUNDING_FANOUT addresses (exchanges, pools, airdrops)
+                    are ignored
+    sweeps          an address that repeatedly sends to exactly one
+                    destination, which receives only from such addresses and
+                    at least two of them, joins it (deposit address -> collector)
+    deployer        a contract joins the account that deployed it
+
+Funding and sweeps never link the zero address, caller-supplied addresses
+(known pools, routers...), known contracts or addresses with more than
+MAX_DEGREE counterparties: a pool both funds its buyers and collects from
+repeat sellers, and would otherwise merge them all into one entity.
+"""
+import numpy as np
+from decouple import config
+
+from .log_archive import TRANSFER_DTYPE, covered_ranges, read_range
+
+MAX_FUNDING_FANOUT = config("CLUSTER_MAX_FUNDING_FANOUT", default=20, cast=int)
+# Addresses with more distinct counterparties than this are hubs and link nothing
+MAX_DEGREE = config("CLUSTER_MAX_DEGREE", default=100, cast=int)
+# Transfers an address must send, all to one destination, to count as sweeping
+MIN_SWEEPS = 2
+
+ADDRESS_DTYPE = np.dtype("V20")
+ZERO_ADDRESS = np.frombuffer(bytes(20), ADDRESS_DTYPE)
+
+
+class UnionFind:
+    """Disjoint sets over 0..size-1, stored as one parent array.
+
+    Unions are applied a whole edge array at a time: each round hooks the
+    larger root of every unresolved edge under the smallest root it meets,
+    then compresses every path by pointer jumping. Parents only ever point
+    to smaller ids, so no cycles form and a few rounds settle any graph.
+    """
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, nodes=None) -> np.ndarray:
+        """Roots of `nodes` (of every node if None), compressing all paths."""
+        parent = self.parent
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        self.parent = parent
+        return parent if nodes is None else parent[nodes]
+
+    def union(self, a, b):
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        while len(a):
+            root_a, root_b = self.find(a), self.find(b)
+            pending = root_a != root_b
+            if not pending.any():
+                break
+            root_a, root_b = root_a[pending], root_b[pending]
+            np.minimum.at(self.parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+            a, b = a[pending], b[pending]
+        self.find()
+
+
+def addresses_to_raw(addresses) -> np.ndarray:
+    return np.array([bytes.fromhex(a[2:]) for a in addresses], dtype=ADDRESS_DTYPE).reshape(-1)
+
+
+def raw_to_address(raw) -> str:
+    return "0x" + bytes(raw).hex()
+
+
+def address_column(column: np.ndarray) -> np.ndarray:
+    """A (rows, 20) uint8 sender/recipient column as a flat V20 array."""
+    return np.ascontiguousarray(column).view(ADDRESS_DTYPE).ravel()
+
+
+def load_transfers(tokens) -> np.ndarray:
+    """Every archived Transfer of the given token addresses, as TRANSFER_DTYPE rows."""
+    parts = [
+        rows
+        for token in tokens
+        for start, end in covered_ranges(token)
+        for rows in read_range(token, start, end)
+    ]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=TRANSFER_DTYPE)
+
+
+def _common_funding(uf: UnionFind, src, dst, order_keys, ignored, max_fanout: int):
+    linked = ~ignored[src] & ~ignored[dst] & (src != dst)
+    src, dst = src[linked], dst[linked]
+    block, log_index = (key[linked] for key in order_keys)
+
+    # First incoming transfer of each address
+    order = np.lexsort((log_index, block, dst))
+    dst, src = dst[order], src[order]
+    first = np.flatnonzero(np.r_[True, dst[1:] != dst[:-1]])
+    funded, funder = dst[first], src[first]
+
+    fanout = np.bincount(funder, minlength=len(uf.parent))[funder]
+    shared = (fanout >= 2) & (fanout <= max_fanout)
+    uf.union(funded[shared], funder[shared])
+
+
+def _sweeps(uf: UnionFind, src, dst, ignored):
+    linked = ~ignored[src] & ~ignored[dst] & (src != dst)
+    src, dst = src[linked], dst[linked]
+    size = len(uf.parent)
+
+    sent = np.bincount(src, minlength=size)
+    pairs = np.unique(src * size + dst)
+    pair_src, pair_dst = pairs // size, pairs % size
+    destinations = np.bincount(pair_src, minlength=size)
+
+    sweeping = (destinations[pair_src] == 1) & (sent[pair_src] >= MIN_SWEEPS)
+    sweeper, collector = pair_src[sweeping], pair_dst[sweeping]
+    collected = np.bincount(collector, minlength=size)[collector]
+    # A collector that also takes transfers from anyone else is not a sweep target
+    senders = np.bincount(pair_dst, minlength=size)[collector]
+    linked = (collected >= 2) & (collected == senders)
+    uf.union(sweeper[linked], collector[linked])
+
+
+def _degrees(src, dst, size: int) -> np.ndarray:
+    """Distinct counterparties of each address, either direction."""
+    low, high = np.minimum(src, dst), np.maximum(src, dst)
+    pairs = np.unique(low[low != high] * size + high[low != high])
+    return np.bincount(pairs // size, minlength=size) + np.bincount(pairs % size, minlength=size)
+
+
+def cluster_addresses(transfers: np.ndarray, deployers: dict = None, exclude=(), contracts=(),
+                      max_fanout: int = MAX_FUNDING_FANOUT, max_degree: int = MAX_DEGREE):
+    """Cluster the addresses of `transfers` (TRANSFER_DTYPE rows, any token mix).
+
+    `deployers` maps contract address to deployer; `exclude` lists addresses
+    that must not link others, and `contracts` known contracts, which only
+    join their deployers. Returns (addresses, labels): every address as a
+    sorted raw V20 array, and the cluster id (smallest member's index) of each.
+    """
+    deployers = deployers or {}
+    deployed = addresses_to_raw(deployers.keys())
+    creators = addresses_to_raw(deployers.values())
+    sender, recipient = address_column(transfers["sender"]), address_column(transfers["recipient"])
+
+    addresses, ids = np.unique(np.concatenate([sender, recipient, deployed, creators]), return_inverse=True)
+    ids = ids.astype(np.int64)
+    n, m = len(sender), len(deployed)
+    src, dst = ids[:n], ids[n:2 * n]
+
+    ignored = np.isin(addresses, np.concatenate([ZERO_ADDRESS, addresses_to_raw([*exclude, *contracts])]))
+    ignored |= _degrees(src, dst, len(addresses)) > max_degree
+    uf = UnionFind(len(addresses))
+    _common_funding(uf, src, dst, (transfers["block"], transfers["log_index"]), ignored, max_fanout)
+    _sweeps(uf, src, dst, ignored)
+    uf.union(ids[2 * n:2 * n + m], ids[2 * n + m:])
+    return addresses, uf.find()
+
+
+def clusters(addresses: np.ndarray, labels: np.ndarray) -> list:
+    """Clusters with more than one address, as lists of lowercase hex addresses."""
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    bounds = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1], True])
+    return [
+        [raw_to_address(raw) for raw in addresses[order[start:stop]]]
+        for start, stop in zip(bounds[:-1], bounds[1:])
+        if stop - start > 1
+    ]
+
+
+def entity_keys(holders: list, addresses: np.ndarray, labels: np.ndarray) -> list:
+    """The entity of each holder address: its cluster label, or the lowercase
+    address itself for addresses outside the graph."""
+    keys = [address.lower() for address in holders]
+    if keys and len(addresses):
+        raw = addresses_to_raw(keys)
+        found = np.minimum(np.searchsorted(addresses, raw), len(addresses) - 1)
+        for i in np.flatnonzero(addresses[found] == raw).tolist():
+            keys[i] = int(labels[found[i]])
+    return keys
+
+
+def entity_balances(balances, addresses: np.ndarray, labels: np.ndarray) -> dict:
+    """{entity: summed balance} for (address, balance) pairs."""
+    balances = list(balances)
+    totals = {}
+    for key, (_, balance) in zip(entity_keys([a for a, _ in balances], addresses, labels), balances):
+        totals[key] = totals.get(key, 0) + balance
+    return totals
@@ -1,25 +1,81 @@
 from web3 import Web3
-from decouple import config
+from eth_abi import decode
+from eth_abi.exceptions import DecodingError
 
-w3 = Web3(Web3.HTTPProvider(config('ETH_RPC_URL')))
+from .multicall import multicall
+from .rpc import get_web3
+from .rpc_batch import batch_rpc, rpc_error_message
 
-ERC20_ABI = [
-    {"constant": True, "name": "name", "inputs": [], "outputs": [{"name": "", "type": "string"}], "type": "function"},
-    {"constant": True, "name": "symbol", "inputs": [], "outputs": [{"name": "", "type": "string"}], "type": "function"},
-    {"constant": True, "name": "decimals", "inputs": [], "outputs": [{"name": "", "type": "uint8"}], "type": "function"},
+METADATA_CALLS = [
+    ("name", bytes.fromhex("06fdde03")),
+    ("symbol", bytes.fromhex("95d89b41")),
+    ("decimals", bytes.fromhex("313ce567")),
 ]
 
+def decode_text(data):
+    """Decode a string return value, falling back to bytes32 (e.g. MKR, SAI)."""
+    if not data:
+        return None
+    if len(data) == 32:
+        return data.rstrip(b"\x00").decode("utf-8", errors="replace") or None
+    try:
+        return decode(["string"], data)[0]
+    except (DecodingError, OverflowError, UnicodeDecodeError):
+        return None
+
+def decode_decimals(data):
+    if not data or len(data) < 32:
+        return None
+    value = int.from_bytes(data[:32], "big")
+    return value if value <= 255 else None
+
+def fetch_token_metadata_many(addresses: list):
+    """Fetch name/symbol/decimals for many tokens through Multicall3.
+
+    Returns (metadata, errors): {address: {"name", "symbol", "decimals"}} and
+    an error message for every address that answered none of the calls.
+    """
+    calls = [(address, call_data) for address in addresses for _, call_data in METADATA_CALLS]
+    returned = multicall(get_web3(), calls)
+
+    metadata, errors = {}, {}
+    per_token = len(METADATA_CALLS)
+    for i, address in enumerate(addresses):
+        name, symbol, decimals = returned[i * per_token:(i + 1) * per_token]
+        meta = {"name": decode_text(name), "symbol": decode_text(symbol), "decimals": decode_decimals(decimals)}
+        if all(value is None for value in meta.values()):
+            errors[address] = "Not an ERC20 token (name, symbol and decimals calls failed)"
+        else:
+            metadata[address] = meta
+    return metadata, errors
+
 def fetch_token_metadata(token_address: str):
-    address = Web3.to_checksum_address(token_address)
-    contract = w3.eth.contract(address=address, abi=ERC20_ABI)
-    return {
-        "name": contract.functions.name().call(),
-        "symbol": contract.functions.symbol().call(),
-        "decimals": contract.functions.decimals().call()
-    }
+    metadata, errors = fetch_token_metadata_many([token_address])
+    if token_address in errors:
+        raise ValueError(errors[token_address])
+    return metadata[token_address]
 
 def get_bytecode_for_address(address):
-    bytecode = w3.eth.get_code(Web3.to_checksum_address(address))
+    bytecode = get_web3().eth.get_code(Web3.to_checksum_address(address))
     if not bytecode or bytecode == b'':  # Empty contract or error
         raise ValueError("No bytecode found")
-    return bytecode.hex()
\ No newline at end of file
+    return bytecode.hex()
+
+def get_bytecodes_for_addresses(addresses: list):
+    """Fetch code for many addresses with batched eth_getCode calls.
+
+    Returns (codes, errors): raw bytes per address, and an error message for
+    every address whose call failed or that has no code.
+    """
+    requests = [("eth_getCode", [Web3.to_checksum_address(a), "latest"]) for a in addresses]
+    codes, errors = {}, {}
+    for address, response in zip(addresses, batch_rpc(get_web3(), requests)):
+        if "error" in response:
+            errors[address] = rpc_error_message(response)
+            continue
+        code = bytes.fromhex((response.get("result") or "0x")[2:])
+        if not code:
+            errors[address] = "No bytecode found"
+            continue
+        codes[address] = code
+    return codes, errors
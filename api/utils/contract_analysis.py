@@ -1,72 +1,161 @@
-import hashlib
-import math
+import numpy as np
 from web3 import Web3
-from evmdasm import EvmBytecode
-from decouple import config
 
-# Setup Web3
-w3 = Web3(Web3.HTTPProvider(config("ETH_RPC_URL")))
+from .analysis_cache import get_cached_analysis, store_analysis
+from .rpc import get_web3
+from .scoring import score_flags
+from .opcode_scanner import OPCODES, OPCODE_NAMES, scan_bytecode
+from .signature_index import resolve_selector
+
+TRANSFER_SELECTOR = 0xa9059cbb
+
+# Windowed entropy: random 1KB windows sit near 7.8 bits/byte, compiled code well below
+ENTROPY_WINDOW = 1024
+ENTROPY_STEP = 256
+HIGH_ENTROPY_WINDOW_THRESHOLD = 7.5
+
+# Bump whenever the analysis output changes, so cached results are recomputed
+ENGINE_VERSION = "0.6"
 
 # Entropy calculation
+def _entropy_from_counts(counts: np.ndarray, total) -> np.ndarray:
+    p = counts / total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(counts > 0, p * np.log2(p), 0.0)
+    return 0.0 - terms.sum(axis=-1)  # avoids -0.0 for constant data
+
 def calculate_entropy(data: bytes) -> float:
     if not data:
         return 0.0
-    entropy = 0
-    length = len(data)
-    freq = {}
-    for b in data:
-        freq[b] = freq.get(b, 0) + 1
-    for b in freq.values():
-        p = b / length
-        entropy -= p * math.log2(p)
-    return round(entropy, 2)
-
-# Static signature matching
-def extract_selectors(bytecode_hex: str) -> list:
-    known_selectors = {
-        "a9059cbb": "transfer(address,uint256)",
-        "095ea7b3": "approve(address,uint256)",
-        "23b872dd": "transferFrom(address,address,uint256)",
-        "40c10f19": "mint(address,uint256)",
-        "f2fde38b": "owner()",
-        "8da5cb5b": "renounceOwnership()",
-        "a457c2d7": "setBot(address)",
-        "dd62ed3e": "allowance(address,address)"
-    }
-    return [fn for sig, fn in known_selectors.items() if sig in bytecode_hex]
+    counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    return round(float(_entropy_from_counts(counts, len(data))), 2)
+
+def entropy_profile(data: bytes, window: int = ENTROPY_WINDOW, step: int = ENTROPY_STEP):
+    """Shannon entropy of every `window`-byte window, `step` bytes apart.
+
+    Histograms are built once per step-sized block and accumulated, so each
+    window is a difference of two cumulative histograms. Returns
+    (offsets, entropies); both are empty when data is shorter than a window.
+    """
+    if window % step:
+        raise ValueError("window must be a multiple of step")
+    blocks = len(data) // step
+    per_window = window // step
+    if blocks < per_window:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    raw = np.frombuffer(data, dtype=np.uint8, count=blocks * step).astype(np.int64)
+    block_ids = np.repeat(np.arange(blocks, dtype=np.int64), step)
+    hist = np.bincount(block_ids * 256 + raw, minlength=blocks * 256).reshape(blocks, 256)
+
+    cumulative = np.zeros((blocks + 1, 256), dtype=np.int64)
+    np.cumsum(hist, axis=0, out=cumulative[1:])
+    counts = cumulative[per_window:] - cumulative[:-per_window]
+
+    offsets = np.arange(len(counts), dtype=np.int64) * step
+    return offsets, _entropy_from_counts(counts, window)
+
+def high_entropy_regions(data: bytes, threshold: float = HIGH_ENTROPY_WINDOW_THRESHOLD,
+                         window: int = ENTROPY_WINDOW, step: int = ENTROPY_STEP) -> list:
+    """Merge windows above `threshold` into [start, end) byte ranges."""
+    offsets, entropies = entropy_profile(data, window, step)
+    regions = []
+    for start in offsets[entropies > threshold].tolist():
+        end = start + window
+        if regions and start <= regions[-1][1]:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return regions
+
+# Resolve dispatcher selectors against the signature index
+def extract_selectors(selectors: list) -> list:
+    functions = []
+    for selector in selectors:
+        functions.extend(resolve_selector(selector))
+    return functions
+
+# Content address of the deployed code (same value as EXTCODEHASH)
+def code_hash(bytecode: bytes) -> str:
+    return Web3.keccak(bytecode).hex()
+
+def _as_bytes(bytecode) -> bytes:
+    if isinstance(bytecode, str):
+        return bytes.fromhex(bytecode.removeprefix("0x"))
+    return bytes(bytecode)
 
 # Main analysis logic
-def run_contract_analysis(address: str) -> dict:
-    address = Web3.to_checksum_address(address)
-    bytecode = w3.eth.get_code(address)
+def run_contract_analysis(address: str, bytecode=None, use_cache: bool = True) -> dict:
+    """Analyse the code deployed at `address`.
+
+    Pass `bytecode` (raw bytes or hex) when it was already fetched to skip the
+    RPC call. Clones sharing the same code are served from the analysis cache.
+    """
+    if bytecode is None:
+        bytecode = get_web3().eth.get_code(Web3.to_checksum_address(address))
 
     if not bytecode or bytecode == b'':
         raise Exception("Address has no deployed bytecode")
 
-    bytecode_hex = bytecode.hex()
-    bytecode_md5 = hashlib.md5(bytecode).hexdigest()
+    bytecode = _as_bytes(bytecode)
+    key = code_hash(bytecode)
+
+    if use_cache:
+        cached = get_cached_analysis(key, ENGINE_VERSION)
+        if cached is not None:
+            return cached
+
+    result = analyze_bytecode(bytecode)
+
+    if use_cache:
+        store_analysis(key, ENGINE_VERSION, result)
+    return result
+
+def analyze_many(codes_by_hash: dict, mapper=map) -> dict:
+    """Analyse each distinct bytecode in {code_hash: code} once.
+
+    Cached results are reused; the rest go through `mapper` (e.g. a process
+    pool's map) and are cached. Returns {code_hash: result}.
+    """
+    results = {}
+    missing = []
+    for key in codes_by_hash:
+        cached = get_cached_analysis(key, ENGINE_VERSION)
+        if cached is not None:
+            results[key] = cached
+        else:
+            missing.append(key)
+
+    analysed = mapper(analyze_bytecode, [codes_by_hash[key] for key in missing])
+    for key, result in zip(missing, analysed):
+        store_analysis(key, ENGINE_VERSION, result)
+        results[key] = result
+    return results
+
+def analyze_bytecode(bytecode: bytes) -> dict:
     entropy = calculate_entropy(bytecode)
+    entropy_regions = high_entropy_regions(bytecode)
 
-    # Disassembly
-    disasm = EvmBytecode(bytecode_hex).disassemble()
-    opcodes = [instr.name for instr in disasm]
+    # Single pass over the raw code (no per-instruction objects)
+    scan = scan_bytecode(bytecode)
+    present = scan["flags"]
 
     flags = []
     evidence = []
 
-    if "DELEGATECALL" in opcodes:
+    if OPCODES["DELEGATECALL"] in present:
         flags.append("proxy_detected")
         evidence.append("DELEGATECALL instruction found in bytecode")
 
-    if "CREATE" in opcodes or "CREATE2" in opcodes:
+    if OPCODES["CREATE"] in present or OPCODES["CREATE2"] in present:
         flags.append("contract_factory_detected")
         evidence.append("CREATE/CREATE2 instruction found (contract factory behavior)")
 
-    if "CALLCODE" in opcodes:
+    if OPCODES["CALLCODE"] in present:
         flags.append("deprecated_callcode_used")
         evidence.append("CALLCODE is deprecated and unsafe")
 
-    if "a9059cbb" not in bytecode_hex:
+    if TRANSFER_SELECTOR not in scan["selectors"]:
         flags.append("nonstandard_transfer")
         evidence.append("Missing ERC20 transfer(address,uint256) selector")
 
@@ -75,16 +164,22 @@ def run_contract_analysis(address: str) -> dict:
         evidence.append(f"Bytecode entropy is high ({entropy}), may be obfuscated")
 
     # Signature detection
-    functions = extract_selectors(bytecode_hex)
+    functions = extract_selectors(scan["selectors"])
 
-    score = max(0, 100 - len(flags) * 15)
+    score = score_flags(flags)
 
     return {
         "score": score,
         "flags": flags,
         "evidence": evidence,
-        "bytecode_hash": bytecode_md5,
+        "bytecode_hash": code_hash(bytecode),
         "bytecode_entropy": entropy,
+        "high_entropy_regions": entropy_regions,
         "functions": functions,
-        "opcodes": opcodes[:100]  # limit output
+        "selectors": [f"0x{selector:08x}" for selector in scan["selectors"]],
+        "opcodes": [OPCODE_NAMES[op] for op in scan["head"]],  # first 100 only
+        "opcode_histogram": {
+            OPCODE_NAMES[op]: count for op, count in enumerate(scan["histogram"]) if count
+        },
+        "opcode_positions": {OPCODE_NAMES[op]: scan["first_offsets"][op] for op in sorted(present)},
     }
\ No newline at end of file
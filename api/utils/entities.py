@@ -0,0 +1,131 @@
+"""Entity resolution for token holders.
+
+Clusters the archived Transfer graph of a set of tokens, merges the holders
+of each cluster (`merge_holders`) and records, per token, the holder
+concentration counted by entity rather than by wallet as the
+"holderEntities" profile module. The token's holderAnalysis concentration,
+anomalies and score are brought in line with the merged entities too.
+"""
+import heapq
+from operator import itemgetter
+
+from decouple import config
+from django.db import transaction
+from django.utils import timezone
+from web3 import Web3
+
+from api.models import TokenComplianceProfile
+from .clustering import MAX_DEGREE, MAX_FUNDING_FANOUT, cluster_addresses, clusters, load_transfers
+from .distribution import distribution_stats
+from .holder_analysis import entity_concentration, with_concentration
+from .holder_ledger import find_deployers, ledger_holders, ledger_summary
+from .holder_store import add_holder_addresses, merge_holders, merged_addresses
+from .profile_cache import invalidate_profiles
+from .rescore import apply_score
+from .rpc_batch import batch_rpc
+
+TOP_ENTITIES = 10
+# Largest holders per token checked for being contracts when looking up deployers
+DEPLOYER_CANDIDATES = 100
+# Member addresses listed per top entity
+ENTITY_ADDRESSES_SHOWN = 5
+# Clusters (or merged holder groups) larger than this are almost always a hub
+# leaking through the heuristics; they are reported, never merged
+MAX_ENTITY_SIZE = config("CLUSTER_MAX_ENTITY_SIZE", default=1_000, cast=int)
+
+
+def deployer_candidates(w3, tokens: list, per_token: int = DEPLOYER_CANDIDATES) -> list:
+    """The token contracts plus those of their largest holders that are contracts."""
+    holders = sorted({address for token in tokens for address, _ in ledger_summary(token, per_token)[0]})
+    responses = batch_rpc(w3, [("eth_getCode", [address, "latest"]) for address in holders])
+    contracts = [
+        address for address, response in zip(holders, responses)
+        if (response.get("result") or "0x") != "0x"
+    ]
+    return sorted({token.token_address for token in tokens} | set(contracts))
+
+
+def _entity_summary(token, merged: dict, top_n: int) -> dict:
+    totals, members = {}, {}
+    holder_count = 0
+    for address, balance in ledger_holders(token):
+        key = merged.get(address, address)
+        totals[key] = totals.get(key, 0) + balance
+        members.setdefault(key, []).append(address)
+        holder_count += 1
+
+    top = heapq.nlargest(top_n, totals.items(), key=itemgetter(1))
+    return {
+        "total_entities": len(totals),
+        "total_holders": holder_count,
+        "clustered_holders": sum(len(m) for m in members.values() if len(m) > 1),
+        "top_entities": [
+            {
+                "addresses": [Web3.to_checksum_address(a) for a in sorted(members[key])[:ENTITY_ADDRESSES_SHOWN]],
+                "address_count": len(members[key]),
+                "balance": balance,
+            }
+            for key, balance in top
+        ],
+        "distribution": distribution_stats(totals.values()),
+    }
+
+
+def refresh_entities(tokens: list, top_n: int = TOP_ENTITIES):
+    """Recount the tokens' holderEntities module and holderAnalysis concentration
+    from the current holder merges, and rescore them."""
+    entities = merged_addresses({address for token in tokens for address, _ in ledger_holders(token)})
+    for token in tokens:
+        summary = _entity_summary(token, entities, top_n)
+        # Re-read under lock: analysis jobs may have updated other modules meanwhile
+        with transaction.atomic():
+            locked = TokenComplianceProfile.objects.select_for_update().get(id=token.id)
+            locked.modules["holderEntities"] = {**summary, "updated_at": timezone.now().isoformat()}
+            holder_analysis = locked.modules.get("holderAnalysis")
+            if holder_analysis:
+                concentration = entity_concentration(locked, len(holder_analysis["top_holders"]) or top_n, entities)
+                locked.modules["holderAnalysis"] = with_concentration(holder_analysis, concentration)
+                apply_score(locked)
+            locked.save(update_fields=["modules", "risk_score", "recommendation", "scoring_version", "updated_at"])
+        token.modules = locked.modules
+    invalidate_profiles(token.token_address for token in tokens)
+
+
+def resolve_entities(tokens: list, w3=None, exclude=(), link_deployers: bool = True,
+                     max_fanout: int = MAX_FUNDING_FANOUT, max_degree: int = MAX_DEGREE,
+                     max_size: int = MAX_ENTITY_SIZE, top_n: int = TOP_ENTITIES) -> dict:
+    """Cluster the tokens' holders together and merge them into entities.
+
+    Only archived Transfers are read. With `w3`, the largest holders are
+    checked for code (one batched call per token) so contracts such as pools
+    link nothing, and with `link_deployers` contracts are also linked to
+    their deployers (a few batched RPC calls per contract). Returns a summary
+    of the clusters found and holders merged.
+    """
+    transfers = load_transfers([token.token_address for token in tokens])
+    contracts, deployers = [], {}
+    if w3 is not None:
+        contracts = deployer_candidates(w3, tokens)
+        if link_deployers:
+            deployers = find_deployers(w3, contracts, w3.eth.block_number)
+    addresses, labels = cluster_addresses(
+        transfers, deployers, exclude=exclude, contracts=contracts, max_fanout=max_fanout, max_degree=max_degree
+    )
+
+    found = clusters(addresses, labels)
+    kept = [cluster for cluster in found if len(cluster) <= max_size]
+    clustered = {address for cluster in kept for address in cluster}
+    # Clustered holders outside the saved top holders get rows, so their whole entity merges
+    add_holder_addresses({a for token in tokens for a, _ in ledger_holders(token) if a in clustered})
+    merged = merge_holders(kept, max_group=max_size)
+    refresh_entities(tokens, top_n)
+    return {
+        "transfers": len(transfers),
+        "addresses": len(addresses),
+        "contracts": len(contracts),
+        "clusters": len(kept),
+        "oversized_clusters": len(found) - len(kept),
+        "clustered_addresses": len(clustered),
+        "deployers": len(deployers),
+        "holders_merged": merged,
+    }
@@ -0,0 +1,130 @@
+"""Streaming NDJSON/CSV exports of profiles, analysis history and holder links.
+
+Rows are read with `iterator(chunk_size=...)` (a server-side cursor on
+PostgreSQL) as plain values() dicts and encoded in batches, so memory stays
+flat however many rows are exported. Full exports come in storage order;
+per-token exports are filtered through the token indexes.
+"""
+import csv
+import io
+import json
+import uuid
+from decimal import Decimal
+
+from api.models import ContractAnalysisResult, HolderAnalysisResult, HolderTokenLink, TokenComplianceProfile
+
+EXPORT_CHUNK_SIZE = 2_000
+# Rows encoded per chunk handed to the response / output file
+ROWS_PER_WRITE = 500
+
+# kind: (queryset, token id field, {output column: model field})
+EXPORTS = {
+    "tokens": (
+        TokenComplianceProfile.objects.all,
+        "id",
+        {
+            "id": "id", "token_address": "token_address", "name": "name", "symbol": "symbol",
+            "decimals": "decimals", "risk_score": "risk_score", "recommendation": "recommendation",
+            "flags": "flags", "modules": "modules", "created_at": "created_at", "updated_at": "updated_at",
+        },
+    ),
+    "contract_analyses": (
+        ContractAnalysisResult.objects.all,
+        "token_id",
+        {
+            "id": "id", "token": "token_id", "token_address": "token__token_address", "score": "score",
+            "flags": "flags", "evidence": "evidence", "bytecode_hash": "bytecode_blob_id",
+            "engine_version": "engine_version", "analyzed_at": "analyzed_at",
+        },
+    ),
+    "holder_analyses": (
+        HolderAnalysisResult.objects.all,
+        "token_id",
+        {
+            "id": "id", "token": "token_id", "token_address": "token__token_address",
+            "top_holders": "top_holders", "centralization_score": "centralization_score",
+            "anomalies": "anomalies", "created_at": "created_at",
+        },
+    ),
+    "holder_links": (
+        HolderTokenLink.objects.all,
+        "token_id",
+        {
+            "token": "token_id", "token_address": "token__token_address",
+            "holder_address": "holder_address__address", "holder": "holder_address__holder__name",
+            "balance": "balance", "updated_at": "updated_at",
+        },
+    ),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _plain(value):
+    """JSON-safe form of a database value; balances stay exact integers."""
+    if isinstance(value, Decimal):
+        return int(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind: str, token=None):
+    """Yield the export's rows as {column: value} dicts, optionally for one token."""
+    queryset, token_field, columns = EXPORTS[kind]
+    rows = queryset().order_by()
+    if token is not None:
+        rows = rows.filter(**{token_field: token.pk})
+    for row in rows.values(*columns.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {column: _plain(row[field]) for column, field in columns.items()}
+
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ROWS_PER_WRITE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_ndjson(rows):
+    for batch in _batched(rows):
+        yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in batch).encode()
+
+
+def encode_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in _batched(rows):
+        for row in batch:
+            # Nested JSON (flags, evidence, modules...) goes in as a JSON string
+            writer.writerow(
+                json.dumps(v, separators=(",", ":")) if isinstance(v, (list, dict)) else v
+                for v in row.values()
+            )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_export(kind: str, fmt: str = "ndjson", token=None):
+    """Encoded chunks (bytes) of the export in `fmt`."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export: {kind} (available: {', '.join(EXPORTS)})")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (available: {', '.join(FORMATS)})")
+    rows = export_rows(kind, token)
+    if fmt == "csv":
+        return encode_csv(rows, list(EXPORTS[kind][2]))
+    return encode_ndjson(rows)
@@ -1,16 +1,33 @@
+import requests
 from web3 import Web3
+from web3.exceptions import Web3Exception
 from decouple import config
 from collections import defaultdict
-import time
+from django.utils import timezone
 
-from api.models import Holder, HolderAddress, HolderTokenLink, TokenComplianceProfile
-from .funny_name import generate_random_holder_name
-
-w3 = Web3(Web3.HTTPProvider(config("ETH_RPC_URL")))
-TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+from api.models import HolderAnalysisResult, TokenComplianceProfile, TokenLedgerCheckpoint
+from .distribution import distribution_stats, top_balances
+from .holder_store import merged_addresses, save_holders
+from .log_fetcher import fetch_logs
+from .profile_cache import invalidate_profiles
+from .rescore import apply_score
+from .rpc import RetryableResponse, get_web3
+from .log_archive import PartitionWriter, archive_dir, covered_ranges, plan_ranges, read_range
+from .transfer_graph import TransferGraph, analyze_transfer_graph
+from .transfer_logs import TRANSFER_TOPIC, apply_transfer_logs, apply_transfer_rows
+from .holder_ledger import (
+    apply_deltas, find_deployment_block, find_deployment_blocks, get_checkpoint, ledger_holders, ledger_summary,
+)
 
 BLOCK_LOOKBACK_WINDOW = 100_000
-BLOCK_CHUNK_SIZE = 5_000
+# Blocks kept out of the ledger so a reorg can't leave stale logs applied
+LEDGER_CONFIRMATIONS = 12
+# Token addresses per eth_getLogs in a watchlist scan (providers cap address lists)
+WATCHLIST_ADDRESSES_PER_QUERY = config("WATCHLIST_ADDRESSES_PER_QUERY", default=100, cast=int)
+# Anomalies derived from the holder concentration, as opposed to graph findings
+CONCENTRATION_ANOMALIES = ("whale_owned", "low_distribution", "majority_owned_by_one_wallet")
+# Ledger blocks past the last graph pass before a holder analysis queues a new one
+GRAPH_REFRESH_BLOCKS = config("GRAPH_REFRESH_BLOCKS", default=50_000, cast=int)
 
 def _normalize_block(block):
     if isinstance(block, int):
@@ -23,91 +40,448 @@ def _normalize_block(block):
         return block
     raise ValueError(f"Invalid block format: {block}")
 
-def save_holders_to_db(token: TokenComplianceProfile, holder_data: list):
-    for entry in holder_data:
-        address = entry["address"]
-        balance = int(entry["balance"])
+def _stream_transfer_deltas(address: str, from_block: int, to_block: int, progress=None):
+    """Fold Transfer logs over the range into balance deltas.
 
-        holder_address = HolderAddress.objects.filter(address=address).first()
-        if not holder_address:
-            holder = Holder.objects.create(name=generate_random_holder_name())
-            holder_address = HolderAddress.objects.create(holder=holder, address=address)
+    Ranges already in the log archive are read from disk; only the gaps are
+    fetched, and newly fetched final blocks are archived. Returns
+    (deltas, report): deltas cover exactly report["covered_ranges"]; nothing
+    after a failed range is applied.
 
-        HolderTokenLink.objects.get_or_create(
-            holder_address=holder_address,
-            token=token,
-            defaults={"balance": balance}
-        )
+    `progress`, if given, is called with blocks_scanned, blocks_total and
+    logs_decoded as the range is consumed.
+    """
+    balances = defaultdict(int)
+    report = {"covered_ranges": [], "failed_ranges": [], "logs": 0, "archived_logs": 0}
+    segments = plan_ranges(address, from_block, to_block)
+    writer = None
+    if archive_dir() and any(not archived for _, _, archived in segments):
+        writer = PartitionWriter(address, get_web3().eth.block_number - LEDGER_CONFIRMATIONS)
 
-def analyze_token_holders(token_address: str, from_block=None, to_block=None, top_n=10):
-    address = Web3.to_checksum_address(token_address)
+    decoded = 0
 
-    if from_block is None or to_block is None:
-        latest_block = w3.eth.block_number
-        to_block = latest_block if to_block is None else to_block
-        from_block = latest_block - BLOCK_LOOKBACK_WINDOW if from_block is None else from_block
+    def report_progress(end):
+        if progress:
+            progress(
+                blocks_scanned=end - from_block + 1,
+                blocks_total=to_block - from_block + 1,
+                logs_decoded=decoded,
+            )
 
-    from_block = int(from_block)
-    to_block = int(to_block)
+    def on_chunk(start, end, logs):
+        nonlocal decoded
+        apply_transfer_logs(balances, logs)
+        if writer:
+            writer.add(start, end, logs)
+        decoded += len(logs)
+        report_progress(end)
 
-    all_logs = []
+    last_block = from_block - 1
+    for start, end, archived in segments:
+        if archived:
+            for rows in read_range(address, start, end):
+                apply_transfer_rows(balances, rows)
+                report["archived_logs"] += len(rows)
+                decoded += len(rows)
+            last_block = end
+            report_progress(end)
+            continue
 
-    for start in range(from_block, to_block + 1, BLOCK_CHUNK_SIZE):
-        end = min(start + BLOCK_CHUNK_SIZE - 1, to_block)
-        payload = {
-            "fromBlock": hex(start),
-            "toBlock": hex(end),
-            "address": address,
-            "topics": [TRANSFER_TOPIC],
-        }
+        fetched = fetch_logs(get_web3(), address, [TRANSFER_TOPIC], start, end, on_chunk=on_chunk)
+        if writer:
+            writer.flush()
+        report["logs"] += fetched["logs"]
+        report["failed_ranges"] += fetched["failed_ranges"]
+        if fetched["failed_ranges"]:
+            last_block = _covered_until(fetched, start)
+            break
+        last_block = end
 
-        try:
-            logs = w3.eth.get_logs(payload)
-            all_logs.extend(logs)
-            time.sleep(0.1)
-        except Exception as e:
-            continue
+    if last_block >= from_block:
+        report["covered_ranges"] = [[from_block, last_block]]
+    return balances, report
 
-    balances = defaultdict(int)
-    for log in all_logs:
-        try:
-            topics = log.get("topics", [])
-            if len(topics) < 3:
-                continue
-            sender = Web3.to_checksum_address("0x" + topics[1].hex()[-40:])
-            recipient = Web3.to_checksum_address("0x" + topics[2].hex()[-40:])
-            amount = int(log["data"].hex(), 16)
-            balances[sender] -= amount
-            balances[recipient] += amount
-        except Exception:
-            continue
+def _covered_until(report: dict, from_block: int) -> int:
+    covered = report["covered_ranges"]
+    return covered[-1][1] if covered else from_block - 1
 
-    filtered = {k: v for k, v in balances.items() if v > 0}
-    sorted_balances = sorted(filtered.items(), key=lambda x: x[1], reverse=True)
-    top_holders = sorted_balances[:top_n]
+def _hex_keys(balances: dict) -> dict:
+    return {"0x" + raw.hex(): delta for raw, delta in balances.items()}
 
-    total_supply = sum(filtered.values()) or 1
-    top_percent = sum(b for _, b in top_holders) / total_supply * 100
+def _coverage(report: dict) -> dict:
+    return {
+        "covered_ranges": report["covered_ranges"],
+        "failed_ranges": report["failed_ranges"],
+        "archived_logs": report["archived_logs"],
+    }
+
+def _entity_totals(holders, merged: dict) -> dict:
+    """{entity: balance} for (address, balance) pairs; addresses of merged
+    holders (see merged_addresses) count as one entity."""
+    totals = defaultdict(int)
+    for address, balance in holders:
+        totals[merged.get(address, address)] += balance
+    return totals
+
+def _concentration(totals: dict, top_n: int) -> dict:
+    """Concentration of {entity: balance}: top-N share, anomalies and distribution."""
+    top = top_balances(totals, top_n)
+    total_supply = sum(totals.values()) or 1
+    top_percent = sum(b for _, b in top) / total_supply * 100
 
     anomalies = []
     if top_percent > 80:
         anomalies.append("whale_owned")
-    if len(filtered) <= 50:
+    if len(totals) <= 50:
         anomalies.append("low_distribution")
-    if top_holders and top_holders[0][1] / total_supply > 0.5:
+    # Kept as "wallet" for the scoring policies; an entity may hold several
+    if top and top[0][1] / total_supply > 0.5:
         anomalies.append("majority_owned_by_one_wallet")
 
-    result = {
-        "top_holders": [{"address": addr, "balance": bal} for addr, bal in top_holders],
+    return {
         "centralization_score": round(top_percent, 2),
         "anomalies": anomalies,
-        "total_holders": len(filtered),
-        "total_supply_calculated": total_supply,
+        "total_entities": len(totals),
+        "distribution": distribution_stats(totals.values()),
+    }
+
+def with_concentration(result: dict, concentration: dict) -> dict:
+    """`result` with its concentration replaced; graph anomalies are kept."""
+    others = [a for a in result.get("anomalies", []) if a not in CONCENTRATION_ANOMALIES]
+    return {**result, **concentration, "anomalies": concentration["anomalies"] + others}
+
+def _summarize(top_holders: list, total_supply: int, holder_count: int, concentration: dict) -> dict:
+    return {
+        "top_holders": [
+            {"address": Web3.to_checksum_address(addr), "balance": bal} for addr, bal in top_holders
+        ],
+        **concentration,
+        "total_holders": holder_count,
+        "total_supply_calculated": total_supply or 1,
     }
 
+def _archived_within(address: str, from_block: int, to_block: int) -> list:
+    return [
+        [max(start, from_block), min(end, to_block)]
+        for start, end in covered_ranges(address)
+        if end >= from_block and start <= to_block
+    ]
+
+def _add_graph_findings(result: dict, address: str, from_block: int, to_block, previous: dict = None):
+    """Run the transfer-graph passes over the archived range; their anomalies join the result's.
+
+    The archived coverage is the checkpoint: if it matches that of `previous`
+    findings, those are reused instead of re-reading the archive. Anomalies
+    are only raised when the archive covers the whole range without gaps.
+    """
+    if not archive_dir() or to_block is None or to_block < from_block:
+        return
+    covered = _archived_within(address, from_block, to_block)
+    if previous and previous.get("covered_ranges") == covered:
+        findings = previous
+    else:
+        findings = analyze_transfer_graph(TransferGraph.from_archive(address, from_block, to_block))
+        findings["covered_ranges"] = covered
+    findings["complete"] = covered == [[from_block, to_block]]
+    findings["to_block"] = to_block
+    result["transfer_graph"] = findings
+    if findings["complete"]:
+        result["anomalies"] += findings["anomalies"]
+
+def with_graph_findings(result: dict, findings: dict) -> dict:
+    """`result` with its graph findings, and the anomalies they raise, replaced."""
+    result = {**result, "anomalies": [a for a in result.get("anomalies", []) if a in CONCENTRATION_ANOMALIES]}
+    if findings:
+        result["transfer_graph"] = findings
+        if findings.get("complete"):
+            result["anomalies"] += findings["anomalies"]
+    return result
+
+def refresh_graph_findings(token: TokenComplianceProfile):
+    """Transfer-graph findings over the token's ledger range, from the archive.
+
+    Reuses the stored findings while the archived coverage is unchanged.
+    Returns None when there is no ledger or no archive.
+    """
+    checkpoint = get_checkpoint(token)
+    if checkpoint is None:
+        return None
+    result = {"anomalies": []}
+    _add_graph_findings(
+        result, token.token_address, checkpoint.start_block, checkpoint.last_processed_block,
+        previous=(token.modules.get("holderAnalysis") or {}).get("transfer_graph"),
+    )
+    return result.get("transfer_graph")
+
+def graph_refresh_due(token: TokenComplianceProfile) -> bool:
+    """Whether the ledger moved GRAPH_REFRESH_BLOCKS past the last graph pass (or there was none)."""
+    analysis = token.modules.get("holderAnalysis") or {}
+    last_block = analysis.get("last_processed_block")
+    if not archive_dir() or last_block is None:
+        return False
+    findings = analysis.get("transfer_graph") or {}
+    return "to_block" not in findings or last_block - findings["to_block"] >= GRAPH_REFRESH_BLOCKS
+
+def _analyze_window(address: str, from_block: int, to_block: int, top_n: int, progress=None):
+    """Returns (result, {raw address: balance} of every positive balance)."""
+    balances, report = _stream_transfer_deltas(address, from_block, to_block, progress)
+
+    filtered = {k: v for k, v in balances.items() if v > 0}
+    top_holders = [("0x" + raw.hex(), balance) for raw, balance in top_balances(filtered, top_n)]
+    holders = [("0x" + raw.hex(), balance) for raw, balance in filtered.items()]
+    totals = _entity_totals(holders, merged_addresses(address for address, _ in holders))
+    result = _summarize(top_holders, sum(filtered.values()), len(filtered), _concentration(totals, top_n))
+    result.update(_coverage(report))
+    _add_graph_findings(result, address, from_block, _covered_until(report, from_block))
+    return result, filtered
+
+def _ledger_plan(token: TokenComplianceProfile, address: str, latest_block: int, to_block: int,
+                 checkpoint=None, deployments=None) -> dict:
+    """Where the token's ledger resumes: its checkpoint, or deployment for a new ledger.
+
+    `deployments` holds deployment blocks already looked up in bulk; without
+    it the checkpoint is read and the deployment searched for here.
+    """
+    if deployments is None:
+        checkpoint = get_checkpoint(token)
+    if checkpoint:
+        return {
+            "expected": checkpoint.last_processed_block,
+            "start_block": checkpoint.start_block,
+            "complete": checkpoint.complete,
+            "from_block": checkpoint.last_processed_block + 1,
+        }
+    if deployments is None:
+        try:
+            start_block = find_deployment_block(get_web3(), address, latest_block)
+        except (Web3Exception, requests.RequestException, RetryableResponse):
+            start_block = None
+    else:
+        start_block = deployments.get(address)
+    complete = start_block is not None
+    if start_block is None:
+        # No archive state: start from the lookback window; balances are partial
+        start_block = max(0, to_block - BLOCK_LOOKBACK_WINDOW)
+    return {"expected": None, "start_block": start_block, "complete": complete, "from_block": start_block}
+
+def _apply_ledger(token: TokenComplianceProfile, plan: dict, balances: dict, report: dict):
+    # Only the gap-free prefix is applied; the rest is retried next run
+    last_block = _covered_until(report, plan["from_block"])
+    if last_block >= plan["from_block"]:
+        apply_deltas(
+            token, _hex_keys(balances), plan["expected"], plan["start_block"], last_block, plan["complete"]
+        )
+
+def entity_concentration(token: TokenComplianceProfile, top_n: int = 10, merged: dict = None) -> dict:
+    """Concentration of the token's ledger counted per entity (see _concentration).
+
+    `merged` defaults to merged_addresses of the token's holders.
+    """
+    holders = list(ledger_holders(token))
+    if merged is None:
+        merged = merged_addresses(address for address, _ in holders)
+    return _concentration(_entity_totals(holders, merged), top_n)
+
+def _ledger_result(token: TokenComplianceProfile, plan: dict, top_n: int, new_logs: int, coverage: dict) -> dict:
+    top_holders, total_supply, holder_count = ledger_summary(token, top_n)
+    result = _summarize(top_holders, total_supply, holder_count, entity_concentration(token, top_n))
+    # The graph pass reads the whole archive, so it runs as its own "graph" job;
+    # carry over its last findings
+    result = with_graph_findings(result, (token.modules.get("holderAnalysis") or {}).get("transfer_graph"))
+    checkpoint = get_checkpoint(token)
+    result.update({
+        "ledger_start_block": plan["start_block"],
+        "last_processed_block": checkpoint.last_processed_block if checkpoint else None,
+        "ledger_complete": plan["complete"],
+        "new_logs": new_logs,
+        **coverage,
+    })
+    return result
+
+def _analyze_ledger(token: TokenComplianceProfile, address: str, to_block, top_n: int, progress=None) -> dict:
+    """Apply only the logs after the token's checkpoint, then summarize the full ledger."""
+    latest_block = get_web3().eth.block_number
+    to_block = latest_block - LEDGER_CONFIRMATIONS if to_block is None else int(to_block)
+    plan = _ledger_plan(token, address, latest_block, to_block)
+
+    new_logs = 0
+    coverage = {"covered_ranges": [], "failed_ranges": [], "archived_logs": 0}
+    if plan["from_block"] <= to_block:
+        balances, report = _stream_transfer_deltas(address, plan["from_block"], to_block, progress)
+        new_logs = report["logs"] + report["archived_logs"]
+        coverage = _coverage(report)
+        _apply_ledger(token, plan, balances, report)
+
+    return _ledger_result(token, plan, top_n, new_logs, coverage)
+
+def analyze_token_holders(token_address: str, from_block=None, to_block=None, top_n=10, persist_all=False,
+                          progress=None):
+    """Holder distribution for a token.
+
+    Registered tokens use the persisted balance ledger, so each run only
+    fetches logs after the last checkpoint. An explicit `from_block`, or an
+    unregistered token, gives a one-off scan of that window instead.
+
+    Registered tokens get their top holders saved as holder links; with
+    `persist_all` every holder is saved and links to former holders removed.
+    `progress` receives scan progress (see _stream_transfer_deltas).
+    """
+    address = Web3.to_checksum_address(token_address)
+    token_obj = TokenComplianceProfile.objects.filter(token_address=token_address.lower()).first()
+
+    if token_obj and from_block is None:
+        result = _analyze_ledger(token_obj, address, to_block, top_n, progress)
+        all_holders = ledger_holders(token_obj) if persist_all else None
+    else:
+        if from_block is None or to_block is None:
+            latest_block = get_web3().eth.block_number
+            to_block = latest_block if to_block is None else to_block
+            from_block = latest_block - BLOCK_LOOKBACK_WINDOW if from_block is None else from_block
+        result, balances = _analyze_window(address, int(from_block), int(to_block), top_n, progress)
+        all_holders = (("0x" + raw.hex(), balance) for raw, balance in balances.items()) if persist_all else None
+
     # Persist holder data to DB
-    token_obj = TokenComplianceProfile.objects.filter(token_address=token_address).first()
     if token_obj:
-        save_holders_to_db(token=token_obj, holder_data=result["top_holders"])
+        if all_holders is None:
+            holders = [(h["address"], h["balance"]) for h in result["top_holders"]]
+            result["persisted_holders"] = save_holders(token_obj, holders)
+        else:
+            result["persisted_holders"] = save_holders(token_obj, all_holders, prune=True)
+
+    return result
+
+def _record_holder_analyses(results: dict):
+    """Write a HolderAnalysisResult and the profile module for each {token: result}."""
+    analyses = {
+        token: HolderAnalysisResult(
+            token=token,
+            top_holders=result["top_holders"],
+            centralization_score=result["centralization_score"],
+            anomalies=result["anomalies"],
+        )
+        for token, result in results.items()
+    }
+    HolderAnalysisResult.objects.bulk_create(analyses.values())
+    now = timezone.now()
+    for token, result in results.items():
+        token.modules["holderAnalysis"] = result
+        token.latest_holder_analysis = analyses[token]
+        apply_score(token)
+        token.updated_at = now
+    TokenComplianceProfile.objects.bulk_update(
+        list(results),
+        ["modules", "latest_holder_analysis", "risk_score", "recommendation", "scoring_version", "updated_at"],
+    )
+    invalidate_profiles(token.token_address for token in results)
 
-    return result
\ No newline at end of file
+def _archive_chunk(writer: PartitionWriter, gaps: list, start: int, end: int, logs: list):
+    """Hand the parts of a fetched chunk that fall in unarchived `gaps` to `writer`."""
+    for gap_start, gap_end in gaps:
+        lo, hi = max(start, gap_start), min(end, gap_end)
+        if lo > hi:
+            continue
+        if writer.end is not None and lo != writer.end + 1:
+            # Partitions must not span blocks archived meanwhile
+            writer.flush()
+        writer.add(lo, hi, [log for log in logs if lo <= log["blockNumber"] <= hi])
+
+def analyze_watchlist(tokens: list, to_block=None, top_n=10, addresses_per_query=WATCHLIST_ADDRESSES_PER_QUERY) -> dict:
+    """Refresh the holder ledgers of many registered tokens from shared log queries.
+
+    Tokens are grouped by where their ledgers resume, and each group is scanned
+    once with an address-list eth_getLogs; logs are split per token as they
+    arrive. RPC calls scale with the block range, not range x tokens.
+    Returns {token_address: result}; each token also gets a HolderAnalysisResult.
+    """
+    latest_block = get_web3().eth.block_number
+    to_block = latest_block - LEDGER_CONFIRMATIONS if to_block is None else int(to_block)
+    final_block = latest_block - LEDGER_CONFIRMATIONS
+
+    tokens = {token.token_address.lower(): token for token in tokens}
+    checkpoints = {
+        checkpoint.token_id: checkpoint
+        for checkpoint in TokenLedgerCheckpoint.objects.filter(token__in=tokens.values())
+    }
+    new = [Web3.to_checksum_address(a) for a, t in tokens.items() if t.pk not in checkpoints]
+    deployments = find_deployment_blocks(get_web3(), new, latest_block)
+    plans = {
+        address: _ledger_plan(
+            token, Web3.to_checksum_address(address), latest_block, to_block,
+            checkpoint=checkpoints.get(token.pk), deployments=deployments,
+        )
+        for address, token in tokens.items()
+    }
+    balances = {address: defaultdict(int) for address in tokens}
+    coverage = {address: {"covered_ranges": [], "failed_ranges": [], "archived_logs": 0} for address in tokens}
+    new_logs = dict.fromkeys(tokens, 0)
+
+    # Archived blocks at the start of each ledger's range are read from disk;
+    # the shared queries fetch from the first gap on
+    fetch_from, gaps = {}, {}
+    for address in tokens:
+        if plans[address]["from_block"] > to_block:
+            continue
+        segments = plan_ranges(address, plans[address]["from_block"], to_block)
+        fetch_from[address] = plans[address]["from_block"]
+        while segments and segments[0][2]:
+            start, end, _ = segments.pop(0)
+            for rows in read_range(address, start, end):
+                apply_transfer_rows(balances[address], rows)
+                coverage[address]["archived_logs"] += len(rows)
+                new_logs[address] += len(rows)
+            fetch_from[address] = end + 1
+        gaps[address] = [(start, end) for start, end, archived in segments if not archived]
+
+    for address in [a for a in fetch_from if fetch_from[a] > to_block]:
+        coverage[address]["covered_ranges"] = [[plans[address]["from_block"], to_block]]
+        _apply_ledger(tokens[address], plans[address], balances.pop(address), coverage[address])
+
+    pending = sorted((a for a in fetch_from if fetch_from[a] <= to_block), key=fetch_from.get)
+    for i in range(0, len(pending), addresses_per_query):
+        group = pending[i:i + addresses_per_query]
+        writers = {a: PartitionWriter(a, final_block) for a in group} if archive_dir() else {}
+
+        def on_chunk(start, end, logs):
+            by_token = defaultdict(list)
+            for log in logs:
+                by_token[log["address"].lower()].append(log)
+            for address, token_logs in by_token.items():
+                from_block = fetch_from[address]
+                if end < from_block:
+                    continue
+                if start < from_block:
+                    token_logs = [log for log in token_logs if log["blockNumber"] >= from_block]
+                apply_transfer_logs(balances[address], token_logs)
+                new_logs[address] += len(token_logs)
+            for address, writer in writers.items():
+                _archive_chunk(writer, gaps[address], start, end, by_token.get(address, []))
+
+        group_start = fetch_from[group[0]]
+        report = fetch_logs(
+            get_web3(), [Web3.to_checksum_address(a) for a in group], [TRANSFER_TOPIC], group_start, to_block,
+            on_chunk=on_chunk,
+        )
+        for writer in writers.values():
+            writer.flush()
+
+        for address in group:
+            from_block = plans[address]["from_block"]
+            # The archived prefix is covered whatever happened to the fetch
+            last_block = max(_covered_until(report, group_start), fetch_from[address] - 1)
+            token_report = {
+                "covered_ranges": [[from_block, last_block]] if last_block >= from_block else [],
+                "failed_ranges": report["failed_ranges"],
+                "archived_logs": coverage[address]["archived_logs"],
+            }
+            coverage[address] = token_report
+            _apply_ledger(tokens[address], plans[address], balances.pop(address), token_report)
+
+    results = {
+        tokens[address]: _ledger_result(tokens[address], plans[address], top_n, new_logs[address], coverage[address])
+        for address in tokens
+    }
+    for token, result in results.items():
+        holders = [(h["address"], h["balance"]) for h in result["top_holders"]]
+        result["persisted_holders"] = save_holders(token, holders)
+    _record_holder_analyses(results)
+    return {token.token_address: result for token, result in results.items()}
@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from api.models import TokenBalance, TokenComplianceProfile, TokenLedgerCheckpoint
+from .rpc_batch import batch_rpc
+
+# Rows per IN query / bulk statement when applying deltas
+LEDGER_BATCH_SIZE = 1_000
+
+
+def find_deployment_block(w3, address: str, latest: int) -> int:
+    """Binary-search the first block where `address` has code (needs an archive node)."""
+    lo, hi = 0, latest
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if w3.eth.get_code(address, block_identifier=mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def find_deployment_blocks(w3, addresses: list, latest: int) -> dict:
+    """find_deployment_block for many addresses, one batched eth_getCode per search step.
+
+    Addresses whose code lookups fail (no archive state) are left out.
+    """
+    bounds = {address: (0, latest) for address in addresses}
+    failed = set()
+    while True:
+        searching = [a for a, (lo, hi) in bounds.items() if lo < hi and a not in failed]
+        if not searching:
+            break
+        mids = {a: (bounds[a][0] + bounds[a][1]) // 2 for a in searching}
+        responses = batch_rpc(w3, [("eth_getCode", [a, hex(mids[a])]) for a in searching])
+        for address, response in zip(searching, responses):
+            if "error" in response:
+                failed.add(address)
+                continue
+            lo, hi = bounds[address]
+            code = response.get("result") or "0x"
+            bounds[address] = (lo, mids[address]) if code != "0x" else (mids[address] + 1, hi)
+    return {address: lo for address, (lo, _) in bounds.items() if address not in failed}
+
+
+def find_deployers(w3, contracts: list, latest: int) -> dict:
+    """{contract: deployer} for contracts created directly by a transaction.
+
+    Finds each deployment block, then matches the block's contract-creation
+    transactions to the contract through their receipts. Contracts created by
+    other contracts (factories) have no creation transaction and are left out.
+    """
+    blocks = find_deployment_blocks(w3, contracts, latest)
+    numbers = sorted(set(blocks.values()))
+    responses = batch_rpc(w3, [("eth_getBlockByNumber", [hex(number), True]) for number in numbers])
+    creations = [
+        tx
+        for response in responses
+        for tx in (response.get("result") or {}).get("transactions", [])
+        if isinstance(tx, dict) and tx.get("to") is None
+    ]
+    receipts = batch_rpc(w3, [("eth_getTransactionReceipt", [tx["hash"]]) for tx in creations])
+
+    wanted = {contract.lower(): contract for contract in blocks}
+    deployers = {}
+    for tx, receipt in zip(creations, receipts):
+        created = ((receipt.get("result") or {}).get("contractAddress") or "").lower()
+        if created in wanted:
+            deployers[wanted[created]] = tx["from"].lower()
+    return deployers
+
+
+def get_checkpoint(token):
+    return TokenLedgerCheckpoint.objects.filter(token=token).first()
+
+
+def apply_deltas(token, deltas: dict, expected_last_block, start_block: int, to_block: int,
+                 complete: bool) -> bool:
+    """Add {address: delta} to the ledger and move the checkpoint to `to_block`.
+
+    `expected_last_block` is the checkpoint the deltas were computed from
+    (None for a new ledger). If another run advanced the checkpoint in the
+    meantime nothing is applied and False is returned, so logs are never
+    counted twice.
+    """
+    try:
+        with transaction.atomic():
+            return _apply_deltas(token, deltas, expected_last_block, start_block, to_block, complete)
+    except IntegrityError:
+        # A concurrent first run created the ledger (backends without row locks)
+        return False
+
+
+def _apply_deltas(token, deltas: dict, expected_last_block, start_block: int, to_block: int, complete: bool) -> bool:
+    # There is no checkpoint row to lock before the first run, so runs serialize on the token row
+    TokenComplianceProfile.objects.select_for_update().filter(id=token.id).values_list("id", flat=True).get()
+    checkpoint = TokenLedgerCheckpoint.objects.filter(token=token).first()
+    current = checkpoint.last_processed_block if checkpoint else None
+    if current != expected_last_block:
+        return False
+
+    now = timezone.now()
+    addresses = [address for address, delta in deltas.items() if delta]
+    for i in range(0, len(addresses), LEDGER_BATCH_SIZE):
+        chunk = addresses[i:i + LEDGER_BATCH_SIZE]
+        existing = {row.address: row for row in TokenBalance.objects.filter(token=token, address__in=chunk)}
+        created, updated = [], []
+        for address in chunk:
+            row = existing.get(address)
+            if row is None:
+                created.append(TokenBalance(token=token, address=address, balance=Decimal(deltas[address])))
+            else:
+                # Decimal arithmetic would round to 28 digits; int math is exact
+                row.balance = Decimal(int(row.balance) + deltas[address])
+                row.updated_at = now
+                updated.append(row)
+        TokenBalance.objects.bulk_create(created, batch_size=LEDGER_BATCH_SIZE)
+        TokenBalance.objects.bulk_update(updated, ["balance", "updated_at"], batch_size=LEDGER_BATCH_SIZE)
+
+    if checkpoint is None:
+        TokenLedgerCheckpoint.objects.create(
+            token=token, start_block=start_block, last_processed_block=to_block, complete=complete
+        )
+    else:
+        checkpoint.last_processed_block = to_block
+        checkpoint.save(update_fields=["last_processed_block", "updated_at"])
+    return True
+
+
+def ledger_holders(token):
+    """Yield (address, balance) for every address with a positive balance."""
+    rows = TokenBalance.objects.filter(token=token, balance__gt=0).values_list("address", "balance")
+    for address, balance in rows.iterator(chunk_size=LEDGER_BATCH_SIZE):
+        yield address, int(balance)
+
+
+def ledger_summary(token, top_n: int):
+    """Return (top holders as [(address, balance)], total supply, holder count)."""
+    holders = TokenBalance.objects.filter(token=token, balance__gt=0)
+    top = [
+        (address, int(balance))
+        for address, balance in holders.order_by("-balance").values_list("address", "balance")[:top_n]
+    ]
+    totals = holders.aggregate(total=Sum("balance"), count=Count("id"))
+    return top, int(totals["total"] or 0), totals["count"]
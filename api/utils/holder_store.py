@@ -0,0 +1,236 @@
+"""Bulk persistence of holders and their per-token balances.
+
+Addresses are resolved with one IN query per batch, missing Holder and
+HolderAddress rows are bulk-created, and HolderTokenLink balances are upserted
+(ON CONFLICT DO UPDATE), all in one transaction. On PostgreSQL large link sets
+are loaded with COPY into a temporary table and upserted from there.
+
+`merge_holders` writes address clusters back: the addresses of clustered
+holders move to the oldest of them. Each address remembers the holder it
+came from and emptied holders are kept, so `unmerge_holders` can undo it.
+"""
+import csv
+import io
+import uuid
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from web3 import Web3
+
+from api.models import Holder, HolderAddress, HolderTokenLink
+from .clustering import UnionFind
+from .funny_name import generate_random_holder_name
+
+HOLDER_BATCH_SIZE = 1_000
+# Below this many links the plain bulk upsert is as fast as COPY
+COPY_THRESHOLD = 5_000
+
+
+def _unique_names(count: int) -> list:
+    """Random holder names, none of them already taken."""
+    names = set()
+    while len(names) < count:
+        candidates = {generate_random_holder_name() for _ in range(count - len(names))} - names
+        taken = set(Holder.objects.filter(name__in=candidates).values_list("name", flat=True))
+        names |= candidates - taken
+    return list(names)
+
+
+def _address_ids(addresses: list) -> dict:
+    """{address: HolderAddress id}, creating a Holder for each unknown address."""
+    ids = {}
+    for i in range(0, len(addresses), HOLDER_BATCH_SIZE):
+        chunk = addresses[i:i + HOLDER_BATCH_SIZE]
+        ids.update(HolderAddress.objects.filter(address__in=chunk).values_list("address", "id"))
+        missing = [address for address in chunk if address not in ids]
+        if not missing:
+            continue
+
+        holders = [Holder(name=name) for name in _unique_names(len(missing))]
+        Holder.objects.bulk_create(holders)
+        # A concurrent writer may have added some addresses; re-read rather than trust our ids
+        HolderAddress.objects.bulk_create(
+            [HolderAddress(holder=holder, address=address) for holder, address in zip(holders, missing)],
+            ignore_conflicts=True,
+        )
+        ids.update(HolderAddress.objects.filter(address__in=missing).values_list("address", "id"))
+    return ids
+
+
+def _upsert_links(token, balances: dict, now):
+    links = [
+        HolderTokenLink(holder_address_id=address_id, token=token, balance=balance, updated_at=now)
+        for address_id, balance in balances.items()
+    ]
+    HolderTokenLink.objects.bulk_create(
+        links,
+        batch_size=HOLDER_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["holder_address", "token"],
+        update_fields=["balance", "updated_at"],
+    )
+
+
+def _copy_links(token, balances: dict, now):
+    table = HolderTokenLink._meta.db_table
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for address_id, balance in balances.items():
+        writer.writerow([uuid.uuid4(), address_id, balance])
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        # ON COMMIT DROP only fires at the outermost commit; earlier calls in it leave the table behind
+        cursor.execute("DROP TABLE IF EXISTS holder_link_load")
+        cursor.execute(
+            "CREATE TEMP TABLE holder_link_load (id uuid, holder_address_id uuid, balance numeric(80, 0)) "
+            "ON COMMIT DROP"
+        )
+        cursor.copy_expert("COPY holder_link_load FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO {table} (id, holder_address_id, token_id, balance, created_at, updated_at) "
+            "SELECT id, holder_address_id, %s, balance, %s, %s FROM holder_link_load "
+            "ON CONFLICT (holder_address_id, token_id) "
+            "DO UPDATE SET balance = EXCLUDED.balance, updated_at = EXCLUDED.updated_at",
+            [token.pk, now, now],
+        )
+
+
+def save_holders(token, holders, prune: bool = False) -> int:
+    """Upsert `(address, balance)` pairs as the token's holder links.
+
+    With `prune`, `holders` is taken as the complete holder set and links to
+    addresses missing from it are removed. Returns the number of links written.
+    """
+    balances = {}
+    for address, balance in holders:
+        balances[Web3.to_checksum_address(address)] = int(balance)
+
+    now = timezone.now()
+    with transaction.atomic():
+        ids = _address_ids(list(balances))
+        by_id = {ids[address]: balance for address, balance in balances.items()}
+        if connection.vendor == "postgresql" and len(by_id) >= COPY_THRESHOLD:
+            _copy_links(token, by_id, now)
+        else:
+            _upsert_links(token, by_id, now)
+        if prune:
+            HolderTokenLink.objects.filter(token=token, updated_at__lt=now).delete()
+    return len(by_id)
+
+
+def _holders_of(addresses: list) -> dict:
+    """{HolderAddress.address: holder id} for the known addresses."""
+    holders = {}
+    for i in range(0, len(addresses), HOLDER_BATCH_SIZE):
+        chunk = addresses[i:i + HOLDER_BATCH_SIZE]
+        holders.update(HolderAddress.objects.filter(address__in=chunk).values_list("address", "holder_id"))
+    return holders
+
+
+def _copy_merges(merges: dict):
+    table = HolderAddress._meta.db_table
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(merges.items())
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS holder_merge_load")
+        cursor.execute("CREATE TEMP TABLE holder_merge_load (holder_id uuid, canonical_id uuid) ON COMMIT DROP")
+        cursor.copy_expert("COPY holder_merge_load FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"UPDATE {table} SET holder_id = m.canonical_id, "
+            f"original_holder_id = COALESCE({table}.original_holder_id, {table}.holder_id) "
+            f"FROM holder_merge_load m WHERE {table}.holder_id = m.holder_id"
+        )
+
+
+def _update_merges(merges: dict):
+    by_canonical = {}
+    for holder_id, canonical_id in merges.items():
+        by_canonical.setdefault(canonical_id, []).append(holder_id)
+    for canonical_id, holder_ids in by_canonical.items():
+        for i in range(0, len(holder_ids), HOLDER_BATCH_SIZE):
+            HolderAddress.objects.filter(holder_id__in=holder_ids[i:i + HOLDER_BATCH_SIZE]).update(
+                holder_id=canonical_id, original_holder_id=Coalesce("original_holder_id", "holder_id")
+            )
+
+
+def add_holder_addresses(addresses) -> int:
+    """Give each address without a HolderAddress row its own Holder. Returns the number of addresses."""
+    addresses = sorted({Web3.to_checksum_address(address) for address in addresses})
+    with transaction.atomic():
+        return len(_address_ids(addresses))
+
+
+def merge_holders(clusters, max_group: int = None) -> int:
+    """Merge the holders of each cluster (a list of addresses) into one.
+
+    A holder's other addresses follow it, so clusters found in separate runs
+    chain together; groups that would end up with more than `max_group`
+    holders are left alone. The oldest holder of each group takes the
+    addresses. Addresses with no HolderAddress row are skipped. Returns the
+    number of holders merged away.
+    """
+    clusters = [[Web3.to_checksum_address(address) for address in cluster] for cluster in clusters]
+    holder_of = _holders_of(sorted({address for cluster in clusters for address in cluster}))
+    if not holder_of:
+        return 0
+
+    # Oldest first, so each group's root (its smallest index) is its oldest holder
+    holder_ids = list(
+        Holder.objects.filter(id__in=set(holder_of.values())).order_by("created_at", "id").values_list("id", flat=True)
+    )
+    index = {holder_id: i for i, holder_id in enumerate(holder_ids)}
+    left, right = [], []
+    for cluster in clusters:
+        members = [index[holder_of[address]] for address in cluster if address in holder_of]
+        left += members[:-1]
+        right += members[1:]
+    uf = UnionFind(len(holder_ids))
+    uf.union(np.array(left, dtype=np.int64), np.array(right, dtype=np.int64))
+    roots = uf.find()
+    sizes = np.bincount(roots)
+
+    merges = {
+        holder_ids[i]: holder_ids[root]
+        for i, root in enumerate(roots.tolist())
+        if i != root and (max_group is None or sizes[root] <= max_group)
+    }
+    if not merges:
+        return 0
+    with transaction.atomic():
+        if connection.vendor == "postgresql" and len(merges) >= COPY_THRESHOLD:
+            _copy_merges(merges)
+        else:
+            _update_merges(merges)
+    return len(merges)
+
+
+def unmerge_holders(addresses) -> int:
+    """Move merged addresses back to the holders they had before. Returns the number moved."""
+    addresses = [Web3.to_checksum_address(address) for address in addresses]
+    moved = 0
+    with transaction.atomic():
+        for i in range(0, len(addresses), HOLDER_BATCH_SIZE):
+            moved += HolderAddress.objects.filter(
+                address__in=addresses[i:i + HOLDER_BATCH_SIZE], original_holder__isnull=False
+            ).update(holder_id=F("original_holder_id"), original_holder=None)
+    return moved
+
+
+def merged_addresses(addresses) -> dict:
+    """{lowercase address: holder id} for those of `addresses` whose holder has several."""
+    holder_of = _holders_of(sorted({Web3.to_checksum_address(address) for address in addresses}))
+    holder_ids = sorted(set(holder_of.values()))
+    shared = set()
+    for i in range(0, len(holder_ids), HOLDER_BATCH_SIZE):
+        shared.update(
+            HolderAddress.objects.filter(holder_id__in=holder_ids[i:i + HOLDER_BATCH_SIZE])
+            .order_by().values("holder_id").annotate(count=Count("id")).filter(count__gt=1)
+            .values_list("holder_id", flat=True)
+        )
+    return {address.lower(): holder_id for address, holder_id in holder_of.items() if holder_id in shared}
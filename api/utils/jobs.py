@@ -0,0 +1,252 @@
+"""DB-backed queue for analyses, run by `manage.py run_analysis_worker`.
+
+Submitting a module for a token that already has a queued or running job of
+that module returns the existing job (single flight, backed by a partial
+unique constraint). Workers claim jobs with a conditional UPDATE, so any
+number of worker processes can share the queue without a broker. A running
+job is heartbeated from a background thread, whether or not its runner
+reports progress; running jobs whose worker went quiet are requeued, up to
+MAX_JOB_ATTEMPTS.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from decouple import config
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import AnalysisJob, ContractAnalysisResult, HolderAnalysisResult, TokenComplianceProfile
+from .batch_analysis import apply_contract_summary
+from .bytecode_store import store_bytecode
+from .contract import get_bytecode_for_address
+from .contract_analysis import ENGINE_VERSION, run_contract_analysis
+from .holder_analysis import analyze_token_holders, graph_refresh_due, refresh_graph_findings, with_graph_findings
+from .profile_cache import invalidate_profiles
+from .proxy import resolve_proxies
+from .rescore import apply_score
+
+JOB_POLL_INTERVAL = config("ANALYSIS_JOB_POLL_INTERVAL", default=1.0, cast=float)
+# Seconds without a heartbeat before a running job counts as abandoned
+JOB_STALE_AFTER = config("ANALYSIS_JOB_STALE_AFTER", default=600, cast=int)
+MAX_JOB_ATTEMPTS = 3
+# Seconds between heartbeats of a running job; well under JOB_STALE_AFTER
+JOB_HEARTBEAT_INTERVAL = config("ANALYSIS_JOB_HEARTBEAT_INTERVAL", default=60.0, cast=float)
+# Progress is written at most this often (seconds)
+PROGRESS_INTERVAL = 1.0
+# Queued jobs looked at per claim attempt
+CLAIM_BATCH = 10
+
+
+@contextmanager
+def _locked_token(token_id):
+    # Jobs of different modules update the same profile; don't lose each other's writes
+    with transaction.atomic():
+        token = TokenComplianceProfile.objects.select_for_update().get(id=token_id)
+        yield token
+        token.save()
+    invalidate_profiles([token.token_address])
+
+
+def _run_contract(token: TokenComplianceProfile, params: dict, progress) -> dict:
+    code = bytes.fromhex(get_bytecode_for_address(token.token_address))
+    progress(bytecode_size=len(code))
+
+    result = run_contract_analysis(token.token_address, bytecode=code)
+    # Proxies are judged on their implementation's logic
+    result = resolve_proxies({token.token_address: result}, {token.token_address: code})[token.token_address]
+
+    record = ContractAnalysisResult.objects.create(
+        token=token,
+        score=result["score"],
+        flags=result["flags"],
+        evidence=result["evidence"],
+        bytecode_blob_id=store_bytecode(code),
+        engine_version=ENGINE_VERSION
+    )
+    with _locked_token(token.id) as locked:
+        apply_contract_summary(locked, result)
+        locked.latest_contract_analysis = record
+    return result
+
+
+def _run_holders(token: TokenComplianceProfile, params: dict, progress) -> dict:
+    result = analyze_token_holders(
+        token.token_address, persist_all=bool(params.get("persist_all")), progress=progress
+    )
+    analysis = HolderAnalysisResult.objects.create(
+        token=token,
+        top_holders=result["top_holders"],
+        centralization_score=result["centralization_score"],
+        anomalies=result["anomalies"]
+    )
+    with _locked_token(token.id) as locked:
+        locked.modules["holderAnalysis"] = result
+        locked.latest_holder_analysis = analysis
+        apply_score(locked)
+    schedule_graph_refreshes([locked])
+    return {**result, "analysis_id": str(analysis.id)}
+
+
+def _run_graph(token: TokenComplianceProfile, params: dict, progress) -> dict:
+    findings = refresh_graph_findings(token)
+    if findings is None:
+        raise ValueError("No archived holder ledger to analyse")
+    with _locked_token(token.id) as locked:
+        analysis = locked.modules.get("holderAnalysis")
+        if analysis:
+            locked.modules["holderAnalysis"] = with_graph_findings(analysis, findings)
+            apply_score(locked)
+    return findings
+
+
+RUNNERS = {
+    "contract": _run_contract,
+    "holders": _run_holders,
+    # Transfer-graph passes over the whole archive; queued by holder analyses
+    "graph": _run_graph,
+}
+
+
+def submit_job(token: TokenComplianceProfile, module: str, params: dict = None):
+    """Queue `module` for `token`. Returns (job, created); created is False when
+    the request was attached to a job already queued or running. That job
+    keeps its own params, which may differ from `params`."""
+    if module not in RUNNERS:
+        raise ValueError(f"Unknown analysis module: {module}")
+
+    for _ in range(3):
+        active = AnalysisJob.objects.filter(token=token, module=module, status__in=AnalysisJob.ACTIVE).first()
+        if active:
+            return active, False
+        try:
+            with transaction.atomic():
+                return AnalysisJob.objects.create(token=token, module=module, params=params or {}), True
+        except IntegrityError:
+            # A concurrent submit won; attach to its job (unless it already finished)
+            continue
+    raise RuntimeError("Could not submit analysis job")
+
+
+def schedule_graph_refreshes(tokens) -> int:
+    """Queue a graph job for each token whose findings fell GRAPH_REFRESH_BLOCKS behind its ledger."""
+    return sum(submit_job(token, "graph")[1] for token in tokens if graph_refresh_due(token))
+
+
+def claim_job(worker: str):
+    """Mark the oldest queued job as running on `worker` and return it, or None."""
+    queued = AnalysisJob.objects.filter(status=AnalysisJob.QUEUED).order_by("created_at")
+    for job_id in queued.values_list("id", flat=True)[:CLAIM_BATCH]:
+        now = timezone.now()
+        claimed = AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.QUEUED).update(
+            status=AnalysisJob.RUNNING,
+            worker=worker,
+            attempts=F("attempts") + 1,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            return AnalysisJob.objects.select_related("token").get(id=job_id)
+    return None
+
+
+def requeue_stale_jobs() -> int:
+    """Requeue running jobs whose worker stopped heartbeating; fail them after
+    MAX_JOB_ATTEMPTS. Returns the number of jobs touched."""
+    now = timezone.now()
+    stale = AnalysisJob.objects.filter(
+        status=AnalysisJob.RUNNING, heartbeat_at__lt=now - timedelta(seconds=JOB_STALE_AFTER)
+    )
+    failed = stale.filter(attempts__gte=MAX_JOB_ATTEMPTS).update(
+        status=AnalysisJob.FAILED, error="Worker stopped responding", finished_at=now
+    )
+    requeued = stale.filter(attempts__lt=MAX_JOB_ATTEMPTS).update(status=AnalysisJob.QUEUED, worker=None)
+    return failed + requeued
+
+
+def _beat(job: AnalysisJob):
+    AnalysisJob.objects.filter(id=job.id, status=AnalysisJob.RUNNING, worker=job.worker).update(
+        heartbeat_at=timezone.now()
+    )
+
+
+@contextmanager
+def _heartbeat(job: AnalysisJob):
+    """Heartbeat `job` from a background thread for the duration of the block,
+    so a long RPC call or query without progress doesn't get it requeued."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+                _beat(job)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job.id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+class JobProgress:
+    """Progress callback for a running job; writes are throttled and heartbeat the job."""
+
+    def __init__(self, job: AnalysisJob):
+        self.job = job
+        self.values = dict(job.progress)
+        self.written = time.monotonic()
+
+    def __call__(self, **values):
+        self.values.update(values)
+        if time.monotonic() - self.written >= PROGRESS_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.written = time.monotonic()
+        AnalysisJob.objects.filter(id=self.job.id, status=AnalysisJob.RUNNING).update(
+            progress=self.values, heartbeat_at=timezone.now()
+        )
+
+
+def run_job(job: AnalysisJob) -> AnalysisJob:
+    """Run a claimed job and record its outcome."""
+    progress = JobProgress(job)
+    try:
+        with _heartbeat(job):
+            outcome = {"status": AnalysisJob.SUCCEEDED, "result": RUNNERS[job.module](job.token, job.params, progress)}
+    except Exception as e:
+        outcome = {"status": AnalysisJob.FAILED, "error": str(e)}
+
+    now = timezone.now()
+    # A job requeued as stale may have been claimed again; only its current worker finishes it
+    AnalysisJob.objects.filter(id=job.id, status=AnalysisJob.RUNNING, worker=job.worker).update(
+        progress=progress.values, finished_at=now, heartbeat_at=now, **outcome
+    )
+    job.refresh_from_db()
+    return job
+
+
+def work(worker: str, stop: threading.Event = None, once: bool = False) -> int:
+    """Claim and run jobs until `stop` is set, or with `once` until the queue
+    is empty. Returns the number of jobs run."""
+    stop = stop or threading.Event()
+    done = 0
+    while not stop.is_set():
+        job = claim_job(worker)
+        if job is None:
+            if once:
+                break
+            stop.wait(JOB_POLL_INTERVAL)
+            continue
+        try:
+            run_job(job)
+            done += 1
+        finally:
+            close_old_connections()
+    return done
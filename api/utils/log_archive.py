@@ -0,0 +1,174 @@
+"""On-disk archive of decoded Transfer logs, partitioned by token and block range.
+
+Layout under LOG_ARCHIVE_DIR (default data/logs, empty string disables):
+
+    <token>/partitions.json            sorted [[from_block, to_block], ...]
+    <token>/<from_block>-<to_block>.npy
+
+Each partition is a NumPy structured array (one row per Transfer, in log
+order) saved as .npy, so it can be memory-mapped and scanned column-wise.
+A partition records that its whole block range was fetched, including
+ranges that held no Transfers, so covered ranges are never asked for again.
+Only final blocks are archived; the caller decides where finality ends.
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from decouple import config
+
+DEFAULT_ARCHIVE_DIR = Path(__file__).resolve().parents[2] / "data" / "logs"
+
+TRANSFER_DTYPE = np.dtype([
+    ("block", "<u8"),
+    ("log_index", "<u4"),
+    ("sender", "u1", (20,)),
+    ("recipient", "u1", (20,)),
+    ("amount", "u1", (32,)),  # big-endian uint256
+])
+
+# Buffered logs written out as one partition
+PARTITION_LOGS = 100_000
+
+
+def archive_dir():
+    path = config("LOG_ARCHIVE_DIR", default=str(DEFAULT_ARCHIVE_DIR))
+    return Path(path) if path else None
+
+
+def _token_dir(token: str) -> Path:
+    return archive_dir() / token.lower()
+
+
+def _read_partitions(token: str) -> list:
+    try:
+        with open(_token_dir(token) / "partitions.json") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+@contextmanager
+def _locked(token: str):
+    directory = _token_dir(token)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield directory
+
+
+def covered_ranges(token: str) -> list:
+    """Archived block ranges, with adjacent partitions merged."""
+    merged = []
+    for start, end in _read_partitions(token):
+        if merged and start == merged[-1][1] + 1:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def plan_ranges(token: str, from_block: int, to_block: int) -> list:
+    """Split [from_block, to_block] into ordered (start, end, archived) segments."""
+    segments = []
+    cursor = from_block
+    for start, end in covered_ranges(token) if archive_dir() else []:
+        if end < cursor or start > to_block:
+            continue
+        if start > cursor:
+            segments.append((cursor, start - 1, False))
+        segments.append((max(start, cursor), min(end, to_block), True))
+        cursor = min(end, to_block) + 1
+    if cursor <= to_block:
+        segments.append((cursor, to_block, False))
+    return segments
+
+
+def _column(values, width: int) -> np.ndarray:
+    return np.frombuffer(b"".join(values), np.uint8).reshape(-1, width)
+
+
+def encode_transfers(logs) -> np.ndarray:
+    """Decode web3 Transfer logs into TRANSFER_DTYPE rows, skipping non-ERC20 ones."""
+    logs = [log for log in logs if len(log["topics"]) == 3 and len(log["data"]) == 32]
+    rows = np.zeros(len(logs), dtype=TRANSFER_DTYPE)
+    if not logs:
+        return rows
+    rows["block"] = [log["blockNumber"] for log in logs]
+    rows["log_index"] = [log["logIndex"] for log in logs]
+    rows["sender"] = _column((bytes(log["topics"][1])[12:] for log in logs), 20)
+    rows["recipient"] = _column((bytes(log["topics"][2])[12:] for log in logs), 20)
+    rows["amount"] = _column((bytes(log["data"]) for log in logs), 32)
+    return rows
+
+
+def write_partition(token: str, start: int, end: int, rows: np.ndarray) -> bool:
+    """Archive rows for [start, end]; False if part of the range is already archived."""
+    with _locked(token) as directory:
+        partitions = _read_partitions(token)
+        if any(s <= end and start <= e for s, e in partitions):
+            return False
+
+        path = directory / f"{start}-{end}.npy"
+        tmp = directory / f".{start}-{end}.npy.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp, path)
+
+        partitions = sorted(partitions + [[start, end]])
+        tmp = directory / ".partitions.json.tmp"
+        tmp.write_text(json.dumps(partitions))
+        os.replace(tmp, directory / "partitions.json")
+    return True
+
+
+def read_range(token: str, from_block: int, to_block: int):
+    """Yield memory-mapped row arrays covering [from_block, to_block], in block order."""
+    directory = _token_dir(token)
+    for start, end in _read_partitions(token):
+        if end < from_block or start > to_block:
+            continue
+        rows = np.load(directory / f"{start}-{end}.npy", mmap_mode="r")
+        if start < from_block or end > to_block:
+            blocks = rows["block"]
+            lo, hi = np.searchsorted(blocks, [from_block, to_block + 1])
+            rows = rows[lo:hi]
+        yield rows
+
+
+class PartitionWriter:
+    """Collects in-order fetched chunks and archives them as partitions.
+
+    Chunks past `final_block` are not archived, since they may still reorg.
+    """
+
+    def __init__(self, token: str, final_block: int):
+        self.token = token
+        self.final_block = final_block
+        self.start = None
+        self.end = None
+        self.chunks = []
+        self.count = 0
+
+    def add(self, start: int, end: int, logs):
+        end = min(end, self.final_block)
+        if start > end:
+            return
+        if self.start is None:
+            self.start = start
+        self.end = end
+        self.chunks.append(encode_transfers(log for log in logs if log["blockNumber"] <= end))
+        self.count += len(self.chunks[-1])
+        if self.count >= PARTITION_LOGS:
+            self.flush()
+
+    def flush(self):
+        if self.start is None:
+            return
+        write_partition(self.token, self.start, self.end, np.concatenate(self.chunks))
+        self.start = self.end = None
+        self.chunks = []
+        self.count = 0
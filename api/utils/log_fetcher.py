@@ -0,0 +1,149 @@
+"""Concurrent eth_getLogs fetching with adaptive block ranges.
+
+Ranges are fetched by a bounded thread pool. A range the provider rejects as
+too large is split in half; new ranges are sized from the log density seen
+in the last completed one, and grow past empty stretches. Other errors,
+rate limiting included, are retried with jittered exponential backoff. Completed ranges are handed to
+`on_chunk` strictly in block order, so callers can stream logs into state
+(such as a balance ledger) and trust that everything up to the reported
+coverage has been seen exactly once.
+"""
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from decouple import config
+
+LOG_FETCH_CONCURRENCY = config("LOG_FETCH_CONCURRENCY", default=4, cast=int)
+INITIAL_CHUNK_SIZE = 5_000
+MIN_CHUNK_SIZE = 1
+MAX_CHUNK_SIZE = 200_000
+# Logs per request that new ranges are sized for, well under provider caps
+TARGET_LOGS_PER_REQUEST = 5_000
+# Ranges held back waiting for an earlier one, before new ranges stop being issued
+MAX_BUFFERED_CHUNKS = 64
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Provider phrasings for "narrow the block range" (Infura, Alchemy, QuickNode, geth...)
+_TOO_MANY_RESULTS = (
+    "returned more than", "more than 10000 results", "too many results", "too many logs",
+    "response size", "block range", "blocks range", "range is too", "range too large", "limited to a",
+)
+# Throttling, which some providers word close to the above (Infura -32005
+# "project ID request rate exceeded", "daily request count exceeded", HTTP 429)
+_RATE_LIMITED = (
+    "rate limit", "rate-limit", "request rate", "request count", "too many requests",
+    "requests per", "compute units", "capacity", "429",
+)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(phrase in message for phrase in _RATE_LIMITED)
+
+
+def is_too_many_results(error: Exception) -> bool:
+    """True when the provider wants a narrower range; never for throttling."""
+    message = str(error).lower()
+    return not is_rate_limited(error) and any(phrase in message for phrase in _TOO_MANY_RESULTS)
+
+
+def backoff_delay(attempt: int) -> float:
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _get_logs(w3, address, topics, start: int, end: int, delay: float = 0.0):
+    if delay:
+        time.sleep(delay)
+    return w3.eth.get_logs({
+        "fromBlock": hex(start),
+        "toBlock": hex(end),
+        "address": address,
+        "topics": topics,
+    })
+
+
+def fetch_logs(w3, address, topics: list, from_block: int, to_block: int, on_chunk,
+               concurrency: int = LOG_FETCH_CONCURRENCY, chunk_size: int = INITIAL_CHUNK_SIZE) -> dict:
+    """Fetch logs for `address` (one address or a list) over [from_block, to_block].
+
+    `on_chunk(start, end, logs)` is called once per fetched range, in block
+    order, from the calling thread. If a range still fails after retries the
+    scan stops there. Returns a report:
+
+        covered_ranges  [[from_block, last_block]] seen without gaps ([] if none)
+        failed_ranges   [{"from", "to", "error"}] that gave up
+        requests        eth_getLogs calls made (including retries and splits)
+        logs            number of logs delivered
+    """
+    cursor = from_block
+    retry = deque()          # (start, end, attempt) re-queued after splits/errors
+    in_flight = {}           # future -> (start, end, attempt)
+    completed = {}           # start -> (end, logs), waiting for earlier ranges
+    next_start = from_block  # first block not yet handed to on_chunk
+    failed = []
+    requests = 0
+    delivered = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            while not failed and len(in_flight) < concurrency:
+                if retry:
+                    start, end, attempt = retry.popleft()
+                elif cursor > to_block or len(completed) >= MAX_BUFFERED_CHUNKS:
+                    break
+                else:
+                    start, end, attempt = cursor, min(cursor + chunk_size - 1, to_block), 0
+                    cursor = end + 1
+                delay = backoff_delay(attempt - 1) if attempt else 0.0
+                future = executor.submit(_get_logs, w3, address, topics, start, end, delay)
+                in_flight[future] = (start, end, attempt)
+                requests += 1
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, end, attempt = in_flight.pop(future)
+                try:
+                    logs = future.result()
+                except Exception as e:
+                    if is_too_many_results(e) and end > start:
+                        mid = (start + end) // 2
+                        retry.appendleft((mid + 1, end, 0))
+                        retry.appendleft((start, mid, 0))
+                        chunk_size = max(MIN_CHUNK_SIZE, min(chunk_size, (end - start + 1) // 2))
+                    elif attempt < MAX_RETRIES:
+                        retry.append((start, end, attempt + 1))
+                    else:
+                        failed.append({"from": start, "to": end, "error": str(e)})
+                    continue
+
+                # Sized from this range alone, so results of ranges issued
+                # earlier with another size don't compound
+                size = end - start + 1
+                if not logs:
+                    chunk_size = max(chunk_size, size * 2)
+                else:
+                    chunk_size = size * TARGET_LOGS_PER_REQUEST // len(logs)
+                chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
+                completed[start] = (end, logs)
+
+            # Hand over whatever now continues the delivered prefix
+            while next_start in completed:
+                end, logs = completed.pop(next_start)
+                on_chunk(next_start, end, logs)
+                delivered += len(logs)
+                next_start = end + 1
+
+    covered = [[from_block, next_start - 1]] if next_start > from_block else []
+    return {
+        "covered_ranges": covered,
+        "failed_ranges": failed,
+        "requests": requests,
+        "logs": delivered,
+    }
@@ -0,0 +1,66 @@
+"""Multicall3 aggregation of read-only calls.
+
+Many `eth_call`s are packed into `aggregate3` calls, which are themselves sent
+as JSON-RPC batches. Chains without Multicall3 fall back to batching the
+individual calls.
+"""
+from eth_abi import decode, encode
+from eth_abi.exceptions import DecodingError
+from web3 import Web3
+
+from .rpc_batch import batch_rpc
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+# Sub-calls per aggregate3, kept well under node eth_call gas caps
+CALLS_PER_AGGREGATE = 500
+
+
+def _aggregate3_request(calls: list):
+    data = AGGREGATE3_SELECTOR + encode(
+        ["(address,bool,bytes)[]"],
+        [[(Web3.to_checksum_address(target), True, call_data) for target, call_data in calls]],
+    )
+    return ("eth_call", [{"to": MULTICALL3_ADDRESS, "data": "0x" + data.hex()}, "latest"])
+
+
+def _direct_requests(calls: list):
+    return [
+        ("eth_call", [{"to": Web3.to_checksum_address(target), "data": "0x" + call_data.hex()}, "latest"])
+        for target, call_data in calls
+    ]
+
+
+def _raw(response: dict):
+    result = response.get("result")
+    if "error" in response or result is None:
+        return None
+    return bytes.fromhex(result[2:])
+
+
+def _decode_aggregate(raw) -> list:
+    """Sub-call results of an aggregate3 return value; None if it isn't one."""
+    # A chain without Multicall3 answers the call from an empty account: "0x"
+    if not raw:
+        return None
+    try:
+        (decoded,) = decode(["(bool,bytes)[]"], raw)
+    except (DecodingError, OverflowError):
+        return None
+    return [data if success else None for success, data in decoded]
+
+
+def multicall(w3, calls: list) -> list:
+    """Run `(target, call_data)` calls; returns return data per call, or None if it failed."""
+    chunks = [calls[i:i + CALLS_PER_AGGREGATE] for i in range(0, len(calls), CALLS_PER_AGGREGATE)]
+    responses = batch_rpc(w3, [_aggregate3_request(chunk) for chunk in chunks])
+
+    results = []
+    for chunk, response in zip(chunks, responses):
+        decoded = _decode_aggregate(_raw(response))
+        if decoded is None or len(decoded) != len(chunk):
+            # No Multicall3 on this chain (or the aggregate reverted): call directly
+            results.extend(_raw(r) for r in batch_rpc(w3, _direct_requests(chunk)))
+            continue
+        results.extend(decoded)
+    return results
@@ -0,0 +1,122 @@
+"""Single-pass EVM opcode scanner over raw bytecode.
+
+Walks the code once, skipping PUSH immediates, and only counts: no
+per-instruction objects are created, unlike a full evmdasm disassembly.
+"""
+
+OPCODE_NAMES = [f"UNKNOWN_{op:#x}" for op in range(256)]
+OPCODE_NAMES[0x00:0x0c] = [
+    "STOP", "ADD", "MUL", "SUB", "DIV", "SDIV", "MOD", "SMOD", "ADDMOD", "MULMOD", "EXP", "SIGNEXTEND",
+]
+OPCODE_NAMES[0x10:0x1e] = [
+    "LT", "GT", "SLT", "SGT", "EQ", "ISZERO", "AND", "OR", "XOR", "NOT", "BYTE", "SHL", "SHR", "SAR",
+]
+OPCODE_NAMES[0x20] = "SHA3"
+OPCODE_NAMES[0x30:0x40] = [
+    "ADDRESS", "BALANCE", "ORIGIN", "CALLER", "CALLVALUE", "CALLDATALOAD", "CALLDATASIZE", "CALLDATACOPY",
+    "CODESIZE", "CODECOPY", "GASPRICE", "EXTCODESIZE", "EXTCODECOPY", "RETURNDATASIZE", "RETURNDATACOPY",
+    "EXTCODEHASH",
+]
+OPCODE_NAMES[0x40:0x4b] = [
+    "BLOCKHASH", "COINBASE", "TIMESTAMP", "NUMBER", "DIFFICULTY", "GASLIMIT", "CHAINID", "SELFBALANCE",
+    "BASEFEE", "BLOBHASH", "BLOBBASEFEE",
+]
+OPCODE_NAMES[0x50:0x60] = [
+    "POP", "MLOAD", "MSTORE", "MSTORE8", "SLOAD", "SSTORE", "JUMP", "JUMPI", "PC", "MSIZE", "GAS",
+    "JUMPDEST", "TLOAD", "TSTORE", "MCOPY", "PUSH0",
+]
+OPCODE_NAMES[0x60:0x80] = [f"PUSH{n}" for n in range(1, 33)]
+OPCODE_NAMES[0x80:0x90] = [f"DUP{n}" for n in range(1, 17)]
+OPCODE_NAMES[0x90:0xa0] = [f"SWAP{n}" for n in range(1, 17)]
+OPCODE_NAMES[0xa0:0xa5] = ["LOG0", "LOG1", "LOG2", "LOG3", "LOG4"]
+OPCODE_NAMES[0xf0:0xf6] = ["CREATE", "CALL", "CALLCODE", "RETURN", "DELEGATECALL", "CREATE2"]
+OPCODE_NAMES[0xfa] = "STATICCALL"
+OPCODE_NAMES[0xfd] = "REVERT"
+OPCODE_NAMES[0xfe] = "INVALID"
+OPCODE_NAMES[0xff] = "SELFDESTRUCT"
+
+OPCODES = {name: op for op, name in enumerate(OPCODE_NAMES)}
+
+# Bytes to advance past each opcode: 1, plus the immediate for PUSH1..PUSH32
+_STEP = bytes(op - 0x5e if 0x60 <= op <= 0x7f else 1 for op in range(256))
+
+_PUSH1, _PUSH2, _PUSH4 = 0x60, 0x61, 0x63
+# A function dispatcher compares the selector right after pushing it:
+# PUSH4 sel EQ / PUSH4 sel DUP2 EQ (solc), or XOR instead of EQ (vyper).
+# solc drops a selector's leading zero bytes, pushing it with PUSH1-PUSH3;
+# short pushes are mostly plain constants, so those only count in the full
+# dispatcher shape DUP1 PUSHn sel EQ PUSH2 dest JUMPI.
+_SELECTOR_CMP = {0x14, 0x18}
+_DUP1, _DUP2, _EQ, _JUMPI = 0x80, 0x81, 0x14, 0x57
+
+# Opcodes whose presence drives analysis flags
+FLAG_OPCODES = frozenset(
+    OPCODES[name] for name in ("DELEGATECALL", "CREATE", "CREATE2", "CALLCODE")
+)
+
+
+def scan_bytecode(code: bytes, head_size: int = 100) -> dict:
+    """Scan `code` once and return its opcode histogram and positions.
+
+    - histogram: list of 256 counts indexed by opcode byte
+    - first_offsets: {opcode: pc of its first occurrence}
+    - flags: set of FLAG_OPCODES present in the code
+    - head: the first `head_size` opcode bytes in program order
+    - selectors: dispatcher selectors (4-byte ints) in program order
+    - instruction_count: number of instructions decoded
+    """
+    histogram = [0] * 256
+    first_offsets = {}
+    head = bytearray()
+    selectors = {}
+    step = _STEP
+    n = len(code)
+    pc = 0
+    count = 0
+
+    # Collect the head separately so the main loop stays branch-light
+    while pc < n and count < head_size:
+        op = code[pc]
+        if not histogram[op]:
+            first_offsets[op] = pc
+        histogram[op] += 1
+        head.append(op)
+        if _PUSH1 <= op <= _PUSH4:
+            _match_selector(code, pc, op - _PUSH1 + 1, selectors)
+        count += 1
+        pc += step[op]
+
+    while pc < n:
+        op = code[pc]
+        if not histogram[op]:
+            first_offsets[op] = pc
+        histogram[op] += 1
+        if _PUSH1 <= op <= _PUSH4:
+            _match_selector(code, pc, op - _PUSH1 + 1, selectors)
+        count += 1
+        pc += step[op]
+
+    return {
+        "histogram": histogram,
+        "first_offsets": first_offsets,
+        "flags": FLAG_OPCODES.intersection(first_offsets),
+        "head": bytes(head),
+        "selectors": list(selectors),
+        "instruction_count": count,
+    }
+
+
+def _match_selector(code: bytes, pc: int, width: int, selectors: dict):
+    end = pc + 1 + width
+    if width < 4:
+        tail = code[end:end + 5]
+        matched = (
+            pc > 0 and code[pc - 1] == _DUP1 and len(tail) == 5
+            and tail[0] == _EQ and tail[1] == _PUSH2 and tail[4] == _JUMPI
+        )
+    else:
+        nxt = code[end:end + 2]
+        matched = bool(nxt) and (nxt[0] in _SELECTOR_CMP or (nxt[0] == _DUP2 and nxt[1:] and nxt[1] in _SELECTOR_CMP))
+    if matched:
+        # dict keeps first-seen order and drops duplicates; the int is the left-padded selector
+        selectors[int.from_bytes(code[pc + 1:pc + 1 + width], "big")] = None
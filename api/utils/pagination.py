@@ -0,0 +1,46 @@
+"""Keyset (cursor) pagination over (created_at, id), newest first.
+
+A page is fetched with an indexed range condition instead of OFFSET, so
+every page costs the same however deep the client has paged. Cursors are
+opaque to clients: the last row's position, base64-encoded.
+"""
+import base64
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1_000
+
+
+def encode_cursor(created_at, row_id) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) for a cursor; ValueError if it is malformed."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        created_at = parse_datetime(created_at)
+        row_id = uuid.UUID(row_id)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if created_at is None:
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def keyset_page(queryset, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """Rows of `queryset` (a values() queryset including created_at and id)
+    after `cursor`. Returns (rows, next cursor or None on the last page)."""
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=row_id))
+
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
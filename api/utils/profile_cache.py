@@ -0,0 +1,72 @@
+"""Rendered token profile responses, cached per token and profile version.
+
+The version is the profile's `updated_at`, which every profile write bumps
+(bulk writers set it by hand). Entries hold the rendered JSON with its ETag
+and Last-Modified, so a poll is two cache reads; code that updates profiles
+calls `invalidate_profiles` once its transaction has committed.
+
+Entries are keyed by a per-token generation that `invalidate_profiles`
+replaces. A request that read the profile before an invalidation writes its
+rendering under the old generation, where no later read looks, so a slow
+request can't put a stale profile back in the cache.
+
+Analyses run in the worker process: with more than one process, point
+WHITELISTER_PROFILE_CACHE_BACKEND at a shared cache (Redis, Memcached...) so
+invalidations reach the web workers. The per-process default relies on its
+short timeout instead.
+"""
+import uuid
+
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import TokenComplianceProfileSerializer
+
+# Cache alias configured in settings.CACHES
+PROFILE_CACHE_ALIAS = "profiles"
+KEY_PREFIX = "token-profile"
+
+
+def _cache():
+    return caches[PROFILE_CACHE_ALIAS]
+
+
+def _generation_key(address: str) -> str:
+    return f"{KEY_PREFIX}-generation:{address.lower()}"
+
+
+def _key(address: str, generation: str) -> str:
+    return f"{KEY_PREFIX}:{address.lower()}:{generation}"
+
+
+def _generation(address: str) -> str:
+    key = _generation_key(address)
+    generation = _cache().get(key)
+    if generation is None:
+        # Never evicted back to a generation whose entries are still cached
+        _cache().add(key, uuid.uuid4().hex, timeout=None)
+        generation = _cache().get(key)
+    return generation
+
+
+def get_cached_profile(address: str):
+    """(entry, generation): entry is {"body", "etag", "last_modified"} for the
+    token's current profile, or None; pass generation on to `cache_profile`."""
+    generation = _generation(address)
+    return _cache().get(_key(address, generation)), generation
+
+
+def cache_profile(profile, generation: str) -> dict:
+    """Render `profile`, read after `generation` was, and cache it under that generation."""
+    version = int(profile.updated_at.timestamp() * 1_000_000)
+    entry = {
+        "body": JSONRenderer().render(TokenComplianceProfileSerializer(profile).data),
+        "etag": f'"{profile.id.hex[:12]}-{version:x}"',
+        "last_modified": int(profile.updated_at.timestamp()),  # HTTP dates have second precision
+    }
+    _cache().add(_key(profile.token_address, generation), entry)
+    return entry
+
+
+def invalidate_profiles(addresses):
+    _cache().set_many({_generation_key(address): uuid.uuid4().hex for address in addresses}, timeout=None)
@@ -0,0 +1,205 @@
+"""Proxy implementation resolution.
+
+Upgradeable tokens keep their logic behind a DELEGATECALL stub, so analysing
+the stub alone says little. This module finds the implementation address
+(EIP-1167 minimal proxies from the code itself, EIP-1967/EIP-1822/beacon
+proxies from batched storage-slot reads) and analyses the implementation
+through the code-hash cache, so proxies sharing one implementation trigger a
+single analysis.
+"""
+import re
+
+from django.core.cache import caches
+from web3 import Web3
+
+from api.models import TokenComplianceProfile
+from .analysis_cache import ANALYSIS_CACHE_ALIAS, get_cached_analysis
+from .contract import get_bytecodes_for_addresses
+from .contract_analysis import ENGINE_VERSION, analyze_many, code_hash, score_flags
+from .rpc import get_web3
+from .rpc_batch import batch_rpc
+
+# Storage slots checked in order; the beacon slot points at a contract whose
+# implementation() returns the logic address
+IMPLEMENTATION_SLOTS = [
+    ("eip1967", 0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc),
+    ("eip1822", 0xc5f16f0fcc639fa48a6947836d9850f504798523bf8c9a3a87d5876cf622bcf7),
+    ("zeppelinos", 0x7050c9e0f4ca769c69bd3a8ef740bc37934f8e2c036e5a723fd8ee048ed3f8c3),
+    ("eip1967_beacon", 0xa3f0ad74e5423aebfd80d3ef4346578335a9a72aeaee59ff6cb3582b35133d50),
+]
+BEACON_STANDARD = "eip1967_beacon"
+IMPLEMENTATION_SELECTOR = "0x5c60da1b"  # implementation()
+
+# EIP-1167 minimal proxy, and its PUSH0 variant (EIP-7511)
+MINIMAL_PROXY_PATTERNS = [
+    (bytes.fromhex("363d3d373d3d3d363d73"), bytes.fromhex("5af43d82803e903d91602b57fd5bf3")),
+    (bytes.fromhex("365f5f375f5f365f73"), bytes.fromhex("5af43d5f5f3e5f3d91602a57fd5bf3")),
+]
+
+# Evidence note of an upgradeable proxy; the last one recorded tells whether it was upgraded
+IMPLEMENTATION_NOTE = "{standard} proxy, implementation at {implementation}"
+_IMPLEMENTATION_NOTE = re.compile(r" proxy, implementation at (0x[0-9a-f]{40})$")
+
+# Summary of the implementation analysis kept on the proxy's result
+IMPLEMENTATION_FIELDS = ("score", "flags", "evidence", "functions", "selectors", "bytecode_hash")
+
+
+def _cache():
+    return caches[ANALYSIS_CACHE_ALIAS]
+
+
+def minimal_proxy_target(code: bytes):
+    for prefix, suffix in MINIMAL_PROXY_PATTERNS:
+        if len(code) == len(prefix) + 20 + len(suffix) and code.startswith(prefix) and code.endswith(suffix):
+            return "0x" + code[len(prefix):len(prefix) + 20].hex()
+    return None
+
+
+def _word_to_address(word):
+    if not word or word == "0x":
+        return None
+    value = int(word, 16)
+    # A slot holding anything wider than an address is not a pointer
+    if value == 0 or value >> 160:
+        return None
+    return f"0x{value:040x}"
+
+
+def resolve_implementations(codes: dict) -> dict:
+    """Find implementation addresses for {address: code} proxies.
+
+    Returns {address: {"standard": ..., "implementation": ...}} for the
+    proxies that could be resolved.
+    """
+    resolved = {}
+    pending = []
+    for address, code in codes.items():
+        target = minimal_proxy_target(code)
+        if target:
+            resolved[address] = {"standard": "eip1167", "implementation": target}
+        else:
+            pending.append(address)
+
+    requests = [
+        ("eth_getStorageAt", [Web3.to_checksum_address(address), hex(slot), "latest"])
+        for address in pending
+        for _, slot in IMPLEMENTATION_SLOTS
+    ]
+    responses = batch_rpc(get_web3(), requests)
+
+    beacons = {}
+    per_proxy = len(IMPLEMENTATION_SLOTS)
+    for i, address in enumerate(pending):
+        words = responses[i * per_proxy:(i + 1) * per_proxy]
+        for (standard, _), response in zip(IMPLEMENTATION_SLOTS, words):
+            target = _word_to_address(response.get("result"))
+            if not target:
+                continue
+            if standard == BEACON_STANDARD:
+                beacons[address] = target
+            else:
+                resolved[address] = {"standard": standard, "implementation": target}
+            break
+
+    requests = [
+        ("eth_call", [{"to": Web3.to_checksum_address(beacon), "data": IMPLEMENTATION_SELECTOR}, "latest"])
+        for beacon in beacons.values()
+    ]
+    for (address, beacon), response in zip(beacons.items(), batch_rpc(get_web3(), requests)):
+        target = _word_to_address(response.get("result"))
+        if target:
+            resolved[address] = {"standard": BEACON_STANDARD, "implementation": target, "beacon": beacon}
+    return resolved
+
+
+def recorded_implementations(addresses) -> dict:
+    """{address: implementation} named by each token's latest recorded contract analysis."""
+    rows = TokenComplianceProfile.objects.filter(
+        token_address__in=list(addresses), latest_contract_analysis__isnull=False
+    ).values_list("token_address", "latest_contract_analysis__evidence")
+    recorded = {}
+    for address, evidence in rows:
+        for note in evidence or []:
+            match = _IMPLEMENTATION_NOTE.search(note)
+            if match:
+                recorded[address] = match.group(1)
+    return recorded
+
+
+def _analyze_implementations(implementations: set, mapper) -> dict:
+    """Analyse each implementation once; returns {implementation: (code_hash, analysis)}.
+
+    Implementation code is only downloaded when its analysis is not cached.
+    """
+    found = {}
+    to_fetch = []
+    for implementation in implementations:
+        key = _cache().get(f"implementation-code-hash:{implementation}")
+        analysis = get_cached_analysis(key, ENGINE_VERSION) if key else None
+        if analysis is not None:
+            found[implementation] = (key, analysis)
+        else:
+            to_fetch.append(implementation)
+
+    # Implementations without code (self-destructed, not deployed) are skipped
+    codes, _ = get_bytecodes_for_addresses(to_fetch)
+    hashes = {implementation: code_hash(code) for implementation, code in codes.items()}
+    analyses = analyze_many({hashes[i]: code for i, code in codes.items()}, mapper=mapper)
+    for implementation, key in hashes.items():
+        _cache().set(f"implementation-code-hash:{implementation}", key)
+        found[implementation] = (key, analyses[key])
+    return found
+
+
+def merge_implementation(result: dict, implementation: dict, analysis: dict) -> dict:
+    """Fold the implementation's analysis into the proxy's result."""
+    # The stub has no ERC20 selectors of its own; judge the logic contract instead
+    pairs = [
+        (flag, note) for flag, note in zip(result["flags"], result["evidence"])
+        if flag != "nonstandard_transfer"
+    ]
+    if implementation["standard"] != "eip1167":
+        pairs.append(("upgradeable_proxy", IMPLEMENTATION_NOTE.format(**implementation)))
+    seen = {flag for flag, _ in pairs}
+    pairs += [
+        (flag, f"Implementation: {note}") for flag, note in zip(analysis["flags"], analysis["evidence"])
+        if flag not in seen
+    ]
+
+    merged = dict(result)
+    merged["flags"] = [flag for flag, _ in pairs]
+    merged["evidence"] = [note for _, note in pairs]
+    merged["score"] = score_flags(merged["flags"])
+    merged["implementation"] = {
+        **implementation,
+        "analysis": {field: analysis[field] for field in IMPLEMENTATION_FIELDS},
+    }
+    return merged
+
+
+def resolve_proxies(results: dict, codes: dict, mapper=map) -> dict:
+    """Resolve and analyse implementations for every proxy in {address: result}.
+
+    Returns {address: result}, with proxy results merged with their
+    implementation's analysis. Non-proxies and unresolvable proxies are
+    returned unchanged.
+    """
+    proxies = {address: codes[address] for address, result in results.items() if "proxy_detected" in result["flags"]}
+    if not proxies:
+        return results
+
+    resolved = resolve_implementations(proxies)
+    analysed = _analyze_implementations({info["implementation"] for info in resolved.values()}, mapper)
+
+    recorded = recorded_implementations(resolved)
+    merged = dict(results)
+    for address, info in resolved.items():
+        if info["implementation"] not in analysed:
+            continue
+        key, analysis = analysed[info["implementation"]]
+        info["code_hash"] = key
+        previous = recorded.get(address)
+        if previous and previous != info["implementation"]:
+            info["previous_implementation"] = previous
+        merged[address] = merge_implementation(results[address], info, analysis)
+    return merged
@@ -0,0 +1,231 @@
+"""Shared JSON-RPC client.
+
+Every chain call in the app goes through the single Web3 instance returned by
+`get_web3()`, created on first use. Its provider:
+
+- keeps a pooled keep-alive session per endpoint,
+- paces calls with a token bucket shared by all threads (a batch of n calls
+  costs n tokens, as providers bill them),
+- retries transport failures, HTTP 429 and 5xx with jittered backoff, moving
+  on to the next endpoint in ETH_RPC_URLS; an endpoint that keeps failing is
+  benched for a while,
+- records per-endpoint request, error and latency counters (`rpc_stats()`).
+  Provider URLs carry API keys in their path, query or userinfo, so stats and
+  error messages only ever name an endpoint by scheme and host.
+
+JSON-RPC error responses are returned to the caller untouched: they are
+answers, not outages, and callers such as the log fetcher act on them.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from decouple import Csv, config
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3._utils.batching import sort_batch_response_by_response_ids
+from web3.providers.base import JSONBaseProvider
+
+RPC_RATE_LIMIT = config("RPC_RATE_LIMIT", default=25.0, cast=float)  # calls per second
+RPC_BURST = config("RPC_BURST", default=50, cast=int)
+RPC_MAX_RETRIES = config("RPC_MAX_RETRIES", default=3, cast=int)
+RPC_TIMEOUT = config("RPC_TIMEOUT", default=30.0, cast=float)
+RPC_POOL_SIZE = config("RPC_POOL_SIZE", default=20, cast=int)
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 10.0
+# Consecutive failures before an endpoint is benched, and for how long
+FAILURES_BEFORE_COOLDOWN = 3
+COOLDOWN_SECONDS = 30.0
+
+
+def rpc_urls() -> list:
+    urls = config("ETH_RPC_URLS", default="", cast=Csv())
+    if not urls:
+        urls = [config("ETH_RPC_URL")]
+    return urls
+
+
+def redact_url(url: str) -> str:
+    """Scheme and host of `url`, without the userinfo, path and query that hold credentials."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return f"{parts.scheme}://{host}"
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Callers may overdraw; they then wait off the debt."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cost: int = 1):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class Endpoint:
+    def __init__(self, url: str, pool_size: int):
+        self.url = url
+        self.label = redact_url(url)
+        # Parts of the URL that may hold credentials, longest first
+        parts = urlsplit(url)
+        secrets = [url, parts.path + (f"?{parts.query}" if parts.query else ""), parts.query,
+                   parts.netloc.rpartition("@")[0]]
+        self.secrets = sorted({secret for secret in secrets if secret.strip("/")}, key=len, reverse=True)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.last_error = None
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+
+    def record(self, calls: int, latency: float, error=None):
+        with self.lock:
+            self.requests += 1
+            self.calls += calls
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            if error is None:
+                self.consecutive_failures = 0
+                return
+            self.errors += 1
+            self.last_error = self.redact(str(error))[:200]
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+                self.benched_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def redact(self, message: str) -> str:
+        for secret in self.secrets:
+            message = message.replace(secret, self.label if secret == self.url else "<redacted>")
+        return message
+
+    def available(self) -> bool:
+        return self.benched_until <= time.monotonic()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "url": self.label,
+                "requests": self.requests,
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency_ms": round(self.latency_total / self.requests * 1e3, 2) if self.requests else None,
+                "max_latency_ms": round(self.latency_max * 1e3, 2),
+                "last_error": self.last_error,
+                "available": self.available(),
+            }
+
+
+class RetryableResponse(Exception):
+    pass
+
+
+class FailoverProvider(JSONBaseProvider):
+    def __init__(self, urls: list, rate: float = RPC_RATE_LIMIT, burst: int = RPC_BURST,
+                 max_retries: int = RPC_MAX_RETRIES, timeout: float = RPC_TIMEOUT, pool_size: int = RPC_POOL_SIZE):
+        super().__init__()
+        self.endpoints = [Endpoint(url, pool_size) for url in urls]
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def _ordered_endpoints(self) -> list:
+        # Configured order, benched endpoints last (still tried if all are benched)
+        return sorted(self.endpoints, key=lambda e: not e.available())
+
+    def _post(self, body: bytes, calls: int) -> bytes:
+        error, failed = None, None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+            for endpoint in self._ordered_endpoints():
+                self.bucket.acquire(calls)
+                start = time.perf_counter()
+                try:
+                    response = endpoint.session.post(
+                        endpoint.url, data=body, timeout=self.timeout,
+                        headers={"Content-Type": "application/json"},
+                    )
+                    if response.status_code == 429 or response.status_code >= 500:
+                        raise RetryableResponse(f"HTTP {response.status_code} from {endpoint.label}")
+                    response.raise_for_status()
+                except (requests.RequestException, RetryableResponse) as e:
+                    endpoint.record(calls, time.perf_counter() - start, e)
+                    error, failed = e, endpoint
+                    continue
+                endpoint.record(calls, time.perf_counter() - start)
+                return response.content
+        # Transport errors quote the URL; don't let the key reach callers' messages
+        raise RetryableResponse(failed.redact(str(error))) from error
+
+    def make_request(self, method, params):
+        return self.decode_rpc_response(self._post(self.encode_rpc_request(method, params), 1))
+
+    def make_batch_request(self, batch_requests):
+        body = self.encode_batch_rpc_request(batch_requests)
+        response = self.decode_rpc_response(self._post(body, len(batch_requests)))
+        if not isinstance(response, list):
+            # RPC errors return only one response with the error object
+            return response
+        return sort_batch_response_by_response_ids(response)
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            return "result" in self.make_request("web3_clientVersion", [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+
+    def stats(self) -> list:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+_web3 = None
+_web3_lock = threading.Lock()
+
+
+def get_web3() -> Web3:
+    """The shared Web3 client, built from the environment on first use."""
+    global _web3
+    if _web3 is None:
+        with _web3_lock:
+            if _web3 is None:
+                _web3 = Web3(FailoverProvider(rpc_urls()))
+    return _web3
+
+
+def configure_web3(urls: list, **options) -> Web3:
+    """Replace the shared client, e.g. to point it at a local stand-in node."""
+    global _web3
+    with _web3_lock:
+        _web3 = Web3(FailoverProvider(urls, **options))
+    return _web3
+
+
+def rpc_stats() -> list:
+    """Per-endpoint counters of the shared client ([] before its first use)."""
+    return _web3.provider.stats() if _web3 is not None else []
@@ -0,0 +1,27 @@
+DEFAULT_BATCH_SIZE = 100
+
+
+def batch_rpc(w3, requests: list, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """Send `(method, params)` pairs as JSON-RPC batches.
+
+    Returns one raw response per request, in order. Each response has either a
+    "result" or an "error" key, so one failing call doesn't sink the others.
+    """
+    responses = []
+    for start in range(0, len(requests), batch_size):
+        chunk = requests[start:start + batch_size]
+        response = w3.provider.make_batch_request(chunk)
+        if isinstance(response, list):
+            responses.extend(response)
+        else:
+            # The provider rejected the whole batch with a single error object
+            error = response.get("error") or {"message": "Invalid batch response"}
+            responses.extend({"error": error} for _ in chunk)
+    return responses
+
+
+def rpc_error_message(response: dict) -> str:
+    error = response.get("error")
+    if isinstance(error, dict):
+        return error.get("message", str(error))
+    return str(error)
@@ -0,0 +1,127 @@
+"""Versioned, declarative risk scoring.
+
+A policy is plain data: points deducted per contract flag and per holder
+anomaly, penalties for holder metrics past a threshold, and the score bands
+that map to recommendations. Scores are computed only from what analyses
+already stored, so a policy change is applied by re-scoring
+(`manage.py rescore_tokens`), never by re-fetching chain data.
+
+Add a new version instead of editing a published one, so stored scores can
+be traced back to the rules that produced them.
+"""
+import numpy as np
+from decouple import config
+
+POLICIES = {
+    # The original inline rules: 15 points per contract flag, "go" from 70
+    "1": {
+        "base": 100,
+        "flag_penalties": {},
+        "default_flag_penalty": 15,
+        "anomaly_penalties": {},
+        "metric_penalties": [],
+        "bands": [(70, "go"), (0, "enhanced_due_diligence")],
+    },
+    # Adds holder concentration, and a no-go band for the worst profiles
+    "2": {
+        "base": 100,
+        "flag_penalties": {"obfuscated_code": 25, "deprecated_callcode_used": 20},
+        "default_flag_penalty": 15,
+        "anomaly_penalties": {"majority_owned_by_one_wallet": 20, "whale_owned": 10, "low_distribution": 5},
+        # (holder metric, threshold, points): deducted when the metric is above the threshold
+        "metric_penalties": [("hhi", 2_500, 10), ("gini", 0.98, 5)],
+        "bands": [(70, "go"), (40, "enhanced_due_diligence"), (0, "no_go")],
+    },
+    # Adds the transfer-graph anomalies (wash trading, sybil distribution)
+    "3": {
+        "base": 100,
+        "flag_penalties": {"obfuscated_code": 25, "deprecated_callcode_used": 20},
+        "default_flag_penalty": 15,
+        "anomaly_penalties": {
+            "majority_owned_by_one_wallet": 20, "whale_owned": 10, "low_distribution": 5,
+            "circular_transfers": 15, "sybil_distribution": 15, "closed_trading_ring": 10,
+        },
+        "metric_penalties": [("hhi", 2_500, 10), ("gini", 0.98, 5)],
+        "bands": [(70, "go"), (40, "enhanced_due_diligence"), (0, "no_go")],
+    },
+}
+
+SCORING_POLICY_VERSION = config("SCORING_POLICY_VERSION", default="3")
+
+# Holder metrics policies may use, as paths into the holderAnalysis module
+HOLDER_METRICS = {
+    "centralization_score": ("centralization_score",),
+    "gini": ("distribution", "gini"),
+    "hhi": ("distribution", "hhi"),
+    "nakamoto_coefficient": ("distribution", "nakamoto_coefficient"),
+    "top_1_percent_share": ("distribution", "top_1_percent_share"),
+    "top_10_percent_share": ("distribution", "top_10_percent_share"),
+}
+
+
+def get_policy(version: str = None) -> dict:
+    version = version or SCORING_POLICY_VERSION
+    if version not in POLICIES:
+        raise ValueError(f"Unknown scoring policy: {version} (available: {', '.join(POLICIES)})")
+    return POLICIES[version]
+
+
+def _penalties(lists: list, penalties: dict, default: float = 0.0) -> np.ndarray:
+    """Summed penalty per row, for a list of label lists."""
+    lengths = np.fromiter((len(labels) for labels in lists), dtype=np.int64, count=len(lists))
+    if not lengths.sum():
+        return np.zeros(len(lists))
+    labels = np.array([label for row in lists for label in row])
+    vocabulary, inverse = np.unique(labels, return_inverse=True)
+    weights = np.array([penalties.get(label, default) for label in vocabulary], dtype=float)[inverse]
+    return np.bincount(np.repeat(np.arange(len(lists)), lengths), weights=weights, minlength=len(lists))
+
+
+def score_arrays(flags: list, anomalies: list, metrics: dict, policy: dict):
+    """Scores and recommendations for many profiles at once.
+
+    `flags` and `anomalies` hold one label list per profile; `metrics` maps a
+    metric name to a float array (NaN where the profile has no value).
+    Returns (scores array, list of recommendations).
+    """
+    deducted = _penalties(flags, policy["flag_penalties"], policy["default_flag_penalty"])
+    deducted += _penalties(anomalies, policy["anomaly_penalties"])
+    for metric, threshold, points in policy["metric_penalties"]:
+        values = metrics.get(metric)
+        if values is not None:
+            with np.errstate(invalid="ignore"):
+                deducted += np.where(values > threshold, points, 0)
+    scores = np.clip(policy["base"] - deducted, 0, 100)
+
+    # Bands are listed best first; search them lowest first
+    minimums = np.array([minimum for minimum, _ in reversed(policy["bands"])], dtype=float)
+    labels = [label for _, label in reversed(policy["bands"])]
+    bands = np.maximum(np.searchsorted(minimums, scores, side="right") - 1, 0)
+    return scores, [labels[band] for band in bands]
+
+
+def holder_metrics(holder_analysis: dict) -> dict:
+    metrics = {}
+    for name, path in HOLDER_METRICS.items():
+        value = holder_analysis or {}
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, (int, float)):
+            metrics[name] = float(value)
+    return metrics
+
+
+def score_profile(flags: list, holder_analysis: dict = None, policy: dict = None):
+    """(score, recommendation) for one profile's contract flags and holder analysis."""
+    policy = policy or get_policy()
+    holder_analysis = holder_analysis or {}
+    metrics = {name: np.array([value]) for name, value in holder_metrics(holder_analysis).items()}
+    scores, recommendations = score_arrays(
+        [list(flags or [])], [list(holder_analysis.get("anomalies") or [])], metrics, policy
+    )
+    return float(scores[0]), recommendations[0]
+
+
+def score_flags(flags: list, policy: dict = None) -> int:
+    """Contract-only score, as reported by contract analysis."""
+    return int(score_profile(flags, policy=policy)[0])
@@ -0,0 +1,138 @@
+"""Memory-mapped 4-byte function signature index.
+
+File layout (all integers big-endian):
+
+    b"WLSIG\\x01\\x00\\x00"          magic
+    uint32 count
+    count * 4 bytes                 selectors, sorted ascending (repeats on collisions)
+    (count + 1) * uint32            offsets of each signature in the text blob
+    text blob                       UTF-8 signatures, concatenated
+
+Lookups binary-search the mapped selector table, so they are O(log n) and the
+file is shared through the page cache instead of loaded into every worker.
+"""
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from decouple import config
+from web3 import Web3
+
+MAGIC = b"WLSIG\x01\x00\x00"
+_HEADER = struct.Struct(">8sI")
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parents[2] / "data" / "signatures.idx"
+
+# Used when no index file has been built
+KNOWN_SELECTORS = {
+    0xa9059cbb: "transfer(address,uint256)",
+    0x095ea7b3: "approve(address,uint256)",
+    0x23b872dd: "transferFrom(address,address,uint256)",
+    0x40c10f19: "mint(address,uint256)",
+    0x8da5cb5b: "owner()",
+    0xf2fde38b: "transferOwnership(address)",
+    0x715018a6: "renounceOwnership()",
+    0xdd62ed3e: "allowance(address,address)",
+}
+
+
+def selector_for(signature: str) -> int:
+    return int.from_bytes(Web3.keccak(text=signature)[:4], "big")
+
+
+class SignatureIndex:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a signature index")
+        self._selectors_at = _HEADER.size
+        self._offsets_at = self._selectors_at + 4 * self.count
+        self._blob_at = self._offsets_at + 4 * (self.count + 1)
+
+    def __len__(self):
+        return self.count
+
+    def _selector(self, i: int) -> bytes:
+        start = self._selectors_at + 4 * i
+        return self._mm[start:start + 4]
+
+    def _signature(self, i: int) -> str:
+        start, end = struct.unpack_from(">II", self._mm, self._offsets_at + 4 * i)
+        return self._mm[self._blob_at + start:self._blob_at + end].decode()
+
+    def lookup(self, selector: int) -> list:
+        """All known signatures for `selector` (several on hash collisions)."""
+        key = selector.to_bytes(4, "big")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._selector(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < self.count and self._selector(lo) == key:
+            found.append(self._signature(lo))
+            lo += 1
+        return found
+
+    def close(self):
+        self._mm.close()
+
+
+def build_signature_index(entries, path) -> int:
+    """Write `(selector, signature)` pairs to `path`; returns the entry count."""
+    rows = sorted(set(entries))
+    blob = bytearray()
+    offsets = [0]
+    for _, signature in rows:
+        blob += signature.encode()
+        offsets.append(len(blob))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(rows)))
+        f.write(b"".join(selector.to_bytes(4, "big") for selector, _ in rows))
+        f.write(struct.pack(f">{len(offsets)}I", *offsets))
+        f.write(blob)
+    # Atomic swap so running workers never map a half-written file
+    os.replace(tmp, path)
+    return len(rows)
+
+
+_index = None
+# Path found missing, so lookups don't stat it again on every call
+_missing_path = None
+
+
+def get_signature_index():
+    """Process-wide index, opened lazily; None when no index file exists.
+
+    A missing file is remembered for the process: restart workers after
+    building the index.
+    """
+    global _index, _missing_path
+    if _index is None:
+        path = Path(config("SIGNATURE_INDEX_PATH", default=str(DEFAULT_INDEX_PATH)))
+        if path == _missing_path:
+            return None
+        if not path.exists():
+            _missing_path = path
+            return None
+        _index = SignatureIndex(path)
+    return _index
+
+
+def resolve_selector(selector: int) -> list:
+    index = get_signature_index()
+    if index is not None:
+        found = index.lookup(selector)
+        if found:
+            return found
+    known = KNOWN_SELECTORS.get(selector)
+    return [known] if known else []
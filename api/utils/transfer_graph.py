@@ -0,0 +1,343 @@
+"""Wash-trading and sybil signals from the Transfer graph.
+
+Transfers (log archive rows) become a CSR adjacency: addresses are interned
+to dense ids, `indptr[i]:indptr[i + 1]` slices `indices` to the distinct
+recipients of address i, and `counts` holds the transfers on each edge.
+Mints, burns and self-transfers are left out. Passes over it:
+
+    short cycles      2- and 3-cycles (a -> b -> a, a -> b -> c -> a); a large
+                      share of transfers on cycle edges is circular trading
+    degree outliers   senders / recipients with far more counterparties than
+                      the token's typical address (robust z-score)
+    sybil fan-out     a hub funds many fresh addresses that all forward to
+                      one collector
+    rings             small strongly-connected components of ordinary
+                      addresses that mostly trade among themselves
+
+Hubs (pools, routers, exchanges: more than HUB_DEGREE counterparties) are
+left out of the cycle and ring passes; every trader connects through them,
+so with them in everything would be one component.
+"""
+import numpy as np
+from decouple import config
+
+from .clustering import ADDRESS_DTYPE, ZERO_ADDRESS, address_column, raw_to_address
+from .log_archive import read_range
+
+HUB_DEGREE = config("GRAPH_HUB_DEGREE", default=1_000, cast=int)
+# Share of transfers on 2/3-cycle edges above which trading counts as circular
+CIRCULAR_SHARE = 0.05
+# Counterparties before a degree can be an outlier, and the robust z-score it needs
+MIN_OUTLIER_DEGREE = 50
+OUTLIER_Z = 10.0
+# Fresh addresses a hub must funnel into one collector, and their share of its recipients
+MIN_SYBILS = 20
+SYBIL_SHARE = 0.5
+# Members of a ring, and the share of their transfers that stays inside it;
+# larger components are ordinary trading, not a closed group
+MIN_RING_SIZE = 3
+MAX_RING_SIZE = 100
+RING_INTERNAL_SHARE = 0.5
+# Two-hop paths expanded at once when looking for 3-cycles
+PATH_CHUNK = 2_000_000
+# Entries listed per finding
+FINDINGS_SHOWN = 5
+
+
+class TransferGraph:
+    """Directed transfer graph in CSR form (see module docstring)."""
+
+    def __init__(self, addresses: np.ndarray, indptr: np.ndarray, indices: np.ndarray, counts: np.ndarray):
+        self.addresses = addresses
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+
+    @classmethod
+    def from_transfers(cls, transfers: np.ndarray):
+        return cls.from_columns(address_column(transfers["sender"]), address_column(transfers["recipient"]))
+
+    @classmethod
+    def from_archive(cls, token: str, from_block: int, to_block: int):
+        """From the archived Transfers of [from_block, to_block]; only the
+        address columns are copied out of the partitions."""
+        senders, recipients = [], []
+        for rows in read_range(token, from_block, to_block):
+            senders.append(address_column(rows["sender"]))
+            recipients.append(address_column(rows["recipient"]))
+        if not senders:
+            return cls.from_columns(np.zeros(0, ADDRESS_DTYPE), np.zeros(0, ADDRESS_DTYPE))
+        return cls.from_columns(np.concatenate(senders), np.concatenate(recipients))
+
+    @classmethod
+    def from_columns(cls, sender: np.ndarray, recipient: np.ndarray):
+        """From aligned V20 sender and recipient arrays."""
+        addresses, ids = np.unique(np.concatenate([sender, recipient]), return_inverse=True)
+        ids = ids.astype(np.int64)
+        src, dst = ids[:len(sender)], ids[len(sender):]
+
+        zero = np.flatnonzero(addresses == ZERO_ADDRESS)
+        keep = (src != dst) & ~np.isin(src, zero) & ~np.isin(dst, zero)
+        edges, counts = np.unique(src[keep] * len(addresses) + dst[keep], return_counts=True)
+        return cls.from_edges(addresses, edges // len(addresses), edges % len(addresses), counts)
+
+    @classmethod
+    def from_edges(cls, addresses: np.ndarray, src: np.ndarray, dst: np.ndarray, counts: np.ndarray):
+        """From edge arrays sorted by (src, dst), without duplicates."""
+        indptr = np.zeros(len(addresses) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(addresses)), out=indptr[1:])
+        return cls(addresses, indptr, dst.astype(np.int64), counts.astype(np.int64))
+
+    @property
+    def size(self) -> int:
+        return len(self.addresses)
+
+    def sources(self) -> np.ndarray:
+        """Source id of every edge, aligned with `indices`."""
+        return np.repeat(np.arange(self.size), np.diff(self.indptr))
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def in_degree(self) -> np.ndarray:
+        return np.bincount(self.indices, minlength=self.size)
+
+    def edge_keys(self) -> np.ndarray:
+        """src * size + dst per edge; sorted, as edges are stored in that order."""
+        return self.sources() * self.size + self.indices
+
+    def subgraph(self, keep: np.ndarray):
+        """The graph without edges touching nodes where `keep` is False (ids unchanged)."""
+        src = self.sources()
+        edge = keep[src] & keep[self.indices]
+        return TransferGraph.from_edges(self.addresses, src[edge], self.indices[edge], self.counts[edge])
+
+
+def _neighbours(graph: TransferGraph, nodes: np.ndarray):
+    """(position of the node in `nodes`, neighbour) for every out-edge of `nodes`."""
+    starts, lengths = graph.indptr[nodes], graph.out_degree()[nodes]
+    owner = np.repeat(np.arange(len(nodes)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner, graph.indices[np.repeat(starts, lengths) + offsets]
+
+
+def short_cycles(graph: TransferGraph) -> dict:
+    """Count 2- and 3-cycles; returns the counts and a mask of edges on any of them."""
+    keys = graph.edge_keys()
+    src, dst, n = graph.sources(), graph.indices, graph.size
+    on_cycle = np.zeros(len(keys), dtype=bool)
+
+    def mark(a, b):
+        on_cycle[np.searchsorted(keys, a * n + b)] = True
+
+    def contains(a, b):
+        found = np.minimum(np.searchsorted(keys, a * n + b), max(len(keys) - 1, 0))
+        return keys[found] == a * n + b if len(keys) else np.zeros(len(a), dtype=bool)
+
+    back = contains(dst, src)
+    mark(src[back], dst[back])
+    two = int(back.sum()) // 2
+
+    # Each 3-cycle is counted once, from its smallest id: u -> v -> w -> u with u < v, u < w
+    three = 0
+    forward = np.flatnonzero(src < dst)
+    paths = np.cumsum(graph.out_degree()[dst[forward]])
+    splits = np.searchsorted(paths, np.arange(PATH_CHUNK, paths[-1] if len(paths) else 0, PATH_CHUNK))
+    bounds = np.unique(np.r_[0, splits, len(forward)])
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        u, v = src[forward[lo:hi]], dst[forward[lo:hi]]
+        owner, w = _neighbours(graph, v)
+        u, v = u[owner], v[owner]
+        closing = (w > u) & contains(w, u)
+        u, v, w = u[closing], v[closing], w[closing]
+        three += len(u)
+        mark(u, v)
+        mark(v, w)
+        mark(w, u)
+    return {"two": two, "three": three, "edges": on_cycle}
+
+
+def degree_outliers(degree: np.ndarray) -> np.ndarray:
+    """Ids whose degree is far above the typical one (median / MAD z-score)."""
+    active = degree[degree > 0]
+    if not len(active):
+        return np.zeros(0, dtype=np.int64)
+    median = np.median(active)
+    spread = max(1.4826 * np.median(np.abs(active - median)), 1.0)
+    outliers = np.flatnonzero((degree >= MIN_OUTLIER_DEGREE) & ((degree - median) / spread >= OUTLIER_Z))
+    return outliers[np.argsort(-degree[outliers], kind="stable")]
+
+
+def sybil_hubs(graph: TransferGraph) -> list:
+    """(hub, collector, fresh addresses) where a hub's fresh recipients (funded
+    by it alone, sending to one address) mostly forward to the same collector.
+
+    Collectors that pass funds on to many addresses themselves (pools, whose
+    one-off buyers sell back into them) don't count.
+    """
+    in_degree, out_degree = graph.in_degree(), graph.out_degree()
+    src, dst = graph.sources(), graph.indices
+    # The single destination of each address with out-degree 1
+    single = np.full(graph.size, -1, dtype=np.int64)
+    single[src[out_degree[src] == 1]] = dst[out_degree[src] == 1]
+
+    fresh = (in_degree[dst] == 1) & (single[dst] >= 0)
+    hub, collector = src[fresh], single[dst[fresh]]
+    pairs, funnelled = np.unique(hub * graph.size + collector, return_counts=True)
+    hub, collector = pairs // graph.size, pairs % graph.size
+    found = (
+        (funnelled >= MIN_SYBILS) & (funnelled >= SYBIL_SHARE * out_degree[hub])
+        & (hub != collector) & (out_degree[collector] < MIN_OUTLIER_DEGREE)
+    )
+    order = np.argsort(-funnelled[found], kind="stable")
+    return list(zip(hub[found][order].tolist(), collector[found][order].tolist(), funnelled[found][order].tolist()))
+
+
+def _trim(graph: TransferGraph) -> np.ndarray:
+    """Nodes that can be on a cycle: repeatedly drop nodes without in- or out-edges."""
+    src, dst = graph.sources(), graph.indices
+    alive = np.ones(graph.size, dtype=bool)
+    while True:
+        edge = alive[src] & alive[dst]
+        has_out = np.bincount(src[edge], minlength=graph.size) > 0
+        has_in = np.bincount(dst[edge], minlength=graph.size) > 0
+        still = alive & has_out & has_in
+        if np.array_equal(still, alive):
+            return alive
+        alive = still
+
+
+def strongly_connected_components(graph: TransferGraph) -> np.ndarray:
+    """Component label per node (-1 for nodes on no cycle), by iterative Tarjan
+    over the nodes left after trimming."""
+    alive = _trim(graph)
+    labels = np.full(graph.size, -1, dtype=np.int64)
+    if not alive.any():
+        return labels
+    indptr, indices = graph.indptr.tolist(), graph.indices.tolist()
+    alive_list = alive.tolist()
+    index = [-1] * graph.size
+    low = [0] * graph.size
+    on_stack = bytearray(graph.size)
+    stack, members = [], []
+    counter = component = 0
+
+    for root in np.flatnonzero(alive).tolist():
+        if index[root] >= 0:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, indptr[root])]
+        while work:
+            node, position = work[-1]
+            end = indptr[node + 1]
+            while position < end:
+                nxt = indices[position]
+                position += 1
+                if not alive_list[nxt]:
+                    continue
+                if index[nxt] < 0:
+                    work[-1] = (node, position)
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = 1
+                    work.append((nxt, indptr[nxt]))
+                    break
+                if on_stack[nxt] and index[nxt] < low[node]:
+                    low[node] = index[nxt]
+            else:
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        members.append((member, component))
+                        if member == node:
+                            break
+                    component += 1
+
+    if members:
+        nodes, components = np.array(members, dtype=np.int64).T
+        labels[nodes] = components
+    return labels
+
+
+def trading_rings(graph: TransferGraph, labels: np.ndarray):
+    """Components of MIN_RING_SIZE to MAX_RING_SIZE addresses that send mostly
+    to each other: (labels, sizes, internal shares), largest first.
+
+    `graph` should be the full graph, so transfers to hubs count as leaving.
+    """
+    src, dst = graph.sources(), graph.indices
+    sizes = np.bincount(labels[labels >= 0])
+    grouped = labels[src] >= 0
+    inside = grouped & (labels[src] == labels[dst])
+    sent = np.bincount(labels[src[grouped]], weights=graph.counts[grouped], minlength=len(sizes))
+    internal = np.bincount(labels[src[inside]], weights=graph.counts[inside], minlength=len(sizes))
+    share = internal / np.maximum(sent, 1)
+
+    rings = np.flatnonzero((sizes >= MIN_RING_SIZE) & (sizes <= MAX_RING_SIZE) & (share >= RING_INTERNAL_SHARE))
+    rings = rings[np.argsort(-sizes[rings], kind="stable")]
+    return rings, sizes[rings], share[rings]
+
+
+def analyze_transfer_graph(graph: TransferGraph) -> dict:
+    """Findings for a token's transfer graph, with the anomalies they raise."""
+    out_degree, in_degree = graph.out_degree(), graph.in_degree()
+    hubs = out_degree + in_degree > HUB_DEGREE
+    core = graph.subgraph(~hubs)
+
+    cycles = short_cycles(core)
+    transfers_total = int(graph.counts.sum())
+    cyclic_share = float(core.counts[cycles["edges"]].sum() / transfers_total) if transfers_total else 0.0
+    sybils = sybil_hubs(graph)
+    components = strongly_connected_components(core)
+    component_sizes = np.bincount(components[components >= 0])
+    rings, ring_sizes, ring_shares = trading_rings(graph, components)
+
+    anomalies = []
+    if cyclic_share >= CIRCULAR_SHARE:
+        anomalies.append("circular_transfers")
+    if sybils:
+        anomalies.append("sybil_distribution")
+    if len(rings):
+        anomalies.append("closed_trading_ring")
+
+    def listed(ids, degree):
+        return [{"address": raw_to_address(graph.addresses[i]), "degree": int(degree[i])} for i in ids[:FINDINGS_SHOWN]]
+
+    return {
+        "addresses": graph.size,
+        "edges": len(graph.indices),
+        "transfers": transfers_total,
+        "hubs": int(hubs.sum()),
+        "cycles": {"two": cycles["two"], "three": cycles["three"], "transfer_share": round(cyclic_share, 4)},
+        "fan_out_outliers": listed(degree_outliers(out_degree), out_degree),
+        "fan_in_outliers": listed(degree_outliers(in_degree), in_degree),
+        "sybil_hubs": [
+            {
+                "hub": raw_to_address(graph.addresses[hub]),
+                "collector": raw_to_address(graph.addresses[collector]),
+                "addresses": count,
+            }
+            for hub, collector, count in sybils[:FINDINGS_SHOWN]
+        ],
+        "cyclic_components": int((component_sizes > 1).sum()),
+        "largest_cyclic_component": int(component_sizes.max(initial=0)),
+        "rings": [
+            {
+                "size": int(size),
+                "internal_share": round(float(share), 4),
+                "addresses": [
+                    raw_to_address(graph.addresses[i]) for i in np.flatnonzero(components == ring)[:FINDINGS_SHOWN]
+                ],
+            }
+            for ring, size, share in zip(rings[:FINDINGS_SHOWN], ring_sizes, ring_shares)
+        ],
+        "anomalies": anomalies,
+    }
@@ -0,0 +1,33 @@
+"""Decoding of ERC20 Transfer logs into balance deltas."""
+from collections import defaultdict
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def apply_transfer_logs(balances: defaultdict, logs) -> None:
+    """Add one chunk of Transfer logs to {raw 20-byte address: delta}.
+
+    Addresses stay as raw bytes sliced from the topics; nothing is hashed or
+    hex-formatted per log. Logs that are not ERC20 Transfers are skipped.
+    """
+    for log in logs:
+        topics = log["topics"]
+        data = log["data"]
+        # ERC721 Transfer has the token id as a 4th topic and no data
+        if len(topics) != 3 or len(data) != 32:
+            continue
+        amount = int.from_bytes(data, "big")
+        # bytes() first: slicing HexBytes builds a new HexBytes, several times slower
+        balances[bytes(topics[1])[12:]] -= amount
+        balances[bytes(topics[2])[12:]] += amount
+
+
+def apply_transfer_rows(balances: defaultdict, rows) -> None:
+    """Same as apply_transfer_logs, for archived rows (see log_archive.TRANSFER_DTYPE)."""
+    senders = rows["sender"].tobytes()
+    recipients = rows["recipient"].tobytes()
+    amounts = rows["amount"].tobytes()
+    for i in range(len(rows)):
+        amount = int.from_bytes(amounts[i * 32:i * 32 + 32], "big")
+        balances[senders[i * 20:i * 20 + 20]] -= amount
+        balances[recipients[i * 20:i * 20 + 20]] += amount
@@ -1,31 +1,69 @@
+import uuid
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 
-from .models import TokenComplianceProfile, ContractAnalysisResult, HolderAnalysisResult
+from .models import AnalysisJob, TokenComplianceProfile, ContractAnalysisResult, HolderAnalysisResult
 from .serializers import TokenComplianceProfileSerializer, HolderAnalysisResultSerializer
-from .utils.contract import fetch_token_metadata
-from .utils.contract_analysis import run_contract_analysis
-from .utils.contract import get_bytecode_for_address
-from .utils.holder_analysis import analyze_token_holders
+from .utils.contract import fetch_token_metadata, fetch_token_metadata_many
+from .utils.holder_analysis import analyze_watchlist
+from .utils.jobs import schedule_graph_refreshes, submit_job
+from .utils.export import EXPORTS, FORMATS, stream_export
+from .utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from .utils.profile_cache import cache_profile, get_cached_profile
+from .utils.rpc import rpc_stats
+from .utils.batch_analysis import MAX_BATCH_TOKENS, run_batch_contract_analysis
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from web3 import Web3
+
 
-import hashlib
+MAX_BULK_REGISTER = 10_000
+MAX_WATCHLIST_TOKENS = 5_000
 
+def _new_profile(address: str, meta: dict) -> TokenComplianceProfile:
+    # Token metadata is attacker-controlled; clip it to the column sizes
+    return TokenComplianceProfile(
+        token_address=address,
+        name=(meta["name"] or "")[:128] or None,
+        symbol=(meta["symbol"] or "")[:32] or None,
+        decimals=meta["decimals"],
+        risk_score=0.0,
+        recommendation="pending",
+        flags=[],
+        modules={}
+    )
 
 class TokenProfileView(APIView):
     def get(self, request, address):
         address = address.lower()
-        profile = TokenComplianceProfile.objects.filter(token_address__iexact=address).first()
-        if profile:
-            serializer = TokenComplianceProfileSerializer(profile)
-            return Response(serializer.data)
-        return Response({"error": "Token not found"}, status=status.HTTP_404_NOT_FOUND)
+        # Dashboards poll this; serve the cached rendering and honour conditional requests
+        entry, generation = get_cached_profile(address)
+        if entry is None:
+            profile = TokenComplianceProfile.objects.filter(token_address=address).first()
+            if not profile:
+                return Response({"error": "Token not found"}, status=status.HTTP_404_NOT_FOUND)
+            entry = cache_profile(profile, generation)
+
+        response = get_conditional_response(request, etag=entry["etag"], last_modified=entry["last_modified"])
+        if response is None:
+            response = HttpResponse(entry["body"], content_type="application/json")
+        response["ETag"] = entry["etag"]
+        response["Last-Modified"] = http_date(entry["last_modified"])
+        # Clients may keep the response but must revalidate it
+        response["Cache-Control"] = "no-cache"
+        return response
 
     def post(self, request, address):
         address = address.lower()
 
         # Skip if already exists
-        existing = TokenComplianceProfile.objects.filter(token_address__iexact=address).first()
+        existing = TokenComplianceProfile.objects.filter(token_address=address).first()
         if existing:
             serializer = TokenComplianceProfileSerializer(existing)
             return Response(serializer.data)
@@ -35,36 +73,111 @@ class TokenProfileView(APIView):
         except Exception as e:
             return Response({"error": f"Unable to fetch token metadata: {str(e)}"}, status=400)
 
-        profile = TokenComplianceProfile.objects.create(
-            token_address=address,
-            name=meta["name"],
-            symbol=meta["symbol"],
-            decimals=meta["decimals"],
-            risk_score=0.0,
-            recommendation="pending",
-            flags=[],
-            modules={}
-        )
+        profile = _new_profile(address, meta)
+        profile.save()
 
         serializer = TokenComplianceProfileSerializer(profile)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+class TokenBulkRegisterView(APIView):
+    def post(self, request):
+        addresses = request.data.get("addresses")
+        if not isinstance(addresses, list) or not addresses:
+            return Response({"error": "Provide a non-empty addresses list"}, status=400)
+        if len(addresses) > MAX_BULK_REGISTER:
+            return Response({"error": f"At most {MAX_BULK_REGISTER} addresses per request"}, status=400)
+
+        invalid = [a for a in addresses if not isinstance(a, str) or not Web3.is_address(a)]
+        if invalid:
+            return Response({"error": "Invalid addresses", "addresses": invalid}, status=400)
+        addresses = list(dict.fromkeys(a.lower() for a in addresses))
+
+        existing = set(
+            TokenComplianceProfile.objects.filter(token_address__in=addresses).values_list("token_address", flat=True)
+        )
+        new = [a for a in addresses if a not in existing]
+
+        try:
+            metadata, errors = fetch_token_metadata_many(new)
+        except Exception as e:
+            return Response({"error": f"Unable to fetch token metadata: {str(e)}"}, status=502)
+
+        profiles = [_new_profile(address, metadata[address]) for address in new if address in metadata]
+        # A concurrent registration of the same address is simply skipped
+        TokenComplianceProfile.objects.bulk_create(profiles, batch_size=1000, ignore_conflicts=True)
+
+        return Response({
+            "created": [p.token_address for p in profiles],
+            "existing": sorted(existing),
+            "errors": errors,
+        }, status=status.HTTP_201_CREATED if profiles else 200)
+
+TOKEN_LIST_FIELDS = ("id", "token_address", "name", "symbol", "risk_score", "recommendation", "created_at")
+RECOMMENDATIONS = {choice for choice, _ in TokenComplianceProfile._meta.get_field("recommendation").choices}
+
 class TokenListView(APIView):
     def get(self, request):
-        tokens = TokenComplianceProfile.objects.all().order_by("-created_at")
+        params = request.query_params
+        # Only the listed columns are loaded; flags and modules never leave the database
+        tokens = TokenComplianceProfile.objects.values(*TOKEN_LIST_FIELDS)
+
+        recommendation = params.get("recommendation")
+        if recommendation:
+            if recommendation not in RECOMMENDATIONS:
+                return Response({"error": f"recommendation must be one of {sorted(RECOMMENDATIONS)}"}, status=400)
+            tokens = tokens.filter(recommendation=recommendation)
+        try:
+            if params.get("min_score"):
+                tokens = tokens.filter(risk_score__gte=float(params["min_score"]))
+            if params.get("max_score"):
+                tokens = tokens.filter(risk_score__lte=float(params["max_score"]))
+            limit = min(int(params.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "min_score, max_score and limit must be numbers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+
+        try:
+            rows, next_cursor = keyset_page(tokens, params.get("cursor"), limit)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
         data = [
-            {
-                "id": str(t.id),
-                "token_address": t.token_address,
-                "name": t.name,
-                "symbol": t.symbol,
-                "risk_score": t.risk_score,
-                "recommendation": t.recommendation,
-                "created_at": t.created_at.isoformat()
-            }
-            for t in tokens
+            {**row, "id": str(row["id"]), "created_at": row["created_at"].isoformat()}
+            for row in rows
         ]
-        return Response({"tokens": data}, status=200)
+        return Response({"tokens": data, "next_cursor": next_cursor}, status=200)
+
+def _job_data(job: AnalysisJob) -> dict:
+    return {
+        "id": str(job.id),
+        "token": str(job.token_id),
+        "module": job.module,
+        "status": job.status,
+        "params": job.params,
+        "progress": job.progress,
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def _queued_response(label: str, job: AnalysisJob, created: bool, params: dict = None) -> Response:
+    # Requests for a token already being analysed attach to the running job,
+    # which keeps the options it was submitted with
+    mismatch = not created and job.params != (params or {})
+    message = f"{label} queued" if created else f"{label} already in progress"
+    if mismatch:
+        message += " with different options; resubmit once it finishes"
+    return Response({
+        "message": message,
+        "job": _job_data(job),
+        "coalesced": not created,
+        "params_mismatch": mismatch,
+        "status_url": reverse("analysis-job", args=[job.id]),
+    }, status=202)
 
 class ContractAnalysisView(APIView):
     def post(self, request, token_id):
@@ -73,42 +186,75 @@ class ContractAnalysisView(APIView):
         except TokenComplianceProfile.DoesNotExist:
             return Response({"error": "Token not found"}, status=404)
 
-        # Get raw bytecode
+        job, created = submit_job(token, "contract")
+        return _queued_response("Contract analysis", job, created)
+
+def _resolve_batch_tokens(request, limit: int):
+    """Resolve `token_ids` and `addresses` from the request body.
+
+    Returns (tokens, not_found, None), or (None, None, error response).
+    """
+    token_ids = request.data.get("token_ids") or []
+    addresses = request.data.get("addresses") or []
+    if not isinstance(token_ids, list) or not isinstance(addresses, list):
+        return None, None, Response({"error": "token_ids and addresses must be lists"}, status=400)
+    if not token_ids and not addresses:
+        return None, None, Response({"error": "Provide token_ids or addresses"}, status=400)
+    if len(token_ids) + len(addresses) > limit:
+        return None, None, Response({"error": f"At most {limit} tokens per batch"}, status=400)
+
+    invalid = [a for a in addresses if not isinstance(a, str) or not Web3.is_address(a)]
+    if invalid:
+        return None, None, Response({"error": "Invalid addresses", "addresses": invalid}, status=400)
+    addresses = {a.lower() for a in addresses}
+
+    ids, invalid = [], []
+    for token_id in token_ids:
         try:
-            bytecode = get_bytecode_for_address(token.token_address)
-        except Exception as e:
-            return Response({"error": f"Unable to fetch bytecode: {str(e)}"}, status=500)
+            ids.append(uuid.UUID(str(token_id)))
+        except ValueError:
+            invalid.append(token_id)
+    if invalid:
+        return None, None, Response({"error": "Invalid token ids", "token_ids": invalid}, status=400)
+
+    tokens = list(
+        TokenComplianceProfile.objects.filter(id__in=ids)
+        | TokenComplianceProfile.objects.filter(token_address__in=addresses)
+    )
+
+    found_ids = {t.id for t in tokens}
+    found_addresses = {t.token_address for t in tokens}
+    not_found = [str(i) for i in ids if i not in found_ids]
+    not_found += sorted(addresses - found_addresses)
+    return tokens, not_found, None
 
-        # Compute bytecode hash
-        bytecode_hash = hashlib.md5(bytecode.encode()).hexdigest()
+class ContractAnalysisBatchView(APIView):
+    def post(self, request):
+        tokens, not_found, error = _resolve_batch_tokens(request, MAX_BATCH_TOKENS)
+        if error:
+            return error
 
-        # Run analysis on bytecode
         try:
-            result = run_contract_analysis(token.token_address)
+            batch = run_batch_contract_analysis(tokens)
         except Exception as e:
-            return Response({"error": f"Contract analysis failed: {str(e)}"}, status=500)
-
-        # Store new analysis record
-        ContractAnalysisResult.objects.create(
-            token=token,
-            score=result["score"],
-            flags=result["flags"],
-            evidence=result["evidence"],
-            bytecode=bytecode,
-            bytecode_hash=bytecode_hash,
-            engine_version="0.1-beta"
-        )
-
-        # Update token profile with summary
-        token.risk_score = result["score"]
-        token.flags = result["flags"]
-        token.recommendation = "enhanced_due_diligence" if result["score"] < 70 else "go"
-        token.modules["contractAnalysis"] = result
-        token.save()
+            return Response({"error": f"Batch contract analysis failed: {str(e)}"}, status=500)
 
+        summary = [
+            {
+                "token": str(t.id),
+                "token_address": t.token_address,
+                "score": t.risk_score,
+                "flags": t.flags,
+                "recommendation": t.recommendation,
+            }
+            for t in tokens if str(t.id) in batch["results"]
+        ]
         return Response({
-            "message": "Contract analysis completed",
-            "contractAnalysis": result
+            "message": "Batch contract analysis completed",
+            "analysed": len(summary),
+            "results": summary,
+            "errors": batch["errors"],
+            "not_found": not_found,
         }, status=200)
 
 class ContractAnalysisListView(APIView):
@@ -125,14 +271,19 @@ class ContractAnalysisListView(APIView):
                 "score": a.score,
                 "flags": a.flags,
                 "evidence": a.evidence,
-                "bytecode_hash": a.bytecode_hash,
+                "bytecode_hash": a.bytecode_blob_id,
                 "engine_version": a.engine_version,
                 "analyzed_at": a.analyzed_at.isoformat()
             }
             for a in analyses
         ]
 
-        return Response({"token": str(token.id), "analyses": data}, status=200)
+        latest = token.latest_contract_analysis_id
+        return Response({
+            "token": str(token.id),
+            "latest": str(latest) if latest else None,
+            "analyses": data,
+        }, status=200)
 
 class HolderAnalysisView(APIView):
     def post(self, request, token_id):
@@ -141,23 +292,11 @@ class HolderAnalysisView(APIView):
         except TokenComplianceProfile.DoesNotExist:
             return Response({"error": "Token not found"}, status=404)
 
-        try:
-            result = analyze_token_holders(token.token_address)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
-
-        analysis = HolderAnalysisResult.objects.create(
-            token=token,
-            top_holders=result["top_holders"],
-            centralization_score=result["centralization_score"],
-            anomalies=result["anomalies"]
-        )
-
-        token.modules["holderAnalysis"] = result
-        token.save()
-
-        serializer = HolderAnalysisResultSerializer(analysis)
-        return Response(serializer.data, status=201)
+        # Saves every holder instead of just the top ones
+        persist_all = str(request.data.get("persist_all", "")).lower() in ("1", "true")
+        params = {"persist_all": persist_all}
+        job, created = submit_job(token, "holders", params)
+        return _queued_response("Holder analysis", job, created, params)
 
     def get(self, request, token_id):
         try:
@@ -167,4 +306,74 @@ class HolderAnalysisView(APIView):
 
         analyses = HolderAnalysisResult.objects.filter(token=token).order_by("-created_at")
         serializer = HolderAnalysisResultSerializer(analyses, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+class HolderWatchlistView(APIView):
+    def post(self, request):
+        tokens, not_found, error = _resolve_batch_tokens(request, MAX_WATCHLIST_TOKENS)
+        if error:
+            return error
+
+        try:
+            results = analyze_watchlist(tokens)
+        except Exception as e:
+            return Response({"error": f"Watchlist holder scan failed: {str(e)}"}, status=500)
+        # Graph passes read whole archives; they run in the worker, not in this request
+        graph_jobs = schedule_graph_refreshes(tokens)
+
+        summary = [
+            {
+                "token": str(t.id),
+                "token_address": t.token_address,
+                "centralization_score": results[t.token_address]["centralization_score"],
+                "anomalies": results[t.token_address]["anomalies"],
+                "last_processed_block": results[t.token_address]["last_processed_block"],
+                "failed_ranges": results[t.token_address]["failed_ranges"],
+            }
+            for t in tokens
+        ]
+        return Response({
+            "message": "Watchlist holder scan completed",
+            "analysed": len(summary),
+            "graph_jobs_queued": graph_jobs,
+            "results": summary,
+            "not_found": not_found,
+        }, status=200)
+
+class ExportView(APIView):
+    def get(self, request, kind):
+        # "output", not "format": DRF reserves ?format= for renderer selection
+        fmt = request.query_params.get("output", "ndjson")
+        if kind not in EXPORTS or fmt not in FORMATS:
+            return Response({
+                "error": "Unknown export or output format",
+                "exports": list(EXPORTS),
+                "outputs": list(FORMATS),
+            }, status=400)
+
+        token = None
+        address = request.query_params.get("token")
+        if address:
+            token = TokenComplianceProfile.objects.filter(token_address=address.lower()).first()
+            if not token:
+                return Response({"error": "Token not found"}, status=404)
+
+        response = StreamingHttpResponse(stream_export(kind, fmt, token), content_type=FORMATS[fmt])
+        filename = f"{kind}-{token.token_address}" if token else kind
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+        return response
+
+class RpcStatsView(APIView):
+    # Operational detail about our providers; not for API clients
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"endpoints": rpc_stats()})
+
+class AnalysisJobView(APIView):
+    def get(self, request, job_id):
+        try:
+            job = AnalysisJob.objects.get(id=job_id)
+        except AnalysisJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=404)
+        return Response(_job_data(job))
@@ -87,6 +87,31 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'whitelister-default',
+    },
+    # Content-addressed contract analyses, keyed by bytecode hash
+    'analysis': {
+        'BACKEND': config('WHITELISTER_ANALYSIS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('WHITELISTER_ANALYSIS_CACHE_LOCATION', default='whitelister-analysis'),
+        'TIMEOUT': config('WHITELISTER_ANALYSIS_CACHE_TIMEOUT', default=7 * 24 * 3600, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('WHITELISTER_ANALYSIS_CACHE_MAX_ENTRIES', default=10_000, cast=int),
+        },
+    },
+    # Rendered token profiles; use a shared backend when the analysis worker runs separately
+    'profiles': {
+        'BACKEND': config('WHITELISTER_PROFILE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('WHITELISTER_PROFILE_CACHE_LOCATION', default='whitelister-profiles'),
+        'TIMEOUT': config('WHITELISTER_PROFILE_CACHE_TIMEOUT', default=60, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('WHITELISTER_PROFILE_CACHE_MAX_ENTRIES', default=10_000, cast=int),
+        },
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_RENDERER_CLASSES': (